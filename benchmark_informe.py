@@ -0,0 +1,553 @@
+"""
+Benchmark del generador de informes de Cursor AI Analytics.
+
+Mide el coste de construir las tablas HTML del informe y de formatear fechas y
+números en español, expresado por cada 10.000 filas, y lo compara con la
+construcción fila a fila (concatenación de cadenas, formato valor a valor).
+
+También mide el arranque del CLI en procesos nuevos (python -X importtime): la
+ayuda, los errores de argumentos o rutas y los informes ya generados no deben
+importar pandas.
+
+Con --etapas mide cada etapa del informe (carga, validación, división temporal,
+agregación, métricas, tablas HTML y render) sobre exports sintéticos de 10k a 10M
+filas, con tiempo y memoria residente máxima, y puede guardar los resultados como
+referencia o compararlos con una referencia guardada (código de salida 1 si hay
+regresiones).
+
+Uso:
+    python benchmark_informe.py
+    python benchmark_informe.py --filas 20000 --repeticiones 10
+    python benchmark_informe.py --etapas 10k,100k,1M --guardar-referencia referencia.json
+    python benchmark_informe.py --etapas 10k,100k,1M --comparar referencia.json
+    python benchmark_informe.py --generar-csv export.csv --usuarios 500 --dias 90
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import generador_informe_template as generador
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Distribuciones de los exports sintéticos: valor -> peso relativo
+MODELOS_SINTETICOS = {
+    'claude-4-sonnet': 0.40, 'default': 0.20, 'gpt-4.1': 0.14, 'o3': 0.09,
+    'claude-4-opus': 0.07, 'gemini-2.5-pro': 0.06, 'gpt-4o': 0.04
+}
+EXTENSIONES_SINTETICAS = {'ts': 0.28, 'py': 0.24, 'tsx': 0.15, 'java': 0.12, 'go': 0.08, 'rs': 0.05, 'md': 0.05, 'sql': 0.03}
+VERSIONES_SINTETICAS = {'1.2.0': 0.45, '1.1.4': 0.30, '1.1.3': 0.15, '1.0.0': 0.10}
+
+# Probabilidad de que el modelo, la extensión o la versión de un día sean los habituales del usuario
+FIDELIDAD_SINTETICA = {'Most Used Model': 0.7, 'Most Used Apply Extension': 0.8, 'Most Used Tab Extension': 0.8, 'Client Version': 0.95}
+
+# Media diaria de los contadores en un día activo de un usuario de intensidad media
+# (las líneas y tabs aceptados se obtienen de los sugeridos con la tasa de aceptación del usuario)
+MEDIAS_CONTADORES_SINTETICOS = {
+    'Chat Suggested Lines Added': 250, 'Chat Suggested Lines Deleted': 50,
+    'Chat Total Applies': 6, 'Chat Total Accepts': 4, 'Chat Total Rejects': 1,
+    'Chat Tabs Shown': 120, 'Edit Requests': 4, 'Ask Requests': 5, 'Agent Requests': 6,
+    'Cmd+K Usages': 3, 'Subscription Included Reqs': 12, 'API Key Reqs': 0.1, 'Usage Based Reqs': 1,
+    'Bugbot Usages': 0.05
+}
+CONTADORES_ACEPTADOS_SINTETICOS = {
+    'Chat Accepted Lines Added': ('Chat Suggested Lines Added', 1.0),
+    'Chat Accepted Lines Deleted': ('Chat Suggested Lines Deleted', 1.0),
+    'Tabs Accepted': ('Chat Tabs Shown', 0.6)
+}
+
+# Columnas en el orden del export de Cursor (incluye columnas que el informe no lee)
+COLUMNAS_EXPORT_SINTETICO = [
+    'Date', 'User ID', 'Email', 'Is Active', 'Chat Suggested Lines Added', 'Chat Suggested Lines Deleted',
+    'Chat Accepted Lines Added', 'Chat Accepted Lines Deleted', 'Chat Total Applies', 'Chat Total Accepts',
+    'Chat Total Rejects', 'Chat Tabs Shown', 'Tabs Accepted', 'Edit Requests', 'Ask Requests', 'Agent Requests',
+    'Cmd+K Usages', 'Subscription Included Reqs', 'API Key Reqs', 'Usage Based Reqs', 'Bugbot Usages',
+    'Most Used Model', 'Most Used Apply Extension', 'Most Used Tab Extension', 'Client Version'
+]
+CATEGORIAS_SINTETICAS = {
+    'Most Used Model': MODELOS_SINTETICOS, 'Most Used Apply Extension': EXTENSIONES_SINTETICAS,
+    'Most Used Tab Extension': EXTENSIONES_SINTETICAS, 'Client Version': VERSIONES_SINTETICAS
+}
+
+# Formato de fecha de los exports de Cursor
+FORMATO_FECHA_EXPORT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+# Filas por bloque al escribir un export sintético en CSV (memoria acotada)
+FILAS_BLOQUE_SINTETICO = 1_000_000
+
+# Benchmark por etapas (--etapas)
+TAMANOS_ETAPAS_DEFECTO = '10k,100k,1M,10M'
+DIAS_ETAPAS_DEFECTO = 30
+ETAPAS_INFORME = [
+    'Carga (leer_datos_cursor)', 'validar_esquema_csv', 'División temporal', 'Agregación por período y usuario',
+    'KPIs, cohortes y rankings', 'generar_tablas_html', 'Render de plantilla'
+]
+# Por encima de este tamaño cada etapa se mide una sola vez
+FILAS_MAXIMAS_REPETICION = 1_000_000
+VERSION_REFERENCIA = 1
+TOLERANCIA_REGRESION_DEFECTO = 0.25
+# Diferencias absolutas por debajo de estos márgenes se consideran ruido
+MARGEN_REGRESION_MS = 5
+MARGEN_REGRESION_MB = 20
+
+def eleccion_ponderada(pesos, tamano: int, generador_aleatorio) -> np.ndarray:
+    """Códigos (posición en `pesos`) elegidos al azar según los pesos relativos."""
+    probabilidades = np.array(list(pesos.values()))
+    return generador_aleatorio.choice(len(pesos), size=tamano, p=probabilidades / probabilidades.sum())
+
+def perfiles_usuarios_sinteticos(usuarios: int, proporcion_inactivos: float, generador_aleatorio):
+    """
+    Rasgos fijos de cada usuario sintético: probabilidad de estar activo un día, intensidad
+    de uso, tasa de aceptación y modelo, extensiones y versión habituales.
+
+    La probabilidad de actividad sigue una Beta con media 1 - proporcion_inactivos, de modo
+    que hay usuarios casi diarios y usuarios esporádicos.
+    """
+    if proporcion_inactivos <= 0 or proporcion_inactivos >= 1:
+        propension = np.full(usuarios, 1.0 - proporcion_inactivos)
+    else:
+        propension = generador_aleatorio.beta(2, 2 * proporcion_inactivos / (1 - proporcion_inactivos), usuarios)
+
+    return {
+        'propension': propension,
+        'intensidad': generador_aleatorio.lognormal(0, 0.75, usuarios),
+        'tasa_aceptacion': generador_aleatorio.beta(6, 4, usuarios),
+        **{columna: eleccion_ponderada(pesos, usuarios, generador_aleatorio) for columna, pesos in CATEGORIAS_SINTETICAS.items()}
+    }
+
+def bloques_export_sintetico(usuarios: int, dias: int, semilla: int = 1, proporcion_inactivos: float = 0.3,
+                             dias_por_bloque: int = None):
+    """
+    Genera un export de Cursor sintético (una fila por usuario y día) por bloques de días.
+
+    Cada bloque es un DataFrame con las columnas del export real (COLUMNAS_EXPORT_SINTETICO)
+    y los tipos de cargar_datos_cursor(): fecha UTC, textos como category y contadores int32.
+    Las filas inactivas tienen los contadores a cero y modelo, extensiones y versión vacíos.
+    """
+    generador_aleatorio = np.random.default_rng(semilla)
+    perfiles = perfiles_usuarios_sinteticos(usuarios, proporcion_inactivos, generador_aleatorio)
+    fechas = pd.date_range('2025-01-01', periods=dias, freq='D', tz='UTC')
+    emails = pd.Index([f"usuario{i}@empresa.com" for i in range(usuarios)])
+    dias_por_bloque = dias_por_bloque or dias
+
+    for inicio in range(0, dias, dias_por_bloque):
+        fechas_bloque = fechas[inicio:inicio + dias_por_bloque]
+        filas = len(fechas_bloque) * usuarios
+        usuario = np.tile(np.arange(usuarios, dtype='int32'), len(fechas_bloque))
+        activo = generador_aleatorio.random(filas) < perfiles['propension'][usuario]
+        intensidad = perfiles['intensidad'][usuario]
+
+        bloque = {
+            'Date': np.repeat(fechas_bloque, usuarios),
+            'User ID': usuario,
+            'Email': pd.Categorical.from_codes(usuario, categories=emails),
+            'Is Active': activo
+        }
+        for columna, media in MEDIAS_CONTADORES_SINTETICOS.items():
+            bloque[columna] = np.where(activo, generador_aleatorio.poisson(media * intensidad), 0).astype('int32')
+        for columna, (sugeridos, factor) in CONTADORES_ACEPTADOS_SINTETICOS.items():
+            tasa = perfiles['tasa_aceptacion'][usuario] * factor
+            bloque[columna] = generador_aleatorio.binomial(bloque[sugeridos], tasa).astype('int32')
+        for columna, pesos in CATEGORIAS_SINTETICAS.items():
+            habitual = generador_aleatorio.random(filas) < FIDELIDAD_SINTETICA[columna]
+            codigos = np.where(habitual, perfiles[columna][usuario], eleccion_ponderada(pesos, filas, generador_aleatorio))
+            bloque[columna] = pd.Categorical.from_codes(np.where(activo, codigos, -1), categories=list(pesos))
+
+        yield pd.DataFrame(bloque, columns=COLUMNAS_EXPORT_SINTETICO)
+
+def generar_export_sintetico(usuarios: int, dias: int, semilla: int = 1, proporcion_inactivos: float = 0.3) -> pd.DataFrame:
+    """Export sintético completo en memoria (ver bloques_export_sintetico())."""
+    return next(bloques_export_sintetico(usuarios, dias, semilla, proporcion_inactivos))
+
+def escribir_export_sintetico(archivo_csv, usuarios: int, dias: int, semilla: int = 1, proporcion_inactivos: float = 0.3) -> int:
+    """
+    Escribe un export sintético en CSV con el formato de Cursor, por bloques de días.
+
+    Returns:
+        Número de filas escritas
+    """
+    dias_por_bloque = max(1, FILAS_BLOQUE_SINTETICO // max(usuarios, 1))
+    filas = 0
+    with open(archivo_csv, 'w', encoding='utf-8', newline='') as f:
+        for bloque in bloques_export_sintetico(usuarios, dias, semilla, proporcion_inactivos, dias_por_bloque):
+            bloque.to_csv(f, header=filas == 0, index=False, date_format=FORMATO_FECHA_EXPORT)
+            filas += len(bloque)
+    return filas
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mejor tiempo (segundos) de `repeticiones` ejecuciones de la función."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def lista_inactivos_referencia(emails) -> str:
+    """Construcción fila a fila con += (implementación anterior, solo como referencia)."""
+    html_lista = ""
+    for email in emails:
+        email_sanitizado = generador.sanitizar_html(str(email))
+        html_lista += f"<li>{email_sanitizado}</li>\n                "
+    return html_lista
+
+def ranking_referencia(ranking) -> str:
+    """Construcción fila a fila con += de un ranking (implementación anterior, solo como referencia)."""
+    html_tabla = ""
+    for email, valor in ranking.items():
+        html_tabla += f"<tr><td>{generador.sanitizar_html(str(email))}</td><td class=\"text-right\">{generador.formato_numero_espanol(int(valor))}</td></tr>\n                            "
+    return html_tabla
+
+def benchmark_tablas(filas: int, repeticiones: int):
+    """Devuelve [(nombre, segundos)] para la construcción de tablas con `filas` filas."""
+    emails = [f"usuario.{i}@empresa.com" for i in range(filas)]
+    ranking = pd.Series(
+        np.random.default_rng(1).integers(0, 10**6, filas), index=pd.Index(emails, name='Email')
+    )
+
+    metricas = generador.procesar_datos_cursor(generar_export_sintetico(200, 28))
+    metricas['usuarios']['lista_inactivos'] = emails
+
+    return [
+        ('Lista de inactivos (+=, referencia)', medir(lambda: lista_inactivos_referencia(emails), repeticiones)),
+        ('Lista de inactivos (por columnas)', medir(
+            lambda: generador.construir_filas_html(generador.FORMATO_ELEMENTO_LISTA, generador.sanitizar_html_lista(emails)),
+            repeticiones
+        )),
+        ('Ranking email/valor (+=, referencia)', medir(lambda: ranking_referencia(ranking), repeticiones)),
+        ('Ranking email/valor (por columnas)', medir(lambda: generador.filas_ranking_html(ranking), repeticiones)),
+        ('generar_tablas_html completo', medir(lambda: generador.generar_tablas_html(metricas), repeticiones)),
+    ]
+
+def benchmark_formato(filas: int, repeticiones: int):
+    """Devuelve [(nombre, segundos)] para formatear `filas` fechas y números en español."""
+    fechas = pd.Series(pd.date_range('2000-01-01', periods=filas, freq='D', tz='UTC'))
+    numeros = np.random.default_rng(1).random(filas) * 10**6
+
+    return [
+        ('Fechas cortas (fecha a fecha)', medir(
+            lambda: [generador.formatear_fecha_espanol(fecha, formato_corto=True) for fecha in fechas], repeticiones
+        )),
+        ('Fechas cortas (vectorizado)', medir(
+            lambda: generador.formatear_fechas_espanol(fechas, formato_corto=True), repeticiones
+        )),
+        ('Números decimales (número a número)', medir(
+            lambda: [generador.formato_numero_espanol(numero) for numero in numeros.tolist()], repeticiones
+        )),
+        ('Números decimales (vectorizado)', medir(
+            lambda: generador.formato_numero_espanol_lista(numeros), repeticiones
+        )),
+    ]
+
+def ejecutar_cli(argumentos, repeticiones: int):
+    """
+    Ejecuta el generador en procesos nuevos con -X importtime.
+
+    Returns:
+        (mejor tiempo en segundos, segundos en imports de primer nivel, si importó pandas)
+    """
+    script = os.path.abspath(generador.__file__)
+    mejor, importaciones, importa_pandas = float('inf'), 0.0, False
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run([sys.executable, '-X', 'importtime', script, *argumentos],
+                                 capture_output=True, text=True, cwd=os.path.dirname(script))
+        segundos = time.perf_counter() - inicio
+        if segundos < mejor:
+            # Líneas 'import time: propio | acumulado | módulo' (la primera es la cabecera). Con la
+            # importación diferida no aparece 'pandas', pero sí sus submódulos al cargarse
+            lineas = [linea.split('|') for linea in proceso.stderr.splitlines() if linea.startswith('import time:')][1:]
+            mejor = segundos
+            importaciones = sum(int(propio.split(':')[1]) for propio, _, _ in lineas) / 1e6
+            importa_pandas = any(modulo.strip().split('.')[0] == 'pandas' for _, _, modulo in lineas)
+    return mejor, importaciones, importa_pandas
+
+def benchmark_arranque(repeticiones: int):
+    """Devuelve [(nombre, segundos, segundos_imports, importa_pandas)] del arranque del CLI en distintos casos."""
+    with tempfile.TemporaryDirectory() as directorio:
+        archivo_csv = os.path.join(directorio, 'export.csv')
+        salida = os.path.join(directorio, 'informe.html')
+        directorio_cache = os.path.join(directorio, 'cache')
+        generar_export_sintetico(200, 28).to_csv(archivo_csv, index=False)
+
+        base = [archivo_csv, '-o', salida, '--cache-dir', directorio_cache]
+        casos = [
+            ('--help', ['--help']),
+            ('Fecha con formato inválido', base + ['--fecha-inicio-actual', '2025-13-01']),
+            ('Plantilla inexistente', base + ['--plantilla', os.path.join(directorio, 'no_existe.html')]),
+            ('Informe completo (sin caché)', [archivo_csv, '-o', os.path.join(directorio, 'informe_sin_cache.html'), '--no-cache']),
+            ('Informe ya generado (caché de informes)', base),
+        ]
+        # Primera ejecución con caché para que el último caso encuentre el informe ya generado
+        ejecutar_cli(base, 1)
+        return [(nombre, *ejecutar_cli(argumentos, repeticiones)) for nombre, argumentos in casos]
+
+def imprimir_arranque(resultados):
+    """Imprime el tiempo de arranque de cada caso, el tiempo en imports y si se importó pandas."""
+    print("\n🚀 Arranque del CLI (proceso nuevo, python -X importtime)")
+    print(f"{'Caso':<42} {'ms':>10} {'ms imports':>12} {'pandas':>8}")
+    print("-" * 75)
+    for nombre, segundos, importaciones, importa_pandas in resultados:
+        print(f"{nombre:<42} {segundos * 1000:>10.1f} {importaciones * 1000:>12.1f} {'sí' if importa_pandas else 'no':>8}")
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso en MB (None si la plataforma no la ofrece)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en KB en Linux
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+def parsear_tamanos(texto: str):
+    """Interpreta una lista de tamaños como '10k,100k,1M' y devuelve [(etiqueta, filas)]."""
+    multiplicadores = {'': 1, 'k': 1_000, 'm': 1_000_000}
+    tamanos = []
+    for etiqueta in texto.split(','):
+        etiqueta = etiqueta.strip()
+        numero, sufijo = etiqueta.rstrip('kKmM'), etiqueta[len(etiqueta.rstrip('kKmM')):].lower()
+        if not numero.isdigit() or sufijo not in multiplicadores or int(numero) < 1:
+            raise ValueError(f"tamaño no válido: '{etiqueta}' (ejemplos: 10k, 100k, 1M)")
+        tamanos.append((etiqueta, int(numero) * multiplicadores[sufijo]))
+    return tamanos
+
+def medir_etapas(archivo_csv, plantilla, archivo_salida, repeticiones: int):
+    """
+    Ejecuta el pipeline del informe sobre un export etapa a etapa, como procesar_datos_cursor().
+
+    Devuelve {etapa: {'segundos', 'rss_pico_mb'}}: el mejor tiempo de `repeticiones`
+    ejecuciones y la memoria residente máxima del proceso al terminar la etapa en la
+    primera ejecución (es acumulativa: incluye la de las etapas anteriores).
+    """
+    etapas = {}
+
+    def etapa(nombre, funcion):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        if nombre in etapas:
+            etapas[nombre]['segundos'] = min(etapas[nombre]['segundos'], segundos)
+        else:
+            etapas[nombre] = {'segundos': segundos, 'rss_pico_mb': rss_pico_mb()}
+        return resultado
+
+    for _ in range(repeticiones):
+        nombres = iter(ETAPAS_INFORME)
+        df = etapa(next(nombres), lambda: generador.leer_datos_cursor(archivo_csv))
+        validacion = etapa(next(nombres), lambda: generador.validar_esquema_csv(df))
+        if validacion['errores']:
+            raise ValueError(f"export sintético no válido: {validacion['errores']}")
+        info_division = etapa(next(nombres), lambda: generador.determinar_division_temporal(sorted(df['Date'].unique())))
+        agregados = etapa(next(nombres), lambda: generador.agregar_bloque(df, info_division))
+        metricas = etapa(next(nombres), lambda: generador.metricas_desde_agregados(agregados, info_division))
+        etapa(next(nombres), lambda: generador.generar_tablas_html(metricas))
+        if not etapa(next(nombres), lambda: generador.generar_informe_desde_plantilla(metricas, plantilla, archivo_salida)):
+            raise ValueError("no se pudo generar el informe")
+        del df, agregados, metricas
+
+    return etapas
+
+def benchmark_etapas(tamanos, dias: int, proporcion_inactivos: float, semilla: int, repeticiones: int,
+                     directorio_datos=None):
+    """
+    Mide las etapas del informe para cada tamaño, cada uno en un proceso nuevo.
+
+    Los exports sintéticos se generan en `directorio_datos` (y se reutilizan si ya existen
+    con los mismos parámetros) o en un directorio temporal que se borra al terminar.
+
+    Returns:
+        {etiqueta: {'filas', 'usuarios', 'dias', 'etapas'}}
+    """
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = directorio_datos or temporal
+        os.makedirs(directorio, exist_ok=True)
+        resultados = {}
+        for etiqueta, filas in tamanos:
+            usuarios = math.ceil(filas / dias)
+            archivo_csv = os.path.join(directorio, f"export_{usuarios}x{dias}_i{proporcion_inactivos:g}_s{semilla}.csv")
+            if not os.path.exists(archivo_csv):
+                print(f"🧪 Generando export sintético de {usuarios * dias:,} filas: {archivo_csv}".replace(",", "."), flush=True)
+                escribir_export_sintetico(archivo_csv, usuarios, dias, semilla, proporcion_inactivos)
+
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--medir-etapas', archivo_csv,
+                 '--repeticiones', str(repeticiones if filas <= FILAS_MAXIMAS_REPETICION else 1)],
+                capture_output=True, text=True
+            )
+            if proceso.returncode != 0:
+                raise RuntimeError(f"fallo al medir {etiqueta}: {proceso.stderr.strip().splitlines()[-1:]}")
+            resultados[etiqueta] = {'filas': usuarios * dias, 'usuarios': usuarios, 'dias': dias, 'etapas': json.loads(proceso.stdout)}
+    return resultados
+
+def comparar_con_referencia(resultados, referencia, tolerancia: float):
+    """
+    Compara los resultados con una referencia guardada con --guardar-referencia.
+
+    Una etapa es una regresión si tarda más de (1 + tolerancia) veces lo que tardaba y
+    al menos MARGEN_REGRESION_MS más; la memoria máxima de un tamaño, con el mismo
+    criterio y MARGEN_REGRESION_MB.
+
+    Returns:
+        Lista de descripciones de las regresiones (vacía si no hay)
+    """
+    regresiones = []
+    for etiqueta, resultado in resultados.items():
+        anterior = referencia['tamanos'].get(etiqueta)
+        if not anterior:
+            continue
+        for nombre, medida in resultado['etapas'].items():
+            base = anterior['etapas'].get(nombre)
+            if not base:
+                continue
+            ms, ms_base = medida['segundos'] * 1000, base['segundos'] * 1000
+            if ms > ms_base * (1 + tolerancia) and ms - ms_base > MARGEN_REGRESION_MS:
+                regresiones.append(f"{etiqueta} · {nombre}: {ms:.1f} ms (referencia {ms_base:.1f} ms, {ms / ms_base - 1:+.0%})")
+
+        rss = max((medida['rss_pico_mb'] or 0) for medida in resultado['etapas'].values())
+        rss_base = max((medida['rss_pico_mb'] or 0) for medida in anterior['etapas'].values())
+        if rss_base and rss > rss_base * (1 + tolerancia) and rss - rss_base > MARGEN_REGRESION_MB:
+            regresiones.append(f"{etiqueta} · memoria máxima: {rss:.0f} MB (referencia {rss_base:.0f} MB, {rss / rss_base - 1:+.0%})")
+    return regresiones
+
+def imprimir_etapas(resultados, referencia=None):
+    """Imprime por tamaño el tiempo de cada etapa, el coste por 10.000 filas, la memoria máxima y la variación frente a la referencia."""
+    for etiqueta, resultado in resultados.items():
+        filas = resultado['filas']
+        anterior = (referencia or {}).get('tamanos', {}).get(etiqueta, {}).get('etapas', {})
+        print(f"\n📈 Etapas del informe: {etiqueta} ({filas:,} filas: {resultado['usuarios']:,} usuarios × {resultado['dias']} días)".replace(",", "."))
+        print(f"{'Etapa':<36} {'ms':>10} {'ms/10k filas':>14} {'RSS máx. MB':>12} {'vs ref.':>9}")
+        print("-" * 85)
+        for nombre, medida in resultado['etapas'].items():
+            ms = medida['segundos'] * 1000
+            rss = f"{medida['rss_pico_mb']:.0f}" if medida['rss_pico_mb'] is not None else "-"
+            variacion = f"{medida['segundos'] / anterior[nombre]['segundos'] - 1:+.0%}" if nombre in anterior else ""
+            print(f"{nombre:<36} {ms:>10.1f} {ms * 10_000 / filas:>14.2f} {rss:>12} {variacion:>9}")
+        total = sum(medida['segundos'] for medida in resultado['etapas'].values()) * 1000
+        print(f"{'Total':<36} {total:>10.1f} {total * 10_000 / filas:>14.2f}")
+
+def ejecutar_benchmark_etapas(args):
+    """Modo --etapas: mide, imprime, guarda la referencia y termina con error si hay regresiones."""
+    referencia = None
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+        if referencia.get('version') != VERSION_REFERENCIA:
+            sys.exit(f"❌ Versión de referencia no compatible en {args.comparar}")
+        parametros = {'dias': args.dias, 'proporcion_inactivos': args.inactivos, 'semilla': args.semilla}
+        if any(referencia.get(clave) != valor for clave, valor in parametros.items()):
+            print(f"⚠️ La referencia se midió con otros parámetros: {', '.join(f'{clave}={referencia.get(clave)}' for clave in parametros)}")
+
+    resultados = benchmark_etapas(parsear_tamanos(args.etapas), args.dias, args.inactivos, args.semilla,
+                                  args.repeticiones, args.directorio_datos)
+    imprimir_etapas(resultados, referencia)
+
+    if args.guardar_referencia:
+        with open(args.guardar_referencia, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': VERSION_REFERENCIA,
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'dias': args.dias,
+                'proporcion_inactivos': args.inactivos,
+                'semilla': args.semilla,
+                'tamanos': resultados
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Referencia guardada: {args.guardar_referencia}")
+
+    if referencia:
+        regresiones = comparar_con_referencia(resultados, referencia, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones respecto a {args.comparar} (tolerancia {args.tolerancia:.0%}):")
+            for regresion in regresiones:
+                print(f"  • {regresion}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones respecto a {args.comparar} (tolerancia {args.tolerancia:.0%})")
+
+def imprimir_resultados(titulo: str, resultados, filas: int):
+    """Imprime una tabla con el tiempo total y el coste por cada 10.000 filas."""
+    print(f"\n{titulo} ({filas:,} filas)".replace(",", "."))
+    print(f"{'Etapa':<42} {'ms':>10} {'ms/10k filas':>14}")
+    print("-" * 68)
+    for nombre, segundos in resultados:
+        print(f"{nombre:<42} {segundos * 1000:>10.2f} {segundos * 1000 * 10_000 / filas:>14.2f}")
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description='Benchmark del generador de informes de Cursor AI Analytics')
+    parser.add_argument('--filas', type=int, default=10_000,
+                       help='Filas de las tablas de prueba (default: 10000)')
+    parser.add_argument('--repeticiones', type=int, default=5,
+                       help=f'Repeticiones por medida; se muestra la mejor (default: 5; con --etapas, 1 por encima de {FILAS_MAXIMAS_REPETICION:,} filas)')
+    parser.add_argument('--etapas', nargs='?', const=TAMANOS_ETAPAS_DEFECTO, metavar='TAMAÑOS',
+                       help=f'Medir las etapas del informe con exports sintéticos de estos tamaños en filas (default: {TAMANOS_ETAPAS_DEFECTO})')
+    parser.add_argument('--dias', type=int, default=DIAS_ETAPAS_DEFECTO,
+                       help=f'Días de los exports sintéticos; los usuarios salen de filas / días (default: {DIAS_ETAPAS_DEFECTO})')
+    parser.add_argument('--inactivos', type=float, default=0.3,
+                       help='Proporción media de filas inactivas de los exports sintéticos (default: 0.3)')
+    parser.add_argument('--semilla', type=int, default=1,
+                       help='Semilla de los exports sintéticos (default: 1)')
+    parser.add_argument('--directorio-datos', metavar='DIR',
+                       help='Guardar y reutilizar aquí los exports sintéticos (default: temporal)')
+    parser.add_argument('--guardar-referencia', metavar='ARCHIVO',
+                       help='Con --etapas, guardar los resultados como referencia (JSON)')
+    parser.add_argument('--comparar', metavar='ARCHIVO',
+                       help='Con --etapas, comparar con una referencia y terminar con código 1 si hay regresiones')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_REGRESION_DEFECTO,
+                       help=f'Empeoramiento relativo admitido frente a la referencia (default: {TOLERANCIA_REGRESION_DEFECTO})')
+    parser.add_argument('--generar-csv', metavar='ARCHIVO',
+                       help='Solo escribir un export sintético en CSV (con --usuarios y --dias) y terminar')
+    parser.add_argument('--usuarios', type=int, default=1000,
+                       help='Usuarios del export de --generar-csv (default: 1000)')
+    parser.add_argument('--medir-etapas', metavar='CSV', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not 0 <= args.inactivos <= 1:
+        parser.error('--inactivos debe estar entre 0 y 1')
+    if args.dias < 1 or args.usuarios < 1 or args.repeticiones < 1:
+        parser.error('--dias, --usuarios y --repeticiones deben ser positivos')
+    if (args.guardar_referencia or args.comparar) and not args.etapas:
+        parser.error('--guardar-referencia y --comparar requieren --etapas')
+    if args.etapas:
+        try:
+            parsear_tamanos(args.etapas)
+        except ValueError as e:
+            parser.error(str(e))
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if args.medir_etapas:
+        # Proceso hijo de --etapas: la memoria máxima medida es solo la de este tamaño
+        with tempfile.TemporaryDirectory() as directorio:
+            plantilla = os.path.join(os.path.dirname(os.path.abspath(generador.__file__)), 'cursor_stats_report_ux.html')
+            etapas = medir_etapas(args.medir_etapas, plantilla, os.path.join(directorio, 'informe.html'), args.repeticiones)
+        print(json.dumps(etapas))
+        return
+
+    if args.generar_csv:
+        filas = escribir_export_sintetico(args.generar_csv, args.usuarios, args.dias, args.semilla, args.inactivos)
+        print(f"✅ Export sintético: {args.generar_csv} ({filas:,} filas: {args.usuarios:,} usuarios × {args.dias} días)".replace(",", "."))
+        return
+
+    if args.etapas:
+        ejecutar_benchmark_etapas(args)
+        return
+
+    imprimir_resultados("🧮 Tablas HTML", benchmark_tablas(args.filas, args.repeticiones), args.filas)
+    imprimir_resultados("🗓️ Formato español", benchmark_formato(args.filas, args.repeticiones), args.filas)
+    imprimir_arranque(benchmark_arranque(args.repeticiones))
+
+if __name__ == "__main__":
+    main()
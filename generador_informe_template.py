@@ -1,12 +1,48 @@
-import pandas as pd
+from __future__ import annotations
+
 import sys
+import os
+import hashlib
+import importlib.util
+import io
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 import argparse
 import re
 import json
 import html
 import logging
-from typing import Dict, List, Optional, Any
+import warnings
+from typing import Dict, List, Optional, Any, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def importar_diferido(nombre):
+    """
+    Importa un módulo de forma diferida: se carga en el primer acceso a uno de sus atributos.
+    
+    pandas y numpy tardan cientos de milisegundos en importarse; así la ayuda, los
+    errores de argumentos o de rutas y los informes ya generados (caché de informes)
+    responden sin pagar ese coste.
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    especificacion = importlib.util.find_spec(nombre)
+    cargador = importlib.util.LazyLoader(especificacion.loader)
+    especificacion.loader = cargador
+    modulo = importlib.util.module_from_spec(especificacion)
+    sys.modules[nombre] = modulo
+    cargador.exec_module(modulo)
+    return modulo
+
+pd = importar_diferido('pandas')
+np = importar_diferido('numpy')
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,6 +69,273 @@ ESQUEMA_CSV_REQUERIDO = {
     'Usage Based Reqs': 'numeric'
 }
 
+# Columnas de líneas eliminadas: no se validan como obligatorias pero el informe las usa
+COLUMNAS_LINEAS_ELIMINADAS = ['Chat Accepted Lines Deleted', 'Chat Suggested Lines Deleted']
+
+# Columnas de texto con pocos valores distintos que se repiten en cada fila del export
+COLUMNAS_CATEGORICAS = ['Email', 'Most Used Model', 'Client Version', 'Most Used Tab Extension']
+
+# Columnas que se cargan del CSV (el resto del export no se usa en el informe)
+COLUMNAS_LECTURA_CSV = list(ESQUEMA_CSV_REQUERIDO) + COLUMNAS_LINEAS_ELIMINADAS
+
+# Tipos compactos para la lectura: contadores int32, textos repetidos como category
+TIPOS_LECTURA_CSV = {
+    **{col: 'int32' for col, tipo in ESQUEMA_CSV_REQUERIDO.items() if tipo == 'numeric'},
+    **{col: 'int32' for col in COLUMNAS_LINEAS_ELIMINADAS},
+    **{col: 'category' for col in COLUMNAS_CATEGORICAS},
+    'Is Active': 'bool'
+}
+
+# Tipos nullable con los que se leen contadores e 'Is Active': las celdas vacías llegan
+# como <NA> en lugar de hacer fallar la lectura (ver compactar_tipos_nulables())
+TIPOS_NULABLES_LECTURA = {'int32': 'Int32', 'bool': 'boolean'}
+
+# Formato de email aceptado
+PATRON_EMAIL = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+# Valores admitidos en 'Is Active' cuando no llega como bool
+VALORES_BOOL_VALIDOS = [True, False, 'True', 'False', 1, 0, '1', '0']
+VALORES_BOOL_VERDADEROS = [True, 'True', 1, '1']
+
+# Formatos columnares que se leen directamente sin pasar por el parser CSV
+EXTENSIONES_COLUMNARES = ('.parquet', '.feather')
+
+# Contadores de peticiones que forman las peticiones totales
+COLUMNAS_PETICIONES = [
+    'Edit Requests', 'Ask Requests', 'Agent Requests', 'Cmd+K Usages',
+    'Subscription Included Reqs', 'API Key Reqs', 'Usage Based Reqs'
+]
+
+# Contadores que se suman por período (solo filas activas)
+COLUMNAS_CONTADORES = [
+    'Chat Accepted Lines Added', 'Chat Accepted Lines Deleted',
+    'Chat Suggested Lines Added', 'Chat Suggested Lines Deleted',
+    'Tabs Accepted', 'Chat Tabs Shown'
+] + COLUMNAS_PETICIONES
+
+# Contadores diarios que alimentan los gráficos de evolución
+COLUMNAS_EVOLUCION = COLUMNAS_CONTADORES[:6]
+
+# Etiquetas de período usadas en las tablas agregadas
+PERIODOS = ['anterior', 'actual']
+
+# Días mínimos para dividir los datos en dos períodos comparables (división automática)
+DIAS_MINIMOS_COMPARATIVA = 4
+
+# Filas por bloque en el procesamiento por bloques (--bloques sin valor)
+FILAS_BLOQUE_DEFECTO = 500_000
+
+# Caché persistente de datos validados (--cache-dir / --no-cache)
+# Incrementar VERSION_ESQUEMA_CACHE cuando cambien la lectura, la validación o los tipos
+VERSION_ESQUEMA_CACHE = 1
+DIRECTORIO_CACHE_DEFECTO = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'cursor-stats-report'
+)
+ARCHIVO_INDICE_CACHE = 'indice.json'
+CACHE_MAX_ENTRADAS = 20
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Caché de informes generados (mismo directorio): se reutilizan sin cargar los datos ni pandas
+# Incrementar VERSION_CACHE_INFORMES si cambia el formato del índice
+VERSION_CACHE_INFORMES = 1
+ARCHIVO_INDICE_INFORMES = 'informes.json'
+OPCIONES_CLAVE_INFORME = [
+    'fecha_inicio_actual', 'fecha_fin_actual', 'fecha_inicio_anterior', 'fecha_fin_anterior',
+    'periodos', 'precision_graficos'
+]
+
+# Almacén histórico por días (subcomando ingest / --historial)
+PREFIJO_PARTICION_HISTORIAL = 'fecha='
+ARCHIVO_PARTICION_HISTORIAL = 'datos.parquet'
+
+# Placeholders de la plantilla HTML: {{NOMBRE}}
+PATRON_PLACEHOLDER = re.compile(r'\{\{([A-Za-z0-9_]+)\}\}')
+
+# Plantilla precompilada junto a la plantilla (--precompile-template)
+# Incrementar VERSION_PLANTILLA_COMPILADA si cambia el formato de compilar_plantilla()
+SUFIJO_PLANTILLA_COMPILADA = '.compilada.json'
+VERSION_PLANTILLA_COMPILADA = 1
+
+# Caracteres de control que sanitizar_html() elimina
+PATRON_CARACTERES_CONTROL = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]')
+
+# Separador para formatear o escapar muchos textos en una sola operación (no lo elimina PATRON_CARACTERES_CONTROL)
+SEPARADOR_VECTORIZADO = '\n'
+
+# Intercambio de separadores de miles y decimales al formato español
+TABLA_SEPARADORES_ESPANOL = str.maketrans({',': '.', '.': ','})
+
+# Formato de las filas de tablas y listas HTML (incluye la indentación que sigue a cada fila)
+FORMATO_FILA_RANKING = '<tr><td>{}</td><td class="text-right">{}</td></tr>\n                            '
+FORMATO_FILA_TECNOLOGIA = '<tr><td><span class="badge {}">{}</span></td><td class="text-right">{}</td><td class="text-right">{}</td></tr>\n                            '
+FORMATO_FILA_VERSION = '<tr><td>{}</td><td class="text-right">{}</td><td class="text-right">{}%</td></tr>\n                            '
+FORMATO_ELEMENTO_LISTA = '<li>{}</li>\n                '
+
+# Nombres de los meses en español (índice = mes - 1), sin depender del locale del sistema
+MESES_ESPANOL = (
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
+    'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
+)
+MESES_ESPANOL_CORTO = ('ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic')
+
+# Días del mes con dos dígitos (índice = día), como %d de strftime
+DIAS_DOS_DIGITOS = tuple(f"{dia:02d}" for dia in range(32))
+
+# Datos de los gráficos: decimales por defecto y límite de los valores numéricos
+PRECISION_GRAFICOS_DEFECTO = 1
+LIMITE_VALOR_GRAFICOS = 1e15
+
+# Placeholders de gráficos de plantillas anteriores a {{CHART_DATA}}: nombre -> (gráfico, serie)
+PLACEHOLDERS_GRAFICOS_LEGADO = {
+    'CHART_MODELS_LABELS': ('modelos', 'labels'),
+    'CHART_MODELS_DATA': ('modelos', 'porcentajes'),
+    'CHART_EVOLUTION_LABELS': ('evolucion', 'labels'),
+    'CHART_EVOLUTION_ACCEPTED': ('evolucion', 'aceptadas'),
+    'CHART_EVOLUTION_SUGGESTED': ('evolucion', 'sugeridas'),
+    'CHART_EVOLUTION_USERS': ('evolucion', 'usuarios'),
+    'CHART_TABS_ACCEPTED': ('evolucion', 'tabs_aceptados'),
+    'CHART_TABS_SHOWN': ('evolucion', 'tabs_mostrados')
+}
+
+# Esquema de la exportación de métricas (--export-json / --export-parquet)
+# Incrementar VERSION_ESQUEMA_EXPORTACION ante cualquier cambio incompatible de campos
+VERSION_ESQUEMA_EXPORTACION = 1
+COHORTES_EXPORTACION = ['consistentes', 'nuevos', 'perdidos', 'reactivados']
+
+# Modo tendencia (--periodos semana|mes|N-dias)
+PATRON_PERIODOS_DIAS = re.compile(r'^([1-9][0-9]*)-dias$')
+METRICAS_VARIACION_TENDENCIA = ['usuarios_activos', 'lineas_aceptadas', 'tasa_aceptacion', 'peticiones_totales']
+FORMATO_FILA_RETENCION = '<tr><td>{}</td><td class="text-right">{}</td>{}</tr>\n                            '
+FORMATO_CELDA_RETENCION = '<td class="celda-retencion{}" style="--intensidad: {:.2f};" title="{} usuarios">{}%</td>'
+FORMATO_FILA_TENDENCIA = '<tr><td>{}</td><td class="text-right">{}</td><td class="text-right">{}{}</td><td class="text-right">{}{}</td><td class="text-right">{}%{}</td><td class="text-right">{}{}</td></tr>\n                            '
+
+# Servidor local de informes (subcomando serve)
+HOST_SERVIDOR_DEFECTO = '127.0.0.1'
+PUERTO_SERVIDOR_DEFECTO = 8000
+CACHE_PAGINAS_DEFECTO = 32
+CAMPOS_FECHA_INFORME = ['fecha_inicio_actual', 'fecha_fin_actual', 'fecha_inicio_anterior', 'fecha_fin_anterior']
+PARAMETROS_CONSULTA_INFORME = ['equipo', 'dominio', 'ultimos_dias', 'periodos'] + CAMPOS_FECHA_INFORME
+
+# Modo vigilancia (--watch): sondeo de tamaño y fecha de modificación, y espera hasta que los archivos dejan de cambiar
+INTERVALO_VIGILANCIA = 1.0
+ESPERA_VIGILANCIA_DEFECTO = 2.0
+MULTIPLICADOR_HUELLA = 1_000_003
+
+# Métricas de un período sin registros
+METRICAS_PERIODO_VACIO = {
+    'usuarios_activos': 0,
+    'lineas_aceptadas': 0,
+    'lineas_sugeridas': 0,
+    'tasa_aceptacion': 0,
+    'tabs_aceptados': 0,
+    'tabs_mostrados': 0,
+    'tasa_aceptacion_tabs': 0,
+    'peticiones_totales': 0,
+    'promedio_lineas_usuario': 0
+}
+
+# Instrumentación por etapas (--profile): inactiva salvo que se llame a activar_perfil()
+PERFIL_ETAPAS: Dict[str, Any] = {'activo': False, 'inicio': None, 'inicio_cpu': None, 'nivel': 0, 'etapas': []}
+
+def memoria_residente_mb() -> Optional[float]:
+    """Memoria residente actual del proceso en MB (en sistemas sin /proc, la máxima de getrusage)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+def activar_perfil():
+    """Empieza a registrar las etapas medidas con medir_etapa() (descarta las anteriores)."""
+    PERFIL_ETAPAS.update({
+        'activo': True, 'inicio': time.perf_counter(), 'inicio_cpu': time.process_time(), 'nivel': 0, 'etapas': []
+    })
+
+@contextmanager
+def medir_etapa(nombre: str, filas: Optional[int] = None):
+    """
+    Mide una etapa del informe para --profile: tiempo real, tiempo de CPU, filas procesadas
+    y variación de la memoria residente. Sin activar_perfil() no mide nada.
+    
+    Las llamadas repetidas a una misma etapa (p. ej. un bloque por iteración con --bloques)
+    se acumulan en una sola entrada, y las etapas anidadas se registran con su nivel. El
+    dict devuelto permite fijar 'filas' cuando solo se conocen al terminar la etapa.
+    """
+    medida = {'filas': filas}
+    if not PERFIL_ETAPAS['activo']:
+        yield medida
+        return
+    
+    nivel = PERFIL_ETAPAS['nivel']
+    entrada = next((etapa for etapa in PERFIL_ETAPAS['etapas'] if etapa['etapa'] == nombre and etapa['nivel'] == nivel), None)
+    if entrada is None:
+        # Se registra al empezar para que la etapa aparezca antes que las anidadas
+        entrada = {'etapa': nombre, 'nivel': nivel, 'llamadas': 0, 'segundos': 0.0, 'segundos_cpu': 0.0, 'filas': None, 'memoria_mb': 0.0}
+        PERFIL_ETAPAS['etapas'].append(entrada)
+    
+    PERFIL_ETAPAS['nivel'] = nivel + 1
+    memoria_inicial = memoria_residente_mb()
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield medida
+    finally:
+        entrada['segundos'] += time.perf_counter() - inicio
+        entrada['segundos_cpu'] += time.process_time() - inicio_cpu
+        entrada['llamadas'] += 1
+        if medida['filas'] is not None:
+            entrada['filas'] = (entrada['filas'] or 0) + int(medida['filas'])
+        if memoria_inicial is not None:
+            entrada['memoria_mb'] += memoria_residente_mb() - memoria_inicial
+        PERFIL_ETAPAS['nivel'] = nivel
+
+def resumen_perfil() -> Dict[str, Any]:
+    """Etapas medidas y totales del proceso desde activar_perfil() (tiempo, CPU y memoria residente actual)."""
+    return {
+        'segundos': time.perf_counter() - PERFIL_ETAPAS['inicio'],
+        'segundos_cpu': time.process_time() - PERFIL_ETAPAS['inicio_cpu'],
+        'memoria_mb': memoria_residente_mb(),
+        'etapas': [dict(etapa) for etapa in PERFIL_ETAPAS['etapas']]
+    }
+
+def imprimir_perfil(resumen):
+    """Muestra en el log la tabla de etapas de --profile; 'Sin medir' es el tiempo fuera de las etapas (arranque, logging...)."""
+    def miles(numero):
+        return f"{numero:,.0f}".replace(',', '.')
+    
+    logger.info("=" * 60)
+    logger.info("🔬 Perfil por etapas:")
+    logger.info(f"   {'Etapa':<32} {'llamadas':>8} {'s real':>8} {'s CPU':>8} {'filas':>12} {'filas/s':>12} {'Δ MB':>8}")
+    for etapa in resumen['etapas']:
+        nombre = '  ' * etapa['nivel'] + etapa['etapa']
+        filas = miles(etapa['filas']) if etapa['filas'] is not None else '-'
+        ritmo = miles(etapa['filas'] / etapa['segundos']) if etapa['filas'] and etapa['segundos'] > 0 else '-'
+        logger.info(f"   {nombre:<32} {etapa['llamadas']:>8} {etapa['segundos']:>8.3f} {etapa['segundos_cpu']:>8.3f} "
+                    f"{filas:>12} {ritmo:>12} {etapa['memoria_mb']:>+8.1f}")
+    medido = sum(etapa['segundos'] for etapa in resumen['etapas'] if etapa['nivel'] == 0)
+    logger.info(f"   {'Sin medir':<32} {'':>8} {resumen['segundos'] - medido:>8.3f}")
+    memoria = f"{resumen['memoria_mb']:.0f} MB" if resumen['memoria_mb'] is not None else "n/d"
+    logger.info(f"   {'Total':<32} {'':>8} {resumen['segundos']:>8.3f} {resumen['segundos_cpu']:>8.3f}   (memoria residente final: {memoria})")
+
+def exportar_perfil_json(resumen, archivo_salida) -> Optional[str]:
+    """Escribe el perfil por etapas (resumen_perfil()) en JSON (escritura atómica)."""
+    try:
+        def escribir(temporal):
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(resumen, f, ensure_ascii=False, indent=2)
+        escribir_atomico(archivo_salida, escribir)
+    except Exception as e:
+        logger.error(f"❌ Error al guardar el perfil en JSON: {e}")
+        return None
+    
+    logger.info(f"🔬 Perfil por etapas guardado: {archivo_salida}")
+    return archivo_salida
+
 def sanitizar_html(texto: str) -> str:
     """Sanitiza texto para prevenir XSS en HTML."""
     if not isinstance(texto, str):
@@ -42,7 +345,7 @@ def sanitizar_html(texto: str) -> str:
     texto_sanitizado = html.escape(texto, quote=True)
     
     # Remover caracteres de control y caracteres no imprimibles
-    texto_sanitizado = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', texto_sanitizado)
+    texto_sanitizado = PATRON_CARACTERES_CONTROL.sub('', texto_sanitizado)
     
     # Limitar longitud para prevenir ataques de buffer
     if len(texto_sanitizado) > 1000:
@@ -51,22 +354,69 @@ def sanitizar_html(texto: str) -> str:
     
     return texto_sanitizado
 
-def validar_email(email: str) -> bool:
-    """Valida formato de email básico."""
-    if not isinstance(email, str):
-        return False
+def sanitizar_html_lista(textos) -> List[str]:
+    """
+    Equivalente a aplicar sanitizar_html() a cada texto, escapando todos a la vez.
+    
+    Los textos se unen con SEPARADOR_VECTORIZADO, se escapan y limpian en una sola
+    pasada y se vuelven a separar. Si algún texto contiene el separador o supera el
+    límite de longitud se recurre a sanitizar_html() para esos casos.
+    """
+    if hasattr(textos, 'tolist'):
+        textos = textos.tolist()
+    textos = list(map(str, textos))
+    if not textos:
+        return []
+    
+    unidos = SEPARADOR_VECTORIZADO.join(textos)
+    if unidos.count(SEPARADOR_VECTORIZADO) != len(textos) - 1:
+        return [sanitizar_html(texto) for texto in textos]
+    
+    sanitizados = PATRON_CARACTERES_CONTROL.sub('', html.escape(unidos, quote=True)).split(SEPARADOR_VECTORIZADO)
+    if max(map(len, sanitizados)) > 1000:
+        return [sanitizar_html(texto) if len(sanitizado) > 1000 else sanitizado
+                for texto, sanitizado in zip(textos, sanitizados)]
+    return sanitizados
+
+def detectar_emails_invalidos(emails: pd.Series):
+    """
+    Detecta emails con formato inválido de forma vectorizada.
+    
+    La expresión regular se evalúa una sola vez por email distinto (las categorías
+    si la columna es category) y el resultado se proyecta a las filas.
     
-    patron_email = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(patron_email, email.strip()))
+    Returns:
+        Tupla (emails inválidos distintos, número de filas con email inválido)
+    """
+    if isinstance(emails.dtype, pd.CategoricalDtype):
+        distintos = pd.Series(emails.cat.categories)
+        invalidos = ~distintos.astype(str).str.strip().str.fullmatch(PATRON_EMAIL[1:-1]).to_numpy(dtype=bool)
+        codigos = emails.cat.codes.to_numpy()
+        filas_por_categoria = np.bincount(codigos[codigos >= 0], minlength=len(distintos))
+        usados = filas_por_categoria > 0
+        return list(distintos[invalidos & usados].astype(str)), int(filas_por_categoria[invalidos].sum())
+    
+    distintos = pd.Series(emails.dropna().unique())
+    invalidos = distintos[~distintos.astype(str).str.strip().str.fullmatch(PATRON_EMAIL[1:-1]).to_numpy(dtype=bool)]
+    return list(invalidos.astype(str)), int(emails.isin(invalidos).sum())
 
-def validar_esquema_csv(df: pd.DataFrame) -> Dict[str, List[str]]:
+def validar_esquema_csv(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Valida que el DataFrame tenga las columnas requeridas y tipos correctos.
     
+    Las columnas que no llegan con el tipo esperado se convierten una sola vez y
+    la conversión se guarda en el propio DataFrame ('Date' a datetime, contadores
+    a numérico, 'Is Active' a bool), de modo que el resto del proceso no repite el trabajo.
+    
     Returns:
-        Dict con 'errores' y 'advertencias'
+        Dict con 'errores', 'advertencias' y 'filas' (recuentos por fila: total,
+        fechas_invalidas, emails_invalidos, no_booleanos y no_numericos por columna)
     """
-    resultado = {'errores': [], 'advertencias': []}
+    resultado = {
+        'errores': [],
+        'advertencias': [],
+        'filas': {'total': len(df), 'fechas_invalidas': 0, 'emails_invalidos': 0, 'no_booleanos': 0, 'no_numericos': {}}
+    }
     
     # Verificar columnas requeridas
     columnas_faltantes = set(ESQUEMA_CSV_REQUERIDO.keys()) - set(df.columns)
@@ -82,34 +432,47 @@ def validar_esquema_csv(df: pd.DataFrame) -> Dict[str, List[str]]:
             
         try:
             if tipo_esperado == 'datetime':
-                pd.to_datetime(df[columna], errors='coerce')
-                if df[columna].isna().all():
+                if not pd.api.types.is_datetime64_any_dtype(df[columna]):
+                    df[columna] = pd.to_datetime(df[columna], errors='coerce')
+                fechas_invalidas = int(df[columna].isna().sum())
+                resultado['filas']['fechas_invalidas'] = fechas_invalidas
+                if fechas_invalidas == len(df):
                     resultado['advertencias'].append(f"Columna '{columna}': No se pudieron convertir fechas")
                     
             elif tipo_esperado == 'numeric':
-                pd.to_numeric(df[columna], errors='coerce')
-                valores_nulos = df[columna].isna().sum()
+                if not pd.api.types.is_numeric_dtype(df[columna]):
+                    df[columna] = pd.to_numeric(df[columna], errors='coerce')
+                nulable = pd.api.types.is_extension_array_dtype(df[columna])
+                valores_nulos = int(df[columna].isna().sum()) if nulable or not pd.api.types.is_integer_dtype(df[columna]) else 0
+                if valores_nulos:
+                    resultado['filas']['no_numericos'][columna] = valores_nulos
+                if nulable:
+                    # Vacíos y no numéricos no suman: se dejan a 0 y el contador vuelve a int32
+                    df[columna] = df[columna].fillna(0).astype(TIPOS_LECTURA_CSV[columna])
                 if valores_nulos > len(df) * 0.5:  # Más del 50% nulos
                     resultado['advertencias'].append(f"Columna '{columna}': {valores_nulos} valores no numéricos de {len(df)}")
                     
             elif tipo_esperado == 'bool':
-                valores_unicos = df[columna].unique()
-                valores_bool_validos = {True, False, 'True', 'False', 1, 0, '1', '0'}
-                if not all(val in valores_bool_validos or pd.isna(val) for val in valores_unicos):
-                    resultado['advertencias'].append(f"Columna '{columna}': Contiene valores no booleanos")
+                if pd.api.types.is_extension_array_dtype(df[columna]) and pd.api.types.is_bool_dtype(df[columna]):
+                    df[columna] = df[columna].fillna(False).astype(bool)
+                elif not pd.api.types.is_bool_dtype(df[columna]):
+                    validos = df[columna].isin(VALORES_BOOL_VALIDOS)
+                    no_booleanos = int((~validos & df[columna].notna()).sum())
+                    resultado['filas']['no_booleanos'] = no_booleanos
+                    if no_booleanos:
+                        resultado['advertencias'].append(f"Columna '{columna}': Contiene valores no booleanos ({no_booleanos} filas)")
+                    df[columna] = df[columna].isin(VALORES_BOOL_VERDADEROS)
                     
         except Exception as e:
             resultado['advertencias'].append(f"Error validando columna '{columna}': {str(e)}")
     
     # Validar emails
     if 'Email' in df.columns:
-        emails_invalidos = []
-        for email in df['Email'].dropna().unique():
-            if not validar_email(str(email)):
-                emails_invalidos.append(str(email))
+        emails_invalidos, filas_email_invalido = detectar_emails_invalidos(df['Email'])
+        resultado['filas']['emails_invalidos'] = filas_email_invalido
         
         if emails_invalidos:
-            resultado['advertencias'].append(f"Emails con formato inválido: {len(emails_invalidos)} encontrados")
+            resultado['advertencias'].append(f"Emails con formato inválido: {len(emails_invalidos)} encontrados ({filas_email_invalido} filas)")
             logger.warning(f"Emails inválidos: {emails_invalidos[:5]}...")  # Solo mostrar los primeros 5
     
     # Verificar cantidad mínima de registros
@@ -118,6 +481,214 @@ def validar_esquema_csv(df: pd.DataFrame) -> Dict[str, List[str]]:
     
     return resultado
 
+def seleccionar_columnas_lectura(columnas_archivo, relajar_tipos: bool = False):
+    """
+    Calcula columnas, tipos y columnas de fecha a leer a partir de la cabecera del archivo.
+    
+    Contadores e 'Is Active' se piden con tipos nullable (TIPOS_NULABLES_LECTURA).
+    Con relajar_tipos=True solo se fuerzan las columnas category y pandas infiere
+    el resto (para exports con contadores no numéricos).
+    """
+    columnas = [col for col in columnas_archivo if col in COLUMNAS_LECTURA_CSV]
+    tipos = {col: TIPOS_NULABLES_LECTURA.get(tipo, tipo) for col, tipo in TIPOS_LECTURA_CSV.items() if col in columnas}
+    if relajar_tipos:
+        tipos = {col: tipo for col, tipo in tipos.items() if tipo == 'category'}
+    fechas = ['Date'] if 'Date' in columnas else None
+    return columnas, tipos, fechas
+
+def opciones_lectura_csv(tipos, motor: str = 'c') -> Dict[str, Any]:
+    """
+    Argumentos de pd.read_csv() para aplicar `tipos` con el parser indicado.
+    
+    El parser C es mucho más lento con enteros nullable explícitos que infiriéndolos
+    con dtype_backend='numpy_nullable', así que con él los contadores se infieren
+    (Int64, o texto si hay celdas no numéricas que validar_esquema_csv() convierte).
+    """
+    if motor != 'c' or 'Int32' not in tipos.values():
+        return {'dtype': tipos}
+    return {'dtype': {col: tipo for col, tipo in tipos.items() if tipo != 'Int32'}, 'dtype_backend': 'numpy_nullable'}
+
+def compactar_tipos_nulables(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve a int32/bool los contadores e 'Is Active' leídos como nullable que no tienen vacíos.
+    
+    Los que sí tienen vacíos quedan como Int32/boolean para que validar_esquema_csv()
+    los cuente y los convierta.
+    """
+    for columna, tipo in TIPOS_LECTURA_CSV.items():
+        if columna not in df.columns or tipo not in TIPOS_NULABLES_LECTURA:
+            continue
+        if not (pd.api.types.is_extension_array_dtype(df[columna]) and pd.api.types.is_numeric_dtype(df[columna])):
+            continue
+        if not df[columna].hasnans:
+            df[columna] = df[columna].astype(tipo)
+        elif df[columna].dtype != TIPOS_NULABLES_LECTURA[tipo]:
+            df[columna] = df[columna].astype(TIPOS_NULABLES_LECTURA[tipo])
+    return df
+
+def leer_csv_cursor(archivo_csv, motor: str = 'c') -> pd.DataFrame:
+    """
+    Lee el CSV de Cursor cargando solo las columnas del informe con tipos compactos.
+    
+    La columna 'Date' se parsea durante la lectura. Contadores e 'Is Active' se leen
+    con tipos nullable, así que las celdas vacías no obligan a repetir la lectura. Solo
+    si hay valores no válidos (texto en un contador con el motor pyarrow, o en 'Is Active')
+    se repite dejando que pandas infiera esos tipos para que validar_esquema_csv() pueda
+    informar del problema.
+    
+    Args:
+        archivo_csv: Ruta al CSV exportado de Cursor (o archivo binario en memoria, ver abrir_anexo_csv())
+        motor: Parser de pandas ('c' por defecto o 'pyarrow', multihilo)
+    """
+    if motor == 'pyarrow':
+        verificar_pyarrow_disponible()
+    
+    columnas_archivo = pd.read_csv(archivo_csv, nrows=0).columns
+    columnas, tipos, fechas = seleccionar_columnas_lectura(columnas_archivo)
+    
+    try:
+        if hasattr(archivo_csv, 'seek'):
+            archivo_csv.seek(0)
+        # Las conversiones fallidas del primer intento no deben ensuciar la salida (se reintenta abajo)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            df = pd.read_csv(archivo_csv, usecols=columnas, parse_dates=fechas, engine=motor,
+                             **opciones_lectura_csv(tipos, motor))
+        return compactar_tipos_nulables(df)
+    except ValueError as e:
+        logger.warning(f"⚠️ No se pudieron aplicar tipos compactos ({e}); se infieren los tipos de contadores e 'Is Active'")
+        columnas, tipos, fechas = seleccionar_columnas_lectura(columnas_archivo, relajar_tipos=True)
+        if hasattr(archivo_csv, 'seek'):
+            archivo_csv.seek(0)
+        if motor == 'pyarrow':
+            # Con cualquier dtype, pyarrow convierte también los enteros que infiere y falla con celdas vacías:
+            # se lee sin tipos y las columnas category se aplican después
+            return normalizar_tipos_cursor(pd.read_csv(archivo_csv, usecols=columnas, parse_dates=fechas, engine=motor))
+        return pd.read_csv(archivo_csv, usecols=columnas, dtype=tipos, parse_dates=fechas, engine=motor)
+
+def verificar_pyarrow_disponible():
+    """Comprueba que pyarrow está instalado (necesario para --engine pyarrow y Parquet/Feather)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("Se requiere pyarrow para el motor 'pyarrow' y los archivos Parquet/Feather: pip install pyarrow")
+
+def columnas_archivo_columnar(archivo) -> List[str]:
+    """Devuelve los nombres de columna de un archivo Parquet o Feather sin leer los datos."""
+    verificar_pyarrow_disponible()
+    import pyarrow.parquet
+    import pyarrow.ipc
+    
+    if archivo.lower().endswith('.parquet'):
+        return pyarrow.parquet.read_schema(archivo).names
+    with pyarrow.ipc.open_file(archivo) as lector:
+        return lector.schema.names
+
+def normalizar_tipos_cursor(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica los tipos compactos de TIPOS_LECTURA_CSV a un DataFrame ya leído.
+    
+    Si una columna no admite el tipo compacto se conserva tal cual para que
+    la valide validar_esquema_csv().
+    """
+    for columna, tipo in TIPOS_LECTURA_CSV.items():
+        if columna in df.columns and df[columna].dtype != tipo:
+            try:
+                df[columna] = df[columna].astype(tipo)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"⚠️ Columna '{columna}' sin tipo compacto: {e}")
+    if 'Date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    
+    return df
+
+def leer_columnar_cursor(archivo) -> pd.DataFrame:
+    """Lee un export de Cursor en formato Parquet o Feather (columnas del informe únicamente)."""
+    columnas, _, _ = seleccionar_columnas_lectura(columnas_archivo_columnar(archivo))
+    
+    if archivo.lower().endswith('.parquet'):
+        df = pd.read_parquet(archivo, columns=columnas)
+    else:
+        df = pd.read_feather(archivo, columns=columnas)
+    
+    return normalizar_tipos_cursor(df)
+
+def abrir_anexo_csv(archivo_csv, desde_byte: int) -> io.BytesIO:
+    """Cabecera del CSV más las filas a partir de `desde_byte` (que debe ser un inicio de línea), en memoria."""
+    with open(archivo_csv, 'rb') as f:
+        cabecera = f.readline()
+        f.seek(desde_byte)
+        return io.BytesIO(cabecera + f.read())
+
+def leer_datos_cursor(archivo, motor: str = 'c', desde_byte: int = 0) -> pd.DataFrame:
+    """
+    Lee un export de Cursor detectando el formato por extensión (.csv, .parquet, .feather).
+    
+    Con desde_byte > 0 (solo CSV) se leen únicamente las filas añadidas a partir de ese byte.
+    """
+    if archivo.lower().endswith(EXTENSIONES_COLUMNARES):
+        return leer_columnar_cursor(archivo)
+    if desde_byte:
+        return leer_csv_cursor(abrir_anexo_csv(archivo, desde_byte), motor)
+    return leer_csv_cursor(archivo, motor)
+
+def leer_bloques_cursor(archivo, filas_bloque: int, relajar_tipos: bool = False):
+    """
+    Lee un export de Cursor por bloques de filas, con los mismos tipos que leer_datos_cursor().
+    
+    Cada bloque se entrega con 'Date' convertida y sin las filas de fecha no válida,
+    de forma que la memoria usada depende del tamaño de bloque y no del archivo.
+    
+    Yields:
+        DataFrame con hasta filas_bloque registros
+    """
+    if archivo.lower().endswith(EXTENSIONES_COLUMNARES):
+        columnas, _, _ = seleccionar_columnas_lectura(columnas_archivo_columnar(archivo))
+        import pyarrow.parquet
+        import pyarrow.ipc
+        
+        if archivo.lower().endswith('.parquet'):
+            lotes = pyarrow.parquet.ParquetFile(archivo).iter_batches(batch_size=filas_bloque, columns=columnas)
+        else:
+            lector = pyarrow.ipc.open_file(archivo)
+            lotes = (lector.get_batch(i).select(columnas) for i in range(lector.num_record_batches))
+        bloques = (normalizar_tipos_cursor(lote.to_pandas()) for lote in lotes)
+    else:
+        columnas, tipos, fechas = seleccionar_columnas_lectura(pd.read_csv(archivo, nrows=0).columns, relajar_tipos)
+        bloques = (
+            compactar_tipos_nulables(bloque)
+            for bloque in pd.read_csv(archivo, usecols=columnas, parse_dates=fechas, chunksize=filas_bloque,
+                                      **opciones_lectura_csv(tipos))
+        )
+    
+    for bloque in bloques:
+        if 'Date' in bloque.columns:
+            bloque['Date'] = pd.to_datetime(bloque['Date'], errors='coerce')
+            bloque = bloque.dropna(subset=['Date'])
+        yield bloque
+
+def leer_fechas_cursor(archivo, filas_bloque: int) -> List[pd.Timestamp]:
+    """Lee únicamente la columna 'Date' del export (por bloques) y devuelve sus fechas únicas ordenadas."""
+    if archivo.lower().endswith('.parquet'):
+        bloques = [pd.read_parquet(archivo, columns=['Date'])]
+    elif archivo.lower().endswith('.feather'):
+        bloques = [pd.read_feather(archivo, columns=['Date'])]
+    else:
+        bloques = pd.read_csv(archivo, usecols=['Date'], chunksize=filas_bloque)
+    
+    fechas_unicas = None
+    for bloque in bloques:
+        fechas = pd.DatetimeIndex(pd.to_datetime(bloque['Date'], errors='coerce').dropna().unique())
+        fechas_unicas = fechas if fechas_unicas is None else fechas_unicas.union(fechas)
+    
+    return sorted(fechas_unicas) if fechas_unicas is not None else []
+
+def contar_por_aparicion(serie: pd.Series) -> pd.Series:
+    """Cuenta los valores no nulos de una serie, ordenados por primera aparición."""
+    conteos = serie.value_counts(sort=False)
+    orden_aparicion = pd.Index(list(serie.dropna().unique()), name=serie.name)
+    return conteos.reindex(orden_aparicion)
+
 def sanitizar_datos_para_json(datos: Any) -> Any:
     """Sanitiza datos antes de convertir a JSON para gráficos."""
     if isinstance(datos, list):
@@ -146,46 +717,73 @@ def formato_numero_espanol(numero):
             return f"{int(numero):,}".replace(",", ".")
         else:
             # Es decimal
-            return f"{numero:,.1f}".replace(",", "X").replace(".", ",").replace("X", ".")
+            return f"{numero:,.1f}".translate(TABLA_SEPARADORES_ESPANOL)
     return str(numero)
 
+def formato_numero_espanol_lista(valores) -> List[str]:
+    """
+    Equivalente a formato_numero_espanol() para un array o Series de números.
+    
+    Los enteros (o decimales sin parte fraccionaria) se formatean sin decimales y
+    el resto con uno; el cambio de separadores se hace con una única traducción
+    sobre todos los números unidos.
+    """
+    numeros = np.asarray(valores)
+    if numeros.size == 0:
+        return []
+    if numeros.dtype.kind in 'iub':
+        textos = [f"{numero:,}" for numero in numeros.astype('int64').tolist()]
+    else:
+        numeros = numeros.astype(float)
+        enteros = np.isfinite(numeros) & (numeros == np.trunc(numeros))
+        textos = [
+            f"{int(numero):,}" if entero else f"{numero:,.1f}"
+            for numero, entero in zip(numeros.tolist(), enteros.tolist())
+        ]
+    return SEPARADOR_VECTORIZADO.join(textos).translate(TABLA_SEPARADORES_ESPANOL).split(SEPARADOR_VECTORIZADO)
+
 def formatear_fecha_espanol(fecha, formato_corto=False):
-    """Formatea una fecha en español."""
+    """Formatea una fecha en español ('05 junio 2025', o '05 jun' en formato corto)."""
     if fecha is None:
         return "N/A"
     
-    meses_espanol = {
-        'January': 'enero', 'February': 'febrero', 'March': 'marzo', 'April': 'abril',
-        'May': 'mayo', 'June': 'junio', 'July': 'julio', 'August': 'agosto',
-        'September': 'septiembre', 'October': 'octubre', 'November': 'noviembre', 'December': 'diciembre'
-    }
-    
-    meses_espanol_corto = {
-        'Jan': 'ene', 'Feb': 'feb', 'Mar': 'mar', 'Apr': 'abr',
-        'May': 'may', 'Jun': 'jun', 'Jul': 'jul', 'Aug': 'ago',
-        'Sep': 'sep', 'Oct': 'oct', 'Nov': 'nov', 'Dec': 'dic'
-    }
+    if formato_corto:
+        return f"{DIAS_DOS_DIGITOS[fecha.day]} {MESES_ESPANOL_CORTO[fecha.month - 1]}"
+    return f"{DIAS_DOS_DIGITOS[fecha.day]} {MESES_ESPANOL[fecha.month - 1]} {fecha.year}"
+
+def textos_por_indice(textos, indices):
+    """Selecciona los textos de una tupla de constantes por un array de índices (array de objetos)."""
+    return np.array(textos, dtype=object)[indices]
+
+def formatear_fechas_espanol(fechas, formato_corto=False) -> List[str]:
+    """Equivalente a formatear_fecha_espanol() para una Series o array de fechas, sin bucles por fecha."""
+    indice = pd.DatetimeIndex(fechas)
+    if len(indice) == 0:
+        return []
     
+    textos = textos_por_indice(DIAS_DOS_DIGITOS, indice.day.to_numpy()) + ' '
     if formato_corto:
-        fecha_str = fecha.strftime('%d %b')
-        for mes_en, mes_es in meses_espanol_corto.items():
-            fecha_str = fecha_str.replace(mes_en, mes_es)
+        textos = textos + textos_por_indice(MESES_ESPANOL_CORTO, indice.month.to_numpy() - 1)
     else:
-        fecha_str = fecha.strftime('%d %B %Y')
-        for mes_en, mes_es in meses_espanol.items():
-            fecha_str = fecha_str.replace(mes_en, mes_es)
-    
-    return fecha_str
+        textos = (textos + textos_por_indice(MESES_ESPANOL, indice.month.to_numpy() - 1) + ' '
+                  + indice.year.to_numpy().astype(str).astype(object))
+    return textos.tolist()
 
-def validar_y_parsear_fechas(fecha_inicio_actual, fecha_fin_actual, fecha_inicio_anterior, fecha_fin_anterior, df):
-    """Valida y parsea las fechas personalizadas proporcionadas por el usuario."""
+def validar_y_parsear_fechas(fecha_inicio_actual, fecha_fin_actual, fecha_inicio_anterior, fecha_fin_anterior, df=None):
+    """
+    Valida y parsea las fechas personalizadas proporcionadas por el usuario.
+    
+    Sin `df` solo se comprueban el formato, que estén las 4 fechas y su orden, sin
+    necesidad de cargar los datos; con `df` se comprueba además que existan en el dataset.
+    """
     fechas_personalizadas = {}
     errores = []
     
     # Lista de fechas disponibles en el dataset
-    fechas_disponibles = set(df['Date'].dt.date)
-    fecha_min = min(fechas_disponibles)
-    fecha_max = max(fechas_disponibles)
+    if df is not None:
+        fechas_disponibles = set(df['Date'].dt.date)
+        fecha_min = min(fechas_disponibles)
+        fecha_max = max(fechas_disponibles)
     
     def parsear_fecha(fecha_str, nombre_campo):
         if not fecha_str:
@@ -195,7 +793,7 @@ def validar_y_parsear_fechas(fecha_inicio_actual, fecha_fin_actual, fecha_inicio
             fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
             
             # Verificar que la fecha esté en el dataset
-            if fecha_obj not in fechas_disponibles:
+            if df is not None and fecha_obj not in fechas_disponibles:
                 errores.append(f"❌ {nombre_campo}: {fecha_str} no existe en el dataset. Rango disponible: {fecha_min} - {fecha_max}")
                 return None
                 
@@ -229,29 +827,27 @@ def validar_y_parsear_fechas(fecha_inicio_actual, fecha_fin_actual, fecha_inicio
         if inicio_anterior >= fin_anterior:
             errores.append("❌ Fecha inicio anterior debe ser anterior a fecha fin anterior")
         
-        # Verificar solapamiento de períodos
-        if not (fin_anterior < inicio_actual or fin_actual < inicio_anterior):
+        # Verificar solapamiento de períodos (se avisa solo una vez, al validar contra los datos)
+        if df is not None and not (fin_anterior < inicio_actual or fin_actual < inicio_anterior):
             logger.warning("⚠️ Los períodos se solapan. Esto puede afectar el análisis de cohortes")
     
     return fechas_personalizadas, errores
 
-def dividir_periodos_personalizados(df, fechas_personalizadas):
-    """Divide el DataFrame usando fechas personalizadas especificadas por el usuario."""
-    # Crear timestamps con la misma zona horaria que el DataFrame
-    tz = df['Date'].dt.tz if hasattr(df['Date'].dt, 'tz') and df['Date'].dt.tz is not None else None
+def calcular_division_personalizada(fechas_unicas, fechas_personalizadas, tz=None):
+    """
+    Calcula la división en períodos a partir de las fechas personalizadas del usuario.
     
+    Solo necesita las fechas únicas del dataset, por lo que sirve tanto para un
+    DataFrame completo como para el procesamiento por bloques.
+    """
     inicio_actual = pd.Timestamp(fechas_personalizadas['inicio_actual'], tz=tz)
     fin_actual = pd.Timestamp(fechas_personalizadas['fin_actual'], tz=tz)
     inicio_anterior = pd.Timestamp(fechas_personalizadas['inicio_anterior'], tz=tz)
     fin_anterior = pd.Timestamp(fechas_personalizadas['fin_anterior'], tz=tz)
     
-    # Filtrar DataFrames por rangos de fechas
-    df_actual = df[(df['Date'] >= inicio_actual) & (df['Date'] <= fin_actual)].copy()
-    df_anterior = df[(df['Date'] >= inicio_anterior) & (df['Date'] <= fin_anterior)].copy()
-    
     # Calcular días únicos en cada período
-    dias_actual = df_actual['Date'].nunique()
-    dias_anterior = df_anterior['Date'].nunique()
+    dias_actual = sum(1 for fecha in fechas_unicas if inicio_actual <= fecha <= fin_actual)
+    dias_anterior = sum(1 for fecha in fechas_unicas if inicio_anterior <= fecha <= fin_anterior)
     
     info_division = {
         'total_dias': dias_actual + dias_anterior,
@@ -269,22 +865,17 @@ def dividir_periodos_personalizados(df, fechas_personalizadas):
     logger.info(f"   • Período anterior: {dias_anterior} días ({inicio_anterior.strftime('%d/%m')} - {fin_anterior.strftime('%d/%m')})")
     logger.info(f"   • Período actual: {dias_actual} días ({inicio_actual.strftime('%d/%m')} - {fin_actual.strftime('%d/%m')})")
     
-    return df_actual, df_anterior, info_division
+    return info_division
 
-def dividir_periodos_temporales(df):
-    """Divide el DataFrame en dos períodos: anterior (primera mitad) y actual (segunda mitad)."""
-    # Ordenar por fecha
-    df_ordenado = df.sort_values('Date').copy()
-    
-    # Obtener fechas únicas
-    fechas_unicas = sorted(df_ordenado['Date'].unique())
+def calcular_division_automatica(fechas_unicas):
+    """Calcula la división automática en dos mitades a partir de las fechas únicas ordenadas."""
     total_dias = len(fechas_unicas)
     
     logger.info(f"📅 Total de días únicos en el dataset: {total_dias}")
     
-    if total_dias < 4:
+    if total_dias < DIAS_MINIMOS_COMPARATIVA:
         logger.warning("⚠️ Dataset muy pequeño para análisis comparativo")
-        return df_ordenado, pd.DataFrame(), {
+        return {
             'total_dias': total_dias,
             'dias_actual': total_dias,
             'dias_anterior': 0,
@@ -296,10 +887,6 @@ def dividir_periodos_temporales(df):
     fechas_anteriores = fechas_unicas[:punto_corte]
     fechas_actuales = fechas_unicas[punto_corte:]
     
-    # Filtrar DataFrames
-    df_anterior = df_ordenado[df_ordenado['Date'].isin(fechas_anteriores)].copy()
-    df_actual = df_ordenado[df_ordenado['Date'].isin(fechas_actuales)].copy()
-    
     info_division = {
         'total_dias': total_dias,
         'dias_actual': len(fechas_actuales),
@@ -316,46 +903,96 @@ def dividir_periodos_temporales(df):
     logger.info(f"   • Período anterior: {len(fechas_anteriores)} días ({fechas_anteriores[0].strftime('%d/%m')} - {fechas_anteriores[-1].strftime('%d/%m')})")
     logger.info(f"   • Período actual: {len(fechas_actuales)} días ({fechas_actuales[0].strftime('%d/%m')} - {fechas_actuales[-1].strftime('%d/%m')})")
     
-    return df_actual, df_anterior, info_division
+    return info_division
 
-def calcular_metricas_periodo(df, nombre_periodo=""):
-    """Calcula métricas para un período específico."""
-    if df.empty:
-        return {
-            'usuarios_activos': 0,
-            'lineas_aceptadas': 0,
-            'lineas_sugeridas': 0,
-            'tasa_aceptacion': 0,
-            'tabs_aceptados': 0,
-            'tabs_mostrados': 0,
-            'tasa_aceptacion_tabs': 0,
-            'peticiones_totales': 0,
-            'promedio_lineas_usuario': 0
-        }
+def parsear_periodos(valor: str) -> Dict[str, Any]:
+    """
+    Interpreta el valor de --periodos: 'semana' (lunes a domingo), 'mes' (natural) o 'N-dias'.
+    
+    Returns:
+        Dict con 'tipo' ('semana', 'mes' o 'dias'), 'dias' (solo para N-dias) y 'texto'
+    
+    Raises:
+        ValueError: Si el valor no tiene ninguno de esos formatos
+    """
+    texto = str(valor).strip().lower()
+    if texto in ('semana', 'mes'):
+        return {'tipo': texto, 'dias': None, 'texto': texto}
+    coincidencia = PATRON_PERIODOS_DIAS.match(texto)
+    if coincidencia:
+        return {'tipo': 'dias', 'dias': int(coincidencia.group(1)), 'texto': texto}
+    raise ValueError(f"Valor de períodos inválido '{valor}'. Use semana, mes o N-dias (por ejemplo 14-dias)")
+
+def calcular_periodos_tendencia(fechas_unicas, periodos) -> Dict[str, Any]:
+    """
+    Agrupa las fechas únicas ordenadas en los períodos consecutivos del modo tendencia.
+    
+    Las semanas y los meses son naturales; los bloques de N días se cuentan hacia
+    atrás desde la última fecha, de modo que el último período siempre está completo.
+    
+    Returns:
+        Dict con 'tipo', 'texto' y las listas 'inicios', 'fines' (primera y última
+        fecha con datos de cada período) y 'dias' (días con datos)
+    """
+    indice = pd.DatetimeIndex(fechas_unicas)
+    dias = (indice.tz_localize(None) if indice.tz is not None else indice).normalize()
+    
+    if periodos['tipo'] == 'semana':
+        claves = dias.to_period('W-SUN').start_time
+    elif periodos['tipo'] == 'mes':
+        claves = dias.to_period('M').start_time
+    else:
+        claves = -((dias[-1] - dias).days // periodos['dias'])
+    
+    grupos = pd.Series(indice).groupby(np.asarray(claves), sort=True)
+    return {
+        'tipo': periodos['tipo'],
+        'texto': periodos['texto'],
+        'inicios': grupos.min().tolist(),
+        'fines': grupos.max().tolist(),
+        'dias': grupos.size().tolist()
+    }
+
+def calcular_division_tendencia(tendencia):
+    """Compara los dos últimos períodos del modo tendencia como período anterior y actual."""
+    info_division = {
+        'total_dias': tendencia['dias'][-2] + tendencia['dias'][-1],
+        'dias_actual': tendencia['dias'][-1],
+        'dias_anterior': tendencia['dias'][-2],
+        'periodo_anterior_inicio': tendencia['inicios'][-2],
+        'periodo_anterior_fin': tendencia['fines'][-2],
+        'periodo_actual_inicio': tendencia['inicios'][-1],
+        'periodo_actual_fin': tendencia['fines'][-1],
+        'comparativa_valida': True,
+        'modo_personalizado': False
+    }
     
-    df_activos = df[df['Is Active'] == True]
+    logger.info(f"📊 División temporal por {tendencia['texto']} ({len(tendencia['inicios'])} períodos):")
+    logger.info(f"   • Período anterior: {info_division['dias_anterior']} días ({info_division['periodo_anterior_inicio'].strftime('%d/%m')} - {info_division['periodo_anterior_fin'].strftime('%d/%m')})")
+    logger.info(f"   • Período actual: {info_division['dias_actual']} días ({info_division['periodo_actual_inicio'].strftime('%d/%m')} - {info_division['periodo_actual_fin'].strftime('%d/%m')})")
+    
+    return info_division
+
+def calcular_metricas_desde_totales(totales, usuarios_activos):
+    """
+    Calcula las métricas de un período a partir de las sumas de COLUMNAS_CONTADORES.
     
+    Args:
+        totales: Sumas de cada contador sobre las filas activas del período
+        usuarios_activos: Número de usuarios distintos con actividad en el período
+    """
     # Métricas básicas (incluyendo líneas añadidas Y eliminadas)
-    usuarios_activos = df_activos['Email'].nunique()
-    lineas_aceptadas = df_activos['Chat Accepted Lines Added'].sum() + df_activos['Chat Accepted Lines Deleted'].sum()
-    lineas_sugeridas = df_activos['Chat Suggested Lines Added'].sum() + df_activos['Chat Suggested Lines Deleted'].sum()
+    lineas_aceptadas = totales['Chat Accepted Lines Added'] + totales['Chat Accepted Lines Deleted']
+    lineas_sugeridas = totales['Chat Suggested Lines Added'] + totales['Chat Suggested Lines Deleted']
     tasa_aceptacion = (lineas_aceptadas / lineas_sugeridas * 100) if lineas_sugeridas > 0 else 0
     
     # Métricas de tabs
-    tabs_aceptados = df_activos['Tabs Accepted'].sum()
-    tabs_mostrados = df_activos['Chat Tabs Shown'].sum()
+    tabs_aceptados = totales['Tabs Accepted']
+    tabs_mostrados = totales['Chat Tabs Shown']
     tasa_aceptacion_tabs = (tabs_aceptados / tabs_mostrados * 100) if tabs_mostrados > 0 else 0
     
     # Peticiones totales
-    peticiones_totales = (
-        df_activos['Edit Requests'].sum() + 
-        df_activos['Ask Requests'].sum() + 
-        df_activos['Agent Requests'].sum() + 
-        df_activos['Cmd+K Usages'].sum() + 
-        df_activos['Subscription Included Reqs'].sum() + 
-        df_activos['API Key Reqs'].sum() + 
-        df_activos['Usage Based Reqs'].sum()
-    )
+    peticiones_totales = sum(totales[columna] for columna in COLUMNAS_PETICIONES)
     
     # Promedio por usuario
     promedio_lineas_usuario = (lineas_aceptadas / usuarios_activos) if usuarios_activos > 0 else 0
@@ -372,6 +1009,95 @@ def calcular_metricas_periodo(df, nombre_periodo=""):
         'promedio_lineas_usuario': round(promedio_lineas_usuario, 0)
     }
 
+def calcular_tendencia(agregado, tendencia) -> pd.DataFrame:
+    """
+    Calcula los KPIs de todos los períodos del modo tendencia de una sola vez.
+    
+    Equivale a aplicar calcular_metricas_desde_totales() a cada período, pero sobre
+    columnas completas, a partir de las sumas por (periodo, usuario) de agregar_bloque().
+    
+    Returns:
+        DataFrame con una fila por período: inicio, fin, dias, los KPIs de
+        METRICAS_PERIODO_VACIO y 'variacion_<kpi>' (% respecto al período previo, NaN
+        en el primero o si el valor previo es 0) para METRICAS_VARIACION_TENDENCIA
+    """
+    numero_periodos = len(tendencia['inicios'])
+    totales = agregado[COLUMNAS_CONTADORES].groupby(level='periodo').sum().reindex(range(numero_periodos), fill_value=0)
+    
+    # Usuarios distintos con actividad por período (descarta emails vacíos)
+    con_actividad = (agregado['Activos'] > 0).to_numpy() & (agregado.index.get_level_values('usuario') >= 0)
+    usuarios_activos = pd.Series(agregado.index.get_level_values('periodo')[con_actividad]).value_counts()
+    usuarios_activos = usuarios_activos.reindex(range(numero_periodos), fill_value=0).to_numpy('int64')
+    
+    def porcentaje(parte, total):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, parte / total * 100, 0.0)
+    
+    lineas_aceptadas = (totales['Chat Accepted Lines Added'] + totales['Chat Accepted Lines Deleted']).to_numpy('int64')
+    lineas_sugeridas = (totales['Chat Suggested Lines Added'] + totales['Chat Suggested Lines Deleted']).to_numpy('int64')
+    tabs_aceptados = totales['Tabs Accepted'].to_numpy('int64')
+    tabs_mostrados = totales['Chat Tabs Shown'].to_numpy('int64')
+    
+    tabla = pd.DataFrame({
+        'inicio': tendencia['inicios'],
+        'fin': tendencia['fines'],
+        'dias': tendencia['dias'],
+        'usuarios_activos': usuarios_activos,
+        'lineas_aceptadas': lineas_aceptadas,
+        'lineas_sugeridas': lineas_sugeridas,
+        'tasa_aceptacion': np.round(porcentaje(lineas_aceptadas, lineas_sugeridas), 1),
+        'tabs_aceptados': tabs_aceptados,
+        'tabs_mostrados': tabs_mostrados,
+        'tasa_aceptacion_tabs': np.round(porcentaje(tabs_aceptados, tabs_mostrados), 1),
+        'peticiones_totales': totales[COLUMNAS_PETICIONES].sum(axis=1).to_numpy('int64'),
+        'promedio_lineas_usuario': np.round(porcentaje(lineas_aceptadas, usuarios_activos) / 100, 0)
+    })
+    
+    # Variación respecto al período previo
+    for metrica in METRICAS_VARIACION_TENDENCIA:
+        valores = tabla[metrica].to_numpy(dtype=float)
+        anteriores = np.concatenate([[np.nan], valores[:-1]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tabla[f'variacion_{metrica}'] = np.where(anteriores > 0, (valores - anteriores) / anteriores * 100, np.nan)
+    
+    return tabla
+
+def calcular_matriz_retencion(agregado, numero_periodos: int) -> pd.DataFrame:
+    """
+    Calcula la matriz de retención: cohorte (período de primera actividad) x períodos posteriores.
+    
+    Los usuarios llegan como códigos enteros (codificar_usuarios()), que se compactan
+    con pd.factorize, y la actividad se guarda en una matriz booleana usuarios x
+    períodos, sin conjuntos de Python. El período de
+    primera actividad de cada usuario sale de argmax por filas y los usuarios
+    activos de cada (cohorte, desfase) se cuentan con un único np.bincount.
+    
+    Args:
+        agregado: Sumas por (periodo, usuario) del modo tendencia (ver agregar_bloque())
+        numero_periodos: Número de períodos de la tendencia
+    
+    Returns:
+        DataFrame (índice = período de la cohorte, columnas = desfase en períodos) con los
+        usuarios de cada cohorte activos en cada período posterior; la columna 0 es el
+        tamaño de la cohorte y las celdas posteriores al último período quedan a 0
+    """
+    usuarios = agregado.index.get_level_values('usuario').to_numpy()
+    con_actividad = (agregado['Activos'] > 0).to_numpy() & (usuarios >= 0)
+    periodos = agregado.index.get_level_values('periodo').to_numpy()[con_actividad].astype('int64')
+    codigos, distintos = pd.factorize(usuarios[con_actividad])
+    
+    actividad = np.zeros((len(distintos), numero_periodos), dtype=bool)
+    actividad[codigos, periodos] = True
+    primer_periodo = actividad.argmax(axis=1)
+    
+    cohorte = primer_periodo[codigos]
+    matriz = np.bincount(cohorte * numero_periodos + (periodos - cohorte), minlength=numero_periodos * numero_periodos)
+    
+    retencion = pd.DataFrame(matriz.reshape(numero_periodos, numero_periodos))
+    retencion.index.name = 'cohorte'
+    retencion.columns.name = 'desfase'
+    return retencion
+
 def calcular_indicador_comparativo(actual, anterior):
     """Calcula el indicador visual de comparación entre períodos."""
     if anterior == 0:
@@ -388,26 +1114,66 @@ def calcular_indicador_comparativo(actual, anterior):
     else:
         return f' <span class="comparison-indicator neutral">➖ {formato_numero_espanol(variacion)}%</span>'
 
-def analizar_cohortes_usuarios(df_actual, df_anterior):
-    """Analiza las cohortes de usuarios entre períodos."""
-    usuarios_actuales = set(df_actual[df_actual['Is Active'] == True]['Email'].unique())
-    usuarios_anteriores = set(df_anterior[df_anterior['Is Active'] == True]['Email'].unique()) if not df_anterior.empty else set()
+def indicadores_comparativos_lista(actuales, anteriores) -> List[str]:
+    """
+    Equivalente a calcular_indicador_comparativo() para columnas completas.
+    
+    Las posiciones sin valor anterior (NaN, como el primer período de una tendencia)
+    quedan sin indicador.
+    """
+    actuales = np.asarray(actuales, dtype=float)
+    anteriores = np.asarray(anteriores, dtype=float)
+    if actuales.size == 0:
+        return []
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variaciones = np.where(anteriores != 0, (actuales - anteriores) / anteriores * 100, 0.0)
+    textos = np.array(formato_numero_espanol_lista(np.nan_to_num(variaciones)), dtype=object)
+    
+    indicadores = np.select(
+        [np.isnan(anteriores), (anteriores == 0) & (actuales > 0), anteriores == 0, variaciones > 5, variaciones < -5],
+        [
+            '',
+            ' <span class="comparison-indicator positive">🆕 Nuevo</span>',
+            ' <span class="comparison-indicator neutral">➖ Sin cambios</span>',
+            ' <span class="comparison-indicator positive">📈 +' + textos + '%</span>',
+            ' <span class="comparison-indicator negative">📉 ' + textos + '%</span>'
+        ],
+        default=' <span class="comparison-indicator neutral">➖ ' + textos + '%</span>'
+    )
+    return indicadores.tolist()
+
+def clasificar_cohortes(usuarios_actuales, usuarios_anteriores, todos_usuarios_anteriores, tabla_usuarios):
+    """
+    Clasifica usuarios en cohortes a partir de máscaras booleanas por código de usuario.
+    
+    Las operaciones entre cohortes son vectoriales sobre las máscaras; solo los
+    emails de cada cohorte se decodifican con tabla_usuarios al final.
     
+    Args:
+        usuarios_actuales: Máscara de usuarios activos en el período actual
+        usuarios_anteriores: Máscara de usuarios activos en el período anterior
+        todos_usuarios_anteriores: Máscara de todos los usuarios del período anterior (activos o no)
+        tabla_usuarios: Email de cada código de usuario (ver codificar_usuarios())
+    """
     # Clasificar usuarios
     usuarios_consistentes = usuarios_actuales & usuarios_anteriores
-    usuarios_nuevos = usuarios_actuales - usuarios_anteriores
-    usuarios_perdidos = usuarios_anteriores - usuarios_actuales
-    usuarios_reactivados = usuarios_nuevos & set(df_anterior['Email'].unique()) if not df_anterior.empty else set()
-    usuarios_nuevos_reales = usuarios_nuevos - usuarios_reactivados
+    usuarios_nuevos = usuarios_actuales & ~usuarios_anteriores
+    usuarios_perdidos = usuarios_anteriores & ~usuarios_actuales
+    usuarios_reactivados = usuarios_nuevos & todos_usuarios_anteriores
+    usuarios_nuevos_reales = usuarios_nuevos & ~usuarios_reactivados
+    
+    total_actual = int(usuarios_actuales.sum())
+    total_anterior = int(usuarios_anteriores.sum())
     
     return {
-        'consistentes': list(usuarios_consistentes),
-        'nuevos': list(usuarios_nuevos_reales),
-        'perdidos': list(usuarios_perdidos),
-        'reactivados': list(usuarios_reactivados),
-        'total_actual': len(usuarios_actuales),
-        'total_anterior': len(usuarios_anteriores),
-        'tasa_retencion': (len(usuarios_consistentes) / len(usuarios_anteriores) * 100) if usuarios_anteriores else 0
+        'consistentes': tabla_usuarios[usuarios_consistentes].tolist(),
+        'nuevos': tabla_usuarios[usuarios_nuevos_reales].tolist(),
+        'perdidos': tabla_usuarios[usuarios_perdidos].tolist(),
+        'reactivados': tabla_usuarios[usuarios_reactivados].tolist(),
+        'total_actual': total_actual,
+        'total_anterior': total_anterior,
+        'tasa_retencion': (int(usuarios_consistentes.sum()) / total_anterior * 100) if total_anterior else 0
     }
 
 def generar_insights_comparativos(metricas_actual, metricas_anterior, cohortes, info_division):
@@ -459,16 +1225,32 @@ def generar_insights_comparativos(metricas_actual, metricas_anterior, cohortes,
     
     return insights
 
-def procesar_datos_cursor(archivo_csv, fechas_personalizadas=None):
-    """Procesa el archivo CSV con análisis comparativo temporal automático o personalizado."""
-    logger.info(f"📊 Procesando datos de {archivo_csv}...")
+def cargar_datos_cursor(archivo_csv, motor='c', desde_byte: int = 0):
+    """
+    Carga el CSV de Cursor una sola vez: lectura, validación de esquema y conversión de fechas.
+    
+    El DataFrame resultante se comparte entre la validación de fechas personalizadas
+    y el cálculo de métricas, evitando leer y parsear el mismo archivo dos veces.
+    También acepta exports en Parquet o Feather (detectados por extensión). Con
+    desde_byte > 0 solo se cargan las filas añadidas a partir de ese byte (modo --watch).
+    
+    Returns:
+        DataFrame con la columna 'Date' ya convertida, o None si hay errores críticos
+    """
+    if desde_byte:
+        logger.info(f"📊 Procesando filas añadidas a {archivo_csv} (desde el byte {desde_byte:,})...")
+    else:
+        logger.info(f"📊 Procesando datos de {archivo_csv}...")
     
     try:
-        df = pd.read_csv(archivo_csv)
+        with medir_etapa('Lectura del export') as medida:
+            df = leer_datos_cursor(archivo_csv, motor, desde_byte)
+            medida['filas'] = len(df)
         logger.info(f"✅ Archivo cargado: {len(df)} registros encontrados")
         
         # Validar esquema del CSV
-        validacion = validar_esquema_csv(df)
+        with medir_etapa('Validación del esquema', len(df)):
+            validacion = validar_esquema_csv(df)
         
         if validacion['errores']:
             logger.error("❌ Errores críticos en el CSV:")
@@ -481,10 +1263,9 @@ def procesar_datos_cursor(archivo_csv, fechas_personalizadas=None):
             for advertencia in validacion['advertencias']:
                 logger.warning(f"  • {advertencia}")
         
-        # Convertir fecha con manejo de errores
+        # Excluir fechas no válidas (validar_esquema_csv ya convirtió la columna)
         try:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            fechas_invalidas = df['Date'].isna().sum()
+            fechas_invalidas = validacion['filas']['fechas_invalidas']
             if fechas_invalidas > 0:
                 logger.warning(f"⚠️ {fechas_invalidas} fechas no válidas encontradas y excluidas")
                 df = df.dropna(subset=['Date'])
@@ -496,114 +1277,261 @@ def procesar_datos_cursor(archivo_csv, fechas_personalizadas=None):
         logger.error(f"❌ Error al leer el archivo CSV: {e}")
         return None
     
-    # DIVISIÓN TEMPORAL: PERSONALIZADA O AUTOMÁTICA
-    if fechas_personalizadas and all(fechas_personalizadas.values()):
-        logger.info("🎯 Usando fechas personalizadas especificadas por el usuario")
-        df_actual, df_anterior, info_division = dividir_periodos_personalizados(df, fechas_personalizadas)
-    else:
-        logger.info("🔄 Usando división temporal automática")
-        df_actual, df_anterior, info_division = dividir_periodos_temporales(df)
+    return df
+
+def calcular_hash_archivo(archivo, tam_bloque: int = 1024 * 1024) -> str:
+    """Calcula el SHA-256 del contenido del archivo leyéndolo por bloques."""
+    resumen = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+def leer_indice_cache(directorio_cache) -> Dict[str, Any]:
+    """Lee el índice de la caché; si no existe o está dañado devuelve uno vacío."""
+    ruta = os.path.join(directorio_cache, ARCHIVO_INDICE_CACHE)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        if indice.get('version') == VERSION_ESQUEMA_CACHE:
+            return indice
+    except (OSError, ValueError):
+        pass
+    return {'version': VERSION_ESQUEMA_CACHE, 'entradas': {}, 'origenes': {}}
+
+def escribir_atomico(ruta, escribir):
+    """Escribe en un temporal del mismo directorio y lo renombra, para no dejar archivos a medias."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def guardar_indice_cache(directorio_cache, indice):
+    """Guarda el índice de la caché de forma atómica."""
+    def escribir(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, indent=1)
+    escribir_atomico(os.path.join(directorio_cache, ARCHIVO_INDICE_CACHE), escribir)
+
+def podar_cache(directorio_cache, indice, max_entradas: int = CACHE_MAX_ENTRADAS, max_bytes: int = CACHE_MAX_BYTES):
+    """Elimina las entradas menos usadas recientemente hasta respetar los límites de número y tamaño."""
+    entradas = indice['entradas']
+    por_uso = sorted(entradas, key=lambda clave: entradas[clave]['ultimo_uso'])
+    total_bytes = sum(entrada['bytes'] for entrada in entradas.values())
+    
+    while por_uso and (len(entradas) > max_entradas or total_bytes > max_bytes):
+        clave = por_uso.pop(0)
+        entrada = entradas.pop(clave)
+        total_bytes -= entrada['bytes']
+        try:
+            os.remove(os.path.join(directorio_cache, entrada['archivo']))
+        except OSError:
+            pass
+        logger.debug(f"🗑️ Caché: eliminada entrada {clave[:12]} ({entrada['bytes']:,} bytes)")
+    
+    # Olvidar los hashes memorizados de archivos cuyos datos ya no están en caché
+    indice['origenes'] = {
+        ruta: origen for ruta, origen in indice['origenes'].items() if origen['clave'] in entradas
+    }
+
+def clave_cache_archivo(archivo, indice) -> str:
+    """
+    Clave de caché: hash del contenido más versión del esquema y de pandas.
     
-    # Calcular métricas para ambos períodos
-    metricas_actual = calcular_metricas_periodo(df_actual, "actual")
-    metricas_anterior = calcular_metricas_periodo(df_anterior, "anterior")
+    El hash se memoriza por ruta, tamaño y fecha de modificación para no releer
+    el archivo completo cuando no ha cambiado.
+    """
+    ruta = os.path.abspath(archivo)
+    estado = os.stat(ruta)
+    origen = indice['origenes'].get(ruta)
+    if origen and origen['tamano'] == estado.st_size and origen['mtime'] == estado.st_mtime_ns:
+        return origen['clave']
+    
+    base = f"{calcular_hash_archivo(ruta)}-v{VERSION_ESQUEMA_CACHE}-pandas{pd.__version__}"
+    clave = hashlib.sha256(base.encode('utf-8')).hexdigest()
+    indice['origenes'][ruta] = {'tamano': estado.st_size, 'mtime': estado.st_mtime_ns, 'clave': clave}
+    return clave
+
+def cargar_datos_con_cache(archivo_csv, motor='c', directorio_cache=DIRECTORIO_CACHE_DEFECTO):
+    """
+    Carga los datos validados desde la caché en disco o, si no están, con cargar_datos_cursor().
     
-    # Análisis de cohortes
-    cohortes = analizar_cohortes_usuarios(df_actual, df_anterior)
+    Se guardan las filas ya validadas y tipadas (una por día y usuario en los exports
+    de Cursor), de modo que cambiar de plantilla o de rango de fechas no vuelve a
+    parsear el CSV. Cualquier fallo de la caché se trata como un fallo de caché y
+    se cargan los datos del archivo original.
     
-    # Generar insights comparativos
-    insights = generar_insights_comparativos(metricas_actual, metricas_anterior, cohortes, info_division)
+    Returns:
+        DataFrame con la columna 'Date' ya convertida, o None si hay errores críticos
+    """
+    try:
+        os.makedirs(directorio_cache, exist_ok=True)
+        indice = leer_indice_cache(directorio_cache)
+        with medir_etapa('Clave de caché'):
+            clave = clave_cache_archivo(archivo_csv, indice)
+    except OSError as e:
+        logger.warning(f"⚠️ Caché no disponible ({e}), se procesa el archivo original")
+        return cargar_datos_cursor(archivo_csv, motor)
+    
+    entrada = indice['entradas'].get(clave)
+    if entrada:
+        try:
+            with medir_etapa('Lectura desde caché') as medida:
+                df = pd.read_pickle(os.path.join(directorio_cache, entrada['archivo']))
+                medida['filas'] = len(df)
+            entrada['ultimo_uso'] = time.time()
+            guardar_indice_cache(directorio_cache, indice)
+            logger.info(f"♻️ Datos cargados desde caché: {len(df)} registros ({directorio_cache})")
+            return df
+        except Exception as e:
+            logger.warning(f"⚠️ Entrada de caché no válida ({e}), se regenera")
+            indice['entradas'].pop(clave, None)
     
-    # Métricas del período actual (NO todo el período)
-    df_actual_activos = df_actual[df_actual['Is Active'] == True]
-    total_usuarios_actual = df_actual['Email'].nunique()
-    usuarios_activos_actual = df_actual_activos['Email'].nunique()
-    tasa_adopcion_actual = round((usuarios_activos_actual / total_usuarios_actual) * 100, 1)
-    
-    # Usuarios inactivos del período actual
-    usuarios_con_actividad_actual = set(df_actual_activos['Email'].unique())
-    todos_usuarios_actual = set(df_actual['Email'].unique())
-    usuarios_inactivos_actual = list(todos_usuarios_actual - usuarios_con_actividad_actual)
-    usuarios_inactivos_actual = [email for email in usuarios_inactivos_actual if pd.notna(email) and email.strip()]
-    # Ordenar alfabéticamente los usuarios inactivos
-    usuarios_inactivos_actual = sorted(usuarios_inactivos_actual)
-    
-    # Rankings del período actual
-    # Top productividad con líneas totales (Added + Deleted)
-    df_actual_activos = df_actual_activos.copy()  # Evitar SettingWithCopyWarning
-    df_actual_activos['Chat Accepted Lines Total'] = (
-        df_actual_activos['Chat Accepted Lines Added'] + 
-        df_actual_activos['Chat Accepted Lines Deleted']
-    )
-    top_productividad = (df_actual_activos.groupby('Email')['Chat Accepted Lines Total']
-                        .sum()
-                        .sort_values(ascending=False)
-                        .head(10))
-    
-    df_actual_activos = df_actual_activos.copy()
-    df_actual_activos['Total_Requests'] = (
-        df_actual_activos['Edit Requests'] + 
-        df_actual_activos['Ask Requests'] + 
-        df_actual_activos['Agent Requests'] + 
-        df_actual_activos['Cmd+K Usages'] + 
-        df_actual_activos['Subscription Included Reqs'] + 
-        df_actual_activos['API Key Reqs'] + 
-        df_actual_activos['Usage Based Reqs']
-    )
+    df = cargar_datos_cursor(archivo_csv, motor)
+    if df is None:
+        return None
     
-    top_peticiones = (df_actual_activos.groupby('Email')['Total_Requests']
-                     .sum()
-                     .sort_values(ascending=False)
-                     .head(10))
-    
-    # Tecnologías más utilizadas (período actual) con líneas totales
-    extensiones_activas = df_actual_activos[df_actual_activos['Chat Accepted Lines Total'] > 0]
-    top_extensiones = (extensiones_activas.groupby('Most Used Tab Extension').agg({
-        'Chat Accepted Lines Total': 'sum',
-        'Email': 'nunique'
-    }).sort_values('Chat Accepted Lines Total', ascending=False).head(8))
-    
-    # Modelos de IA más utilizados (período actual)
-    modelos_uso = df_actual_activos['Most Used Model'].value_counts().head(6)
-    
-    # Versiones de cliente (período actual)
-    versiones_cliente = df_actual_activos[df_actual_activos['Client Version'].notna()]
-    versiones_uso = versiones_cliente['Client Version'].value_counts().head(8)
-    
-    # Evolución temporal por días (SOLO período desde inicio anterior hasta fin actual)
-    fecha_inicio_grafico = info_division['periodo_anterior_inicio']
-    fecha_fin_grafico = info_division['periodo_actual_fin']
-    
-    # Filtrar datos solo para el período de los gráficos (anterior + actual)
-    df_grafico = df[(df['Date'] >= fecha_inicio_grafico) & (df['Date'] <= fecha_fin_grafico)]
-    df_grafico_activos = df_grafico[df_grafico['Is Active'] == True]
-    
-    evolucion_diaria = df_grafico_activos.groupby('Date').agg({
-        'Chat Accepted Lines Added': 'sum',
-        'Chat Accepted Lines Deleted': 'sum', 
-        'Chat Suggested Lines Added': 'sum',
-        'Chat Suggested Lines Deleted': 'sum',
-        'Tabs Accepted': 'sum',
-        'Chat Tabs Shown': 'sum',
-        'Email': 'nunique'
-    }).reset_index()
-    
-    # Calcular totales (Added + Deleted) para el gráfico
-    evolucion_diaria['Chat Accepted Lines Total'] = evolucion_diaria['Chat Accepted Lines Added'] + evolucion_diaria['Chat Accepted Lines Deleted']
-    evolucion_diaria['Chat Suggested Lines Total'] = evolucion_diaria['Chat Suggested Lines Added'] + evolucion_diaria['Chat Suggested Lines Deleted']
-    evolucion_diaria = evolucion_diaria.sort_values('Date')
+    try:
+        nombre = f"{clave}.pkl"
+        ruta = os.path.join(directorio_cache, nombre)
+        with medir_etapa('Escritura en caché', len(df)):
+            escribir_atomico(ruta, df.to_pickle)
+        indice['entradas'][clave] = {
+            'archivo': nombre,
+            'origen': os.path.basename(archivo_csv),
+            'bytes': os.path.getsize(ruta),
+            'ultimo_uso': time.time()
+        }
+        podar_cache(directorio_cache, indice)
+        guardar_indice_cache(directorio_cache, indice)
+        logger.debug(f"💾 Datos guardados en caché: {ruta}")
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar la caché: {e}")
     
-    # Fechas formateadas en español
-    fecha_inicio_actual = formatear_fecha_espanol(info_division['periodo_actual_inicio'])
-    fecha_fin_actual = formatear_fecha_espanol(info_division['periodo_actual_fin'])
-    fecha_inicio_anterior = formatear_fecha_espanol(info_division['periodo_anterior_inicio'])
-    fecha_fin_anterior = formatear_fecha_espanol(info_division['periodo_anterior_fin'])
+    return df
+
+def leer_indice_informes(directorio_cache) -> Dict[str, Any]:
+    """Lee el índice de informes generados; si no existe o está dañado devuelve uno vacío."""
+    ruta = os.path.join(directorio_cache, ARCHIVO_INDICE_INFORMES)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        if indice.get('version') == VERSION_CACHE_INFORMES:
+            return indice
+    except (OSError, ValueError):
+        pass
+    return {'version': VERSION_CACHE_INFORMES, 'informes': {}, 'huellas': {}}
+
+def estado_archivo(ruta) -> List[int]:
+    """Tamaño y fecha de modificación (ns) de un archivo, para detectar si ha cambiado."""
+    estado = os.stat(ruta)
+    return [estado.st_size, estado.st_mtime_ns]
+
+def calcular_hash_memorizado(ruta, huellas) -> str:
+    """calcular_hash_archivo() memorizado en `huellas` por ruta, tamaño y fecha de modificación."""
+    ruta = os.path.abspath(ruta)
+    estado = estado_archivo(ruta)
+    huella = huellas.get(ruta)
+    if huella and huella['estado'] == estado:
+        return huella['sha256']
+    
+    resumen = calcular_hash_archivo(ruta)
+    huellas[ruta] = {'estado': estado, 'sha256': resumen}
+    return resumen
+
+def salidas_informe(args) -> List[str]:
+    """Rutas absolutas de los archivos que genera una ejecución: informe HTML y exportaciones."""
+    return [os.path.abspath(ruta) for ruta in (args.salida, args.export_json, args.export_parquet) if ruta]
+
+def consultar_cache_informes(args) -> Optional[Dict[str, Any]]:
+    """
+    Comprueba si el informe de esta ejecución ya se generó con los mismos datos, plantilla y opciones.
     
-    return {
-        'periodo': {
-            'inicio': fecha_inicio_actual,
-            'fin': fecha_fin_actual,
-            'anterior_inicio': fecha_inicio_anterior,
+    La clave combina el SHA-256 del archivo de datos, de la plantilla y del propio
+    generador con las opciones que cambian el resultado (OPCIONES_CLAVE_INFORME) y las
+    rutas de salida. Además, el informe y las exportaciones deben seguir en disco sin
+    modificar desde que se generaron. No carga los datos ni importa pandas.
+    
+    Returns:
+        Dict con 'indice', 'clave' y 'vigente' (se pasa a registrar_cache_informes()),
+        o None si la caché no está disponible
+    """
+    try:
+        indice = leer_indice_informes(args.directorio_cache)
+        huellas = indice['huellas']
+        componentes = {
+            'datos': calcular_hash_memorizado(args.archivo_csv, huellas),
+            'plantilla': calcular_hash_memorizado(args.plantilla, huellas),
+            'generador': calcular_hash_memorizado(__file__, huellas),
+            'salidas': salidas_informe(args),
+            **{opcion: getattr(args, opcion) for opcion in OPCIONES_CLAVE_INFORME}
+        }
+        clave = hashlib.sha256(json.dumps(componentes, sort_keys=True).encode('utf-8')).hexdigest()
+        
+        registro = indice['informes'].get(os.path.abspath(args.salida))
+        vigente = bool(registro) and registro['clave'] == clave and all(
+            os.path.isfile(ruta) and estado_archivo(ruta) == estado for ruta, estado in registro['salidas'].items()
+        )
+    except OSError as e:
+        logger.warning(f"⚠️ Caché de informes no disponible ({e})")
+        return None
+    
+    return {'indice': indice, 'clave': clave, 'vigente': vigente}
+
+def registrar_cache_informes(args, consulta):
+    """Anota en la caché el informe recién generado (resultado de consultar_cache_informes())."""
+    indice = consulta['indice']
+    try:
+        indice['informes'][os.path.abspath(args.salida)] = {
+            'clave': consulta['clave'],
+            'salidas': {ruta: estado_archivo(ruta) for ruta in salidas_informe(args)}
+        }
+        # Olvidar informes y huellas de archivos que ya no existen
+        indice['informes'] = {ruta: registro for ruta, registro in indice['informes'].items() if os.path.isfile(ruta)}
+        indice['huellas'] = {ruta: huella for ruta, huella in indice['huellas'].items() if os.path.isfile(ruta)}
+        
+        os.makedirs(args.directorio_cache, exist_ok=True)
+        
+        def escribir(ruta):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(indice, f, indent=1)
+        escribir_atomico(os.path.join(args.directorio_cache, ARCHIVO_INDICE_INFORMES), escribir)
+        logger.debug(f"💾 Informe registrado en la caché de informes: {args.salida}")
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudo guardar la caché de informes: {e}")
+
+def listar_usuarios_inactivos(todos_usuarios, usuarios_activos, tabla_usuarios):
+    """
+    Devuelve los usuarios sin actividad ordenados alfabéticamente (descarta emails vacíos).
+    
+    Recibe máscaras booleanas por código de usuario; solo se decodifican los inactivos.
+    """
+    usuarios_inactivos = tabla_usuarios[todos_usuarios & ~usuarios_activos]
+    usuarios_inactivos = usuarios_inactivos[usuarios_inactivos.astype(str).str.strip() != '']
+    # Ordenar alfabéticamente los usuarios inactivos
+    return sorted(usuarios_inactivos.tolist())
+
+def ensamblar_metricas(info_division, metricas_actual, metricas_anterior, cohortes,
+                       total_usuarios_actual, usuarios_activos_actual, usuarios_inactivos_actual,
+                       rankings, evolucion_diaria):
+    """Construye el diccionario de métricas que consumen la plantilla y el resumen final."""
+    # Fechas formateadas en español
+    fecha_inicio_actual = formatear_fecha_espanol(info_division['periodo_actual_inicio'])
+    fecha_fin_actual = formatear_fecha_espanol(info_division['periodo_actual_fin'])
+    fecha_inicio_anterior = formatear_fecha_espanol(info_division['periodo_anterior_inicio'])
+    fecha_fin_anterior = formatear_fecha_espanol(info_division['periodo_anterior_fin'])
+    
+    # Generar insights comparativos
+    insights = generar_insights_comparativos(metricas_actual, metricas_anterior, cohortes, info_division)
+    
+    return {
+        'periodo': {
+            'inicio': fecha_inicio_actual,
+            'fin': fecha_fin_actual,
+            'anterior_inicio': fecha_inicio_anterior,
             'anterior_fin': fecha_fin_anterior,
             'comparativa_valida': info_division['comparativa_valida'],
             'dias_actual': info_division['dias_actual'],
@@ -613,7 +1541,7 @@ def procesar_datos_cursor(archivo_csv, fechas_personalizadas=None):
             'total': total_usuarios_actual,
             'activos': usuarios_activos_actual,
             'inactivos': len(usuarios_inactivos_actual),
-            'tasa_adopcion': tasa_adopcion_actual,
+            'tasa_adopcion': round((usuarios_activos_actual / total_usuarios_actual) * 100, 1),
             'lista_inactivos': usuarios_inactivos_actual
         },
         'codigo': {
@@ -632,16 +1560,527 @@ def procesar_datos_cursor(archivo_csv, fechas_personalizadas=None):
         'metricas_anterior': metricas_anterior,
         'cohortes': cohortes,
         'insights': insights,
-        'rankings': {
+        'rankings': rankings,
+        'evolucion': evolucion_diaria,
+        'info_division': info_division
+    }
+
+def codificar_usuarios(emails, tabla_usuarios=None) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Codifica la columna Email como enteros int32 sobre una tabla de emails compartida.
+    
+    La tabla es un pd.Index con el email de cada código (las categorías de la columna,
+    ya factorizada al cargar los datos). Si se recibe la tabla de bloques anteriores,
+    se amplía con los emails nuevos conservando los códigos ya asignados. Los emails
+    vacíos (NaN) reciben el código -1.
+    
+    Returns:
+        Tupla (códigos, tabla_usuarios)
+    """
+    columna = emails if isinstance(emails.dtype, pd.CategoricalDtype) else emails.astype('category')
+    categorias = columna.cat.categories
+    codigos = columna.cat.codes.to_numpy().astype('int32')
+    if tabla_usuarios is None or categorias.equals(tabla_usuarios):
+        return codigos, categorias
+    if len(categorias) == 0:
+        return codigos, tabla_usuarios
+    
+    # Traducir los códigos del bloque a los de la tabla compartida (una vez por email distinto)
+    nuevos = categorias.difference(tabla_usuarios, sort=False)
+    tabla_usuarios = tabla_usuarios.append(nuevos) if len(nuevos) else tabla_usuarios
+    traduccion = tabla_usuarios.get_indexer(categorias).astype('int32')
+    return np.where(codigos >= 0, traduccion[np.maximum(codigos, 0)], -1).astype('int32'), tabla_usuarios
+
+def agregar_bloque(df, info_division, tabla_usuarios=None):
+    """
+    Reduce un bloque de filas a agregados parciales por período, usuario y día.
+    
+    Los usuarios se agrupan por su código entero (codificar_usuarios()), nunca por
+    el texto del email. Los agregados de varios bloques se combinan con
+    combinar_agregados() y metricas_desde_agregados() obtiene de ellos exactamente
+    las mismas métricas que el cálculo sobre el DataFrame completo.
+    
+    Args:
+        df: Registros del bloque
+        info_division: División temporal (ver determinar_division_temporal())
+        tabla_usuarios: Tabla de emails de los bloques anteriores, para compartir códigos (opcional)
+    
+    Returns:
+        Dict con las tablas parciales:
+        - 'usuarios': sumas de contadores (filas activas), registros y filas activas por (periodo, usuario)
+        - 'extensiones': líneas aceptadas por (extensión, usuario) en filas activas del período actual
+        - 'modelos' / 'versiones': conteos por orden de aparición en filas activas del período actual
+        - 'evolucion': sumas diarias de filas activas en el rango de gráficos
+        - 'usuarios_dia': pares (Date, usuario) distintos con actividad en el rango de gráficos
+        - 'tendencia': sumas de contadores y filas activas por (periodo de tendencia, usuario),
+          solo si info_division incluye los períodos del modo tendencia
+        - 'tabla_usuarios': email de cada código de usuario
+    """
+    codigos, tabla_usuarios = codificar_usuarios(df['Email'], tabla_usuarios)
+    fechas = df['Date']
+    en_anterior = ((fechas >= info_division['periodo_anterior_inicio']) & (fechas <= info_division['periodo_anterior_fin'])).to_numpy()
+    en_actual = ((fechas >= info_division['periodo_actual_inicio']) & (fechas <= info_division['periodo_actual_fin'])).to_numpy()
+    en_grafico = ((fechas >= info_division['periodo_anterior_inicio']) & (fechas <= info_division['periodo_actual_fin'])).to_numpy()
+    activo = (df['Is Active'] == True).to_numpy()
+    
+    # Contadores anulados en filas inactivas, más totales por fila para los rankings
+    valores = df[COLUMNAS_CONTADORES].mul(activo, axis=0)
+    valores['Chat Accepted Lines Total'] = valores['Chat Accepted Lines Added'] + valores['Chat Accepted Lines Deleted']
+    valores['Total_Requests'] = valores[COLUMNAS_PETICIONES[0]]
+    for columna in COLUMNAS_PETICIONES[1:]:
+        valores['Total_Requests'] = valores['Total_Requests'] + valores[columna]
+    valores['Registros'] = 1
+    valores['Activos'] = activo.astype('int32')
+    
+    if (en_anterior & en_actual).any():
+        # Períodos personalizados solapados: las filas comunes cuentan en ambos
+        partes = [
+            valores[mascara].groupby(codigos[mascara]).sum()
+            for mascara in (en_anterior, en_actual)
+        ]
+        usuarios = pd.concat(partes, keys=PERIODOS, names=['periodo', 'usuario'])
+    else:
+        periodo = pd.Categorical.from_codes(np.select([en_anterior, en_actual], [0, 1], -1), categories=PERIODOS)
+        usuarios = valores.groupby([periodo, codigos], observed=True).sum()
+        usuarios.index.names = ['periodo', 'usuario']
+        usuarios = usuarios[usuarios.index.get_level_values('periodo').notna()]
+    
+    # Tecnologías, modelos y versiones del período actual
+    actual_activo = en_actual & activo
+    con_lineas = actual_activo & (valores['Chat Accepted Lines Total'] > 0).to_numpy()
+    extensiones = valores.loc[con_lineas, 'Chat Accepted Lines Total'].groupby(
+        [df['Most Used Tab Extension'][con_lineas], codigos[con_lineas]], observed=True, dropna=False
+    ).sum()
+    modelos = contar_por_aparicion(df['Most Used Model'][actual_activo])
+    versiones = contar_por_aparicion(df['Client Version'][actual_activo])
+    
+    # Evolución diaria del rango de gráficos
+    grafico_activo = en_grafico & activo
+    evolucion = df.loc[grafico_activo, COLUMNAS_EVOLUCION].groupby(fechas[grafico_activo]).sum()
+    usuarios_dia = df.loc[grafico_activo, ['Date']].assign(usuario=codigos[grafico_activo]).drop_duplicates()
+    
+    agregados = {
+        'usuarios': usuarios,
+        'extensiones': extensiones,
+        'modelos': modelos,
+        'versiones': versiones,
+        'evolucion': evolucion,
+        'usuarios_dia': usuarios_dia,
+        'tabla_usuarios': tabla_usuarios
+    }
+    
+    # Modo tendencia: cada fila va al último período que empieza en o antes de su fecha
+    if 'tendencia' in info_division:
+        periodo_tendencia = pd.Index(info_division['tendencia']['inicios']).searchsorted(fechas, side='right') - 1
+        en_tendencia = periodo_tendencia >= 0
+        tendencia = valores.loc[en_tendencia, COLUMNAS_CONTADORES + ['Activos']].groupby(
+            [periodo_tendencia[en_tendencia], codigos[en_tendencia]]
+        ).sum()
+        tendencia.index.names = ['periodo', 'usuario']
+        agregados['tendencia'] = tendencia
+    
+    return agregados
+
+def combinar_agregados(acumulado, parcial):
+    """
+    Combina los agregados parciales de un bloque con los acumulados hasta el momento.
+    
+    El parcial debe calcularse con la tabla de usuarios del acumulado
+    (agregar_bloque(bloque, info_division, acumulado['tabla_usuarios'])) para que
+    los códigos de usuario de ambos coincidan.
+    """
+    if acumulado is None:
+        return parcial
+    
+    def sumar(tablas):
+        combinada = pd.concat(tablas)
+        return combinada.groupby(level=list(range(combinada.index.nlevels)), sort=False, dropna=False).sum()
+    
+    combinados = {
+        'usuarios': sumar([acumulado['usuarios'], parcial['usuarios']]),
+        'extensiones': sumar([acumulado['extensiones'], parcial['extensiones']]),
+        'modelos': sumar([acumulado['modelos'], parcial['modelos']]),
+        'versiones': sumar([acumulado['versiones'], parcial['versiones']]),
+        'evolucion': sumar([acumulado['evolucion'], parcial['evolucion']]),
+        'usuarios_dia': pd.concat([acumulado['usuarios_dia'], parcial['usuarios_dia']]).drop_duplicates(),
+        'tabla_usuarios': parcial['tabla_usuarios']
+    }
+    if 'tendencia' in parcial:
+        combinados['tendencia'] = sumar([acumulado['tendencia'], parcial['tendencia']])
+    return combinados
+
+def metricas_desde_agregados(agregados, info_division):
+    """Calcula el diccionario de métricas completo a partir de los agregados combinados."""
+    usuarios = agregados['usuarios']
+    tabla_usuarios = agregados['tabla_usuarios']
+    periodos_presentes = set(usuarios.index.get_level_values('periodo'))
+    por_periodo = {
+        periodo: usuarios.xs(periodo, level='periodo') if periodo in periodos_presentes else usuarios.iloc[0:0].droplevel('periodo')
+        for periodo in PERIODOS
+    }
+    
+    def mascara_usuarios(tabla):
+        """Máscara booleana sobre tabla_usuarios de los códigos de la tabla (sin el -1 de emails vacíos)."""
+        codigos = tabla.index.to_numpy()
+        mascara = np.zeros(len(tabla_usuarios), dtype=bool)
+        mascara[codigos[codigos >= 0]] = True
+        return mascara
+    
+    activos = {periodo: tabla[tabla['Activos'] > 0] for periodo, tabla in por_periodo.items()}
+    usuarios_activos = {periodo: mascara_usuarios(tabla) for periodo, tabla in activos.items()}
+    
+    # Métricas para ambos períodos
+    metricas = {}
+    for periodo, tabla in por_periodo.items():
+        if tabla.empty:
+            metricas[periodo] = dict(METRICAS_PERIODO_VACIO)
+        else:
+            metricas[periodo] = calcular_metricas_desde_totales(
+                tabla[COLUMNAS_CONTADORES].sum(), int(usuarios_activos[periodo].sum())
+            )
+    
+    # Análisis de cohortes y usuarios del período actual
+    cohortes = clasificar_cohortes(
+        usuarios_activos['actual'], usuarios_activos['anterior'], mascara_usuarios(por_periodo['anterior']), tabla_usuarios
+    )
+    todos_usuarios_actual = mascara_usuarios(por_periodo['actual'])
+    usuarios_inactivos_actual = listar_usuarios_inactivos(todos_usuarios_actual, usuarios_activos['actual'], tabla_usuarios)
+    
+    # Rankings del período actual: mismo orden de desempate que groupby('Email') (alfabético),
+    # ordenando por la posición alfabética de cada código y decodificando solo los primeros
+    posicion_alfabetica = np.empty(len(tabla_usuarios), dtype='int64')
+    posicion_alfabetica[tabla_usuarios.argsort()] = np.arange(len(tabla_usuarios))
+    ranking = activos['actual'][activos['actual'].index >= 0]
+    ranking = ranking.iloc[np.argsort(posicion_alfabetica[ranking.index.to_numpy()], kind='stable')]
+    
+    def decodificar_ranking(serie):
+        serie.index = pd.Index(tabla_usuarios.take(serie.index.to_numpy()), name='Email')
+        return serie
+    
+    top_productividad = decodificar_ranking(ranking['Chat Accepted Lines Total'].sort_values(ascending=False).head(10))
+    top_peticiones = decodificar_ranking(ranking['Total_Requests'].sort_values(ascending=False).head(10))
+    
+    extensiones = agregados['extensiones']
+    extensiones = extensiones[extensiones.index.get_level_values(0).notna()]
+    extensiones.index = pd.MultiIndex.from_arrays(
+        [extensiones.index.get_level_values(0).astype(str), extensiones.index.get_level_values(1)]
+    )
+    usuarios_extension = pd.Series(extensiones.index.get_level_values(1) >= 0, index=extensiones.index)
+    top_extensiones = pd.DataFrame({
+        'Chat Accepted Lines Total': extensiones.groupby(level=0).sum(),
+        'Email': usuarios_extension.groupby(level=0).sum()
+    })
+    top_extensiones.index.name = 'Most Used Tab Extension'
+    top_extensiones = top_extensiones.sort_values('Chat Accepted Lines Total', ascending=False).head(8)
+    
+    modelos_uso = agregados['modelos'].sort_values(ascending=False, kind='stable').head(6)
+    versiones_uso = agregados['versiones'].sort_values(ascending=False, kind='stable').head(8)
+    
+    # Evolución temporal por días
+    usuarios_dia = agregados['usuarios_dia'][agregados['usuarios_dia']['usuario'] >= 0]
+    evolucion_diaria = agregados['evolucion'].sort_index()
+    evolucion_diaria.index.name = 'Date'
+    evolucion_diaria['Email'] = usuarios_dia.groupby('Date').size().reindex(evolucion_diaria.index, fill_value=0)
+    evolucion_diaria = evolucion_diaria.reset_index()
+    evolucion_diaria['Chat Accepted Lines Total'] = evolucion_diaria['Chat Accepted Lines Added'] + evolucion_diaria['Chat Accepted Lines Deleted']
+    evolucion_diaria['Chat Suggested Lines Total'] = evolucion_diaria['Chat Suggested Lines Added'] + evolucion_diaria['Chat Suggested Lines Deleted']
+    
+    resultado = ensamblar_metricas(
+        info_division, metricas['actual'], metricas['anterior'], cohortes,
+        int(todos_usuarios_actual.sum()), int(usuarios_activos['actual'].sum()), usuarios_inactivos_actual,
+        {
             'top_productividad': top_productividad,
             'top_peticiones': top_peticiones,
             'top_extensiones': top_extensiones,
             'modelos_uso': modelos_uso,
             'versiones_uso': versiones_uso
         },
-        'evolucion': evolucion_diaria,
-        'info_division': info_division
-    }
+        evolucion_diaria
+    )
+    
+    # KPIs y matriz de retención de todos los períodos del modo tendencia
+    if 'tendencia' in agregados:
+        resultado['tendencia'] = calcular_tendencia(agregados['tendencia'], info_division['tendencia'])
+        resultado['retencion'] = calcular_matriz_retencion(agregados['tendencia'], len(info_division['tendencia']['inicios']))
+    
+    return resultado
+
+def determinar_division_temporal(fechas_unicas, fechas_personalizadas=None, periodos=None):
+    """
+    Elige la división temporal personalizada o automática a partir de las fechas únicas ordenadas.
+    
+    Con `periodos` (ver parsear_periodos()) se añaden a info_division los períodos del
+    modo tendencia en 'tendencia' y, si no hay fechas personalizadas, se comparan los
+    dos últimos períodos.
+    
+    Returns:
+        info_division con los límites de ambos períodos
+    """
+    tendencia = calcular_periodos_tendencia(fechas_unicas, periodos) if periodos and len(fechas_unicas) > 0 else None
+    
+    if fechas_personalizadas and all(fechas_personalizadas.values()):
+        logger.info("🎯 Usando fechas personalizadas especificadas por el usuario")
+        # Crear timestamps con la misma zona horaria que los datos
+        tz = pd.Timestamp(fechas_unicas[0]).tz if len(fechas_unicas) > 0 else None
+        info_division = calcular_division_personalizada(fechas_unicas, fechas_personalizadas, tz)
+    elif tendencia and len(tendencia['inicios']) >= 2:
+        logger.info(f"📆 Usando modo tendencia por {tendencia['texto']}")
+        info_division = calcular_division_tendencia(tendencia)
+    else:
+        if tendencia:
+            logger.warning(f"⚠️ Un solo período de {tendencia['texto']} en los datos; se usa la división automática")
+        logger.info("🔄 Usando división temporal automática")
+        info_division = calcular_division_automatica(fechas_unicas)
+    
+    if tendencia:
+        info_division['tendencia'] = tendencia
+    return info_division
+
+def procesar_datos_cursor(datos, fechas_personalizadas=None, motor='c', periodos=None):
+    """
+    Procesa los datos de Cursor con análisis comparativo temporal automático o personalizado.
+    
+    Cada fila se etiqueta con su período una sola vez y todas las métricas (KPIs de
+    ambos períodos, rankings, cohortes y evolución) salen de la misma agregación
+    por (periodo, Email) de agregar_bloque(), sin copias filtradas por período.
+    
+    Args:
+        datos: DataFrame ya cargado con cargar_datos_cursor() o ruta al archivo CSV
+        fechas_personalizadas: Fechas validadas con validar_y_parsear_fechas() (opcional)
+        motor: Parser CSV a usar cuando se recibe una ruta ('c' o 'pyarrow')
+        periodos: Agrupación del modo tendencia, ver parsear_periodos() (opcional)
+    """
+    if isinstance(datos, pd.DataFrame):
+        df = datos
+    else:
+        df = cargar_datos_cursor(datos, motor)
+        if df is None:
+            return None
+    
+    # DIVISIÓN TEMPORAL: PERSONALIZADA O AUTOMÁTICA
+    with medir_etapa('División temporal', len(df)):
+        info_division = determinar_division_temporal(sorted(df['Date'].unique()), fechas_personalizadas, periodos)
+    
+    return calcular_metricas_agregadas(df, info_division)
+
+def calcular_metricas_agregadas(df, info_division):
+    """Agrega todos los registros en una pasada y calcula las métricas (etapas 'Agregación' y 'Métricas' de --profile)."""
+    with medir_etapa('Agregación', len(df)):
+        agregados = agregar_bloque(df, info_division)
+    with medir_etapa('Métricas', len(agregados['usuarios'])):
+        return metricas_desde_agregados(agregados, info_division)
+
+def procesar_datos_cursor_por_bloques(archivo, fechas_unicas, fechas_personalizadas=None, filas_bloque=FILAS_BLOQUE_DEFECTO, periodos=None):
+    """
+    Procesa un export de Cursor por bloques, sin cargarlo entero en memoria.
+    
+    Cada bloque se reduce con agregar_bloque() y los parciales se combinan, por lo
+    que la memoria depende del tamaño de bloque y del número de usuarios y días,
+    no del tamaño del archivo. Las métricas resultantes son idénticas a las de
+    procesar_datos_cursor().
+    
+    Args:
+        archivo: Ruta al export (.csv, .parquet o .feather)
+        fechas_unicas: Fechas únicas ordenadas del export (ver leer_fechas_cursor())
+        fechas_personalizadas: Fechas validadas con validar_y_parsear_fechas() (opcional)
+        filas_bloque: Número de filas por bloque
+        periodos: Agrupación del modo tendencia, ver parsear_periodos() (opcional)
+    """
+    logger.info(f"📊 Procesando datos de {archivo} por bloques de {filas_bloque} filas...")
+    
+    # DIVISIÓN TEMPORAL: PERSONALIZADA O AUTOMÁTICA (solo requiere las fechas)
+    with medir_etapa('División temporal', len(fechas_unicas)):
+        info_division = determinar_division_temporal(fechas_unicas, fechas_personalizadas, periodos)
+    
+    for relajar_tipos in (False, True):
+        agregados = None
+        registros = 0
+        try:
+            for numero, bloque in enumerate(leer_bloques_cursor(archivo, filas_bloque, relajar_tipos)):
+                # Validar cada bloque (convierte tipos); las advertencias se muestran del primero
+                with medir_etapa('Validación del esquema', len(bloque)):
+                    validacion = validar_esquema_csv(bloque)
+                if validacion['errores']:
+                    logger.error("❌ Errores críticos en el CSV:")
+                    for error in validacion['errores']:
+                        logger.error(f"  • {error}")
+                    return None
+                if numero == 0 and validacion['advertencias']:
+                    logger.warning("⚠️ Advertencias en el CSV (primer bloque):")
+                    for advertencia in validacion['advertencias']:
+                        logger.warning(f"  • {advertencia}")
+                
+                tabla_usuarios = agregados['tabla_usuarios'] if agregados else None
+                with medir_etapa('Agregación', len(bloque)):
+                    agregados = combinar_agregados(agregados, agregar_bloque(bloque, info_division, tabla_usuarios))
+                registros += len(bloque)
+                logger.debug(f"Bloque {numero + 1} procesado: {registros} registros acumulados")
+            break
+        except ValueError as e:
+            if relajar_tipos:
+                logger.error(f"❌ Error al leer el archivo por bloques: {e}")
+                return None
+            logger.warning(f"⚠️ No se pudieron aplicar tipos compactos ({e}); se infieren los tipos de contadores e 'Is Active'")
+        except Exception as e:
+            logger.error(f"❌ Error al leer el archivo por bloques: {e}")
+            return None
+    
+    if agregados is None:
+        logger.error("❌ El archivo no contiene registros")
+        return None
+    
+    logger.info(f"✅ Archivo procesado: {registros} registros encontrados")
+    with medir_etapa('Métricas', len(agregados['usuarios'])):
+        return metricas_desde_agregados(agregados, info_division)
+
+def ruta_particion_historial(directorio_historial, dia: str) -> str:
+    """Ruta del Parquet con los registros de un día (YYYY-MM-DD) en el almacén histórico."""
+    return os.path.join(directorio_historial, f"{PREFIJO_PARTICION_HISTORIAL}{dia}", ARCHIVO_PARTICION_HISTORIAL)
+
+def listar_dias_historial(directorio_historial) -> List[str]:
+    """Devuelve los días (YYYY-MM-DD) ya presentes en el almacén, ordenados, sin leer los datos."""
+    if not os.path.isdir(directorio_historial):
+        return []
+    dias = [
+        nombre[len(PREFIJO_PARTICION_HISTORIAL):]
+        for nombre in os.listdir(directorio_historial)
+        if nombre.startswith(PREFIJO_PARTICION_HISTORIAL)
+    ]
+    return sorted(dia for dia in dias if os.path.exists(ruta_particion_historial(directorio_historial, dia)))
+
+def listar_fechas_historial(directorio_historial) -> List[pd.Timestamp]:
+    """Fechas del almacén como Timestamps, con la zona horaria de los datos guardados."""
+    verificar_pyarrow_disponible()
+    import pyarrow.parquet
+    
+    dias = listar_dias_historial(directorio_historial)
+    if not dias:
+        return []
+    tipo_fecha = pyarrow.parquet.read_schema(ruta_particion_historial(directorio_historial, dias[0])).field('Date').type
+    tz = getattr(tipo_fecha, 'tz', None)
+    return [pd.Timestamp(dia, tz=tz) for dia in dias]
+
+def fusionar_particion_historial(almacenado, df_dia):
+    """
+    Fusiona los registros de un día ya almacenado con los del export.
+    
+    Ante duplicados por (Date, Email) prevalece el registro del export; las filas
+    sin email solo se descartan si se repiten exactamente.
+    
+    Returns:
+        DataFrame fusionado, o None si el export no aporta nada que no estuviera ya almacenado
+    """
+    fusionado = concatenar_registros(almacenado, df_dia[almacenado.columns])
+    # Las filas idénticas conservan la copia almacenada; así, si el export no trae nada
+    # distinto, solo sobreviven filas del almacén y la partición no se reescribe
+    fusionado = fusionado[~fusionado.duplicated(keep='first')]
+    duplicadas = fusionado.duplicated(subset=['Date', 'Email'], keep='last') & fusionado['Email'].notna()
+    fusionado = fusionado[~duplicadas]
+    if (fusionado.index < len(almacenado)).all() and len(fusionado) == len(almacenado):
+        return None
+    return fusionado.reset_index(drop=True)
+
+def ingerir_en_historial(archivo, directorio_historial, motor='c'):
+    """
+    Añade al almacén histórico los días del export que aún no contiene.
+    
+    Cada día se guarda en su propia partición Parquet (fecha=YYYY-MM-DD) con los
+    registros ya validados y sin duplicados por (Date, Email). El día más reciente
+    del almacén puede haberse ingerido incompleto (export tomado a mitad de jornada),
+    así que sus registros se fusionan con los del export (prevalecen los nuevos) y la
+    partición se reescribe; los días anteriores no se tocan, de modo que ingerir
+    exports solapados solo añade los días nuevos y completa el último.
+    
+    Returns:
+        Dict con 'dias_nuevos', 'dias_actualizados', 'dias_existentes', 'registros',
+        'registros_actualizados' y 'duplicados', o None si hay errores
+    """
+    try:
+        verificar_pyarrow_disponible()
+    except ImportError as e:
+        logger.error(f"❌ {e}")
+        return None
+    
+    df = cargar_datos_cursor(archivo, motor)
+    if df is None:
+        return None
+    
+    # Deduplicar por (Date, Email); las filas sin email se conservan tal cual
+    duplicadas = df.duplicated(subset=['Date', 'Email'], keep='last') & df['Email'].notna()
+    if duplicadas.any():
+        logger.warning(f"⚠️ {int(duplicadas.sum())} registros duplicados por (Date, Email) descartados")
+        df = df[~duplicadas]
+    
+    dias_existentes = listar_dias_historial(directorio_historial)
+    ultimo_dia = dias_existentes[-1] if dias_existentes else None
+    dias_existentes = set(dias_existentes)
+    resumen = {'dias_nuevos': [], 'dias_actualizados': [], 'dias_existentes': 0,
+               'registros': 0, 'registros_actualizados': 0, 'duplicados': int(duplicadas.sum())}
+    
+    try:
+        for fecha, df_dia in df.groupby(df['Date'].dt.normalize(), sort=True):
+            dia = fecha.strftime('%Y-%m-%d')
+            ruta = ruta_particion_historial(directorio_historial, dia)
+            if dia == ultimo_dia:
+                almacenado = normalizar_tipos_cursor(pd.read_parquet(ruta))
+                fusionado = fusionar_particion_historial(almacenado, df_dia)
+                if fusionado is None:
+                    resumen['dias_existentes'] += 1
+                    continue
+                escribir_atomico(ruta, lambda temporal: fusionado.to_parquet(temporal, index=False))
+                resumen['dias_actualizados'].append(dia)
+                resumen['registros_actualizados'] += len(fusionado) - len(almacenado)
+                continue
+            if dia in dias_existentes:
+                resumen['dias_existentes'] += 1
+                continue
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            escribir_atomico(ruta, lambda temporal: df_dia.to_parquet(temporal, index=False))
+            resumen['dias_nuevos'].append(dia)
+            resumen['registros'] += len(df_dia)
+    except Exception as e:
+        logger.error(f"❌ Error al escribir en el almacén histórico: {e}")
+        return None
+    
+    return resumen
+
+def leer_historial(directorio_historial, fechas) -> pd.DataFrame:
+    """Lee del almacén solo las particiones de las fechas indicadas."""
+    partes = [
+        pd.read_parquet(ruta_particion_historial(directorio_historial, fecha.strftime('%Y-%m-%d')))
+        for fecha in fechas
+    ]
+    return normalizar_tipos_cursor(pd.concat(partes, ignore_index=True))
+
+def procesar_datos_historial(directorio_historial, fechas_unicas, fechas_personalizadas=None, periodos=None):
+    """
+    Calcula las métricas desde el almacén histórico leyendo solo los días necesarios.
+    
+    La división temporal se calcula con las fechas del almacén (fechas_unicas) y
+    después se cargan únicamente las particiones comprendidas entre el inicio del
+    período anterior y el fin del período actual (o todas las de la tendencia).
+    """
+    with medir_etapa('División temporal', len(fechas_unicas)):
+        info_division = determinar_division_temporal(fechas_unicas, fechas_personalizadas, periodos)
+    
+    limites = [info_division[clave] for clave in (
+        'periodo_anterior_inicio', 'periodo_anterior_fin', 'periodo_actual_inicio', 'periodo_actual_fin'
+    )]
+    if 'tendencia' in info_division:
+        limites += [info_division['tendencia']['inicios'][0], info_division['tendencia']['fines'][-1]]
+    desde, hasta = min(limites), max(limites)
+    fechas_necesarias = [fecha for fecha in fechas_unicas if desde <= fecha <= hasta]
+    
+    try:
+        with medir_etapa('Lectura del almacén') as medida:
+            df = leer_historial(directorio_historial, fechas_necesarias)
+            medida['filas'] = len(df)
+    except Exception as e:
+        logger.error(f"❌ Error al leer el almacén histórico: {e}")
+        return None
+    
+    logger.info(f"✅ Almacén histórico: {len(df)} registros de {len(fechas_necesarias)} días cargados")
+    return calcular_metricas_agregadas(df, info_division)
 
 def generar_textos_alternativos_kpis(metricas):
     """Genera textos alternativos dinámicos para cada KPI basado en los datos."""
@@ -792,31 +2231,104 @@ def generar_textos_alternativos_kpis(metricas):
     
     return textos
 
+def construir_filas_html(formato, *columnas) -> List[str]:
+    """Construye todas las filas de una tabla aplicando `formato` a las columnas ya formateadas."""
+    return list(map(formato.format, *columnas))
+
+def filas_ranking_html(ranking) -> List[str]:
+    """Filas (email, valor) de un ranking de usuarios."""
+    return construir_filas_html(
+        FORMATO_FILA_RANKING,
+        sanitizar_html_lista(ranking.index),
+        formato_numero_espanol_lista(ranking.to_numpy().astype('int64'))
+    )
+
+def etiquetas_periodos_tendencia(tendencia, tipo) -> List[str]:
+    """Etiquetas de los períodos del modo tendencia: 'jun 2025' por meses y la fecha de inicio ('02 jun') en el resto."""
+    inicios = pd.DatetimeIndex(tendencia['inicio'])
+    if tipo == 'mes':
+        return (textos_por_indice(MESES_ESPANOL_CORTO, inicios.month.to_numpy() - 1) + ' ' + inicios.year.to_numpy().astype(str).astype(object)).tolist()
+    return formatear_fechas_espanol(inicios, formato_corto=True)
+
+def filas_tendencia_html(tendencia) -> List[str]:
+    """Filas de la tabla de tendencia, con el indicador comparativo respecto al período previo."""
+    def columna_con_indicador(metrica):
+        valores = tendencia[metrica].to_numpy()
+        anteriores = np.concatenate([[np.nan], valores[:-1].astype(float)])
+        return formato_numero_espanol_lista(valores), indicadores_comparativos_lista(valores, anteriores)
+    
+    rangos = [
+        inicio if inicio == fin else f"{inicio} - {fin}"
+        for inicio, fin in zip(formatear_fechas_espanol(tendencia['inicio'], formato_corto=True),
+                               formatear_fechas_espanol(tendencia['fin'], formato_corto=True))
+    ]
+    usuarios, indicador_usuarios = columna_con_indicador('usuarios_activos')
+    lineas, indicador_lineas = columna_con_indicador('lineas_aceptadas')
+    tasa, indicador_tasa = columna_con_indicador('tasa_aceptacion')
+    peticiones, indicador_peticiones = columna_con_indicador('peticiones_totales')
+    
+    return construir_filas_html(
+        FORMATO_FILA_TENDENCIA, rangos, tendencia['dias'].tolist(),
+        usuarios, indicador_usuarios, lineas, indicador_lineas,
+        tasa, indicador_tasa, peticiones, indicador_peticiones
+    )
+
+def filas_retencion_html(retencion, etiquetas) -> List[str]:
+    """
+    Filas del mapa de calor de retención (una por cohorte con usuarios).
+    
+    Cada celda muestra el % de la cohorte activo en el período posterior y su
+    intensidad de color; las celdas posteriores al último período quedan vacías.
+    """
+    usuarios = retencion.to_numpy()
+    numero_periodos = len(usuarios)
+    tamanos = usuarios[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        porcentajes = np.where(tamanos[:, None] > 0, usuarios / tamanos[:, None] * 100, 0.0)
+    
+    celdas = np.array(construir_filas_html(
+        FORMATO_CELDA_RETENCION,
+        np.where(porcentajes.ravel() >= 50, ' alta', '').tolist(),
+        (porcentajes.ravel() / 100).tolist(),
+        formato_numero_espanol_lista(usuarios.ravel()),
+        formato_numero_espanol_lista(np.round(porcentajes.ravel(), 1))
+    ), dtype=object).reshape(numero_periodos, numero_periodos)
+    desfases = np.arange(numero_periodos)
+    celdas[desfases[None, :] >= numero_periodos - desfases[:, None]] = '<td></td>'
+    
+    con_usuarios = tamanos > 0
+    return construir_filas_html(
+        FORMATO_FILA_RETENCION,
+        sanitizar_html_lista(np.asarray(etiquetas, dtype=object)[con_usuarios]),
+        formato_numero_espanol_lista(tamanos[con_usuarios]),
+        [''.join(fila) for fila in celdas[con_usuarios]]
+    )
+
 def generar_tablas_html(metricas):
-    """Genera las tablas HTML para insertar en la plantilla."""
+    """
+    Genera las tablas HTML para insertar en la plantilla.
+    
+    Las tablas y listas se devuelven como listas de filas, construidas columna a
+    columna (escape y formato de números de toda la columna a la vez), que
+    escribir_plantilla() escribe una a una.
+    """
     
     # Top productividad
-    top_prod_html = ""
-    for email, lineas in metricas['rankings']['top_productividad'].items():
-        email_sanitizado = sanitizar_html(str(email))
-        lineas_formateadas = formato_numero_espanol(int(lineas))
-        top_prod_html += f"<tr><td>{email_sanitizado}</td><td class=\"text-right\">{lineas_formateadas}</td></tr>\n                            "
+    top_prod_html = filas_ranking_html(metricas['rankings']['top_productividad'])
     
     # Top peticiones
-    top_pet_html = ""
-    for email, peticiones in metricas['rankings']['top_peticiones'].items():
-        email_sanitizado = sanitizar_html(str(email))
-        peticiones_formateadas = formato_numero_espanol(int(peticiones))
-        top_pet_html += f"<tr><td>{email_sanitizado}</td><td class=\"text-right\">{peticiones_formateadas}</td></tr>\n                            "
+    top_pet_html = filas_ranking_html(metricas['rankings']['top_peticiones'])
     
     # Tecnologías
-    tech_html = ""
-    for extension, data in metricas['rankings']['top_extensiones'].iterrows():
-        lineas = int(data['Chat Accepted Lines Total'])
-        usuarios = int(data['Email'])
-        extension_sanitizada = sanitizar_html(str(extension))
-        badge_class = re.sub(r'[^a-zA-Z0-9_-]', '', str(extension))  # Sanitizar clase CSS
-        tech_html += f"<tr><td><span class=\"badge {badge_class}\">{extension_sanitizada}</span></td><td class=\"text-right\">{formato_numero_espanol(lineas)}</td><td class=\"text-right\">{usuarios}</td></tr>\n                            "
+    top_extensiones = metricas['rankings']['top_extensiones']
+    extensiones = [str(extension) for extension in top_extensiones.index]
+    tech_html = construir_filas_html(
+        FORMATO_FILA_TECNOLOGIA,
+        [re.sub(r'[^a-zA-Z0-9_-]', '', extension) for extension in extensiones],  # Sanitizar clase CSS
+        sanitizar_html_lista(extensiones),
+        formato_numero_espanol_lista(top_extensiones['Chat Accepted Lines Total'].to_numpy().astype('int64')),
+        top_extensiones['Email'].to_numpy().astype('int64').tolist()
+    )
     
     # Modelos de IA - Comentado porque no se usa en la plantilla actual
     # models_html = ""
@@ -827,18 +2339,19 @@ def generar_tablas_html(metricas):
     #     models_html += f"<tr><td>{modelo_sanitizado}</td><td>{uso}</td><td>{formato_numero_espanol(porcentaje)}%</td></tr>\n                            "
     
     # Versiones de cliente
-    versions_html = ""
-    total_versiones = metricas['rankings']['versiones_uso'].sum()
-    for version, uso in metricas['rankings']['versiones_uso'].items():
-        version_sanitizada = sanitizar_html(str(version))
-        porcentaje = (uso / total_versiones) * 100
-        versions_html += f"<tr><td>{version_sanitizada}</td><td class=\"text-right\">{uso}</td><td class=\"text-right\">{formato_numero_espanol(porcentaje)}%</td></tr>\n                            "
+    versiones_uso = metricas['rankings']['versiones_uso']
+    total_versiones = versiones_uso.sum()
+    versions_html = construir_filas_html(
+        FORMATO_FILA_VERSION,
+        sanitizar_html_lista(versiones_uso.index),
+        versiones_uso.tolist(),
+        formato_numero_espanol_lista((versiones_uso.to_numpy() / total_versiones) * 100)
+    )
     
     # Lista de usuarios inactivos
-    usuarios_inactivos_html = ""
-    for email in metricas['usuarios']['lista_inactivos']:
-        email_sanitizado = sanitizar_html(str(email))
-        usuarios_inactivos_html += f"<li>{email_sanitizado}</li>\n                "
+    usuarios_inactivos_html = construir_filas_html(
+        FORMATO_ELEMENTO_LISTA, sanitizar_html_lista(metricas['usuarios']['lista_inactivos'])
+    )
     
     # Recomendaciones estratégicas
     recomendaciones = []
@@ -862,23 +2375,15 @@ def generar_tablas_html(metricas):
     recomendaciones_html = "\n                ".join(recomendaciones)
     
     # Insights estratégicos
-    insights_html = ""
-    for insight in metricas['insights']:
-        insights_html += f"<li>{insight}</li>\n                "
-    
-    # Datos para gráficos (sanitizados) - Solo para gráfico de donut, no para tabla HTML
-    total_modelos = metricas['rankings']['modelos_uso'].sum()
-    chart_models_labels = sanitizar_datos_para_json(list(metricas['rankings']['modelos_uso'].index))
-    chart_models_data = sanitizar_datos_para_json([round((uso / total_modelos) * 100, 1) for uso in metricas['rankings']['modelos_uso'].values])
+    insights_html = construir_filas_html(FORMATO_ELEMENTO_LISTA, metricas['insights'])
     
-    # Datos para gráfico de evolución temporal (sanitizados)
-    evolucion_df = metricas['evolucion']
-    chart_evolution_labels = sanitizar_datos_para_json([formatear_fecha_espanol(fecha, formato_corto=True) for fecha in evolucion_df['Date']])
-    chart_evolution_accepted = sanitizar_datos_para_json(evolucion_df['Chat Accepted Lines Total'].fillna(0).tolist())
-    chart_evolution_suggested = sanitizar_datos_para_json(evolucion_df['Chat Suggested Lines Total'].fillna(0).tolist())
-    chart_evolution_users = sanitizar_datos_para_json(evolucion_df['Email'].fillna(0).tolist())
-    chart_tabs_accepted = sanitizar_datos_para_json(evolucion_df['Tabs Accepted'].fillna(0).tolist())
-    chart_tabs_shown = sanitizar_datos_para_json(evolucion_df['Chat Tabs Shown'].fillna(0).tolist())
+    # Tendencia por períodos y matriz de retención (solo con --periodos)
+    tendencia_html, retencion_html, cabecera_retencion_html = [], [], ''
+    if metricas.get('tendencia') is not None:
+        tendencia_html = filas_tendencia_html(metricas['tendencia'])
+        etiquetas = etiquetas_periodos_tendencia(metricas['tendencia'], metricas['info_division']['tendencia']['tipo'])
+        retencion_html = filas_retencion_html(metricas['retencion'], etiquetas)
+        cabecera_retencion_html = ''.join(f'<th class="text-right">+{desfase}</th>' for desfase in metricas['retencion'].columns)
     
     return {
         'TOP_PRODUCTIVIDAD': top_prod_html,
@@ -889,53 +2394,293 @@ def generar_tablas_html(metricas):
         'USUARIOS_INACTIVOS_LISTA': usuarios_inactivos_html,
         'RECOMENDACIONES_ESTRATEGICAS': recomendaciones_html,
         'INSIGHTS_ESTRATEGICOS': insights_html,
-        'CHART_MODELS_LABELS': json.dumps(chart_models_labels, ensure_ascii=False),
-        'CHART_MODELS_DATA': json.dumps(chart_models_data, ensure_ascii=False),
-        'CHART_EVOLUTION_LABELS': json.dumps(chart_evolution_labels, ensure_ascii=False),
-        'CHART_EVOLUTION_ACCEPTED': json.dumps(chart_evolution_accepted, ensure_ascii=False),
-        'CHART_EVOLUTION_SUGGESTED': json.dumps(chart_evolution_suggested, ensure_ascii=False),
-        'CHART_EVOLUTION_USERS': json.dumps(chart_evolution_users, ensure_ascii=False),
-        'CHART_TABS_ACCEPTED': json.dumps(chart_tabs_accepted, ensure_ascii=False),
-        'CHART_TABS_SHOWN': json.dumps(chart_tabs_shown, ensure_ascii=False)
+        'TENDENCIA_TABLA': tendencia_html,
+        'RETENCION_CABECERA': cabecera_retencion_html,
+        'RETENCION_FILAS': retencion_html
     }
 
-def generar_informe_desde_plantilla(metricas, archivo_plantilla="cursor_stats_report_ux.html", archivo_salida="informe_cursor_analytics.html"):
-    """Genera el informe usando la plantilla HTML con placeholders."""
-    logger.info(f"📝 Generando informe desde plantilla...")
+def serie_numerica_grafico(valores, precision: int = PRECISION_GRAFICOS_DEFECTO) -> np.ndarray:
+    """
+    Prepara una serie numérica para un gráfico de forma vectorizada.
+    
+    Los valores no numéricos o NaN pasan a 0 y los extremos se limitan a
+    ±LIMITE_VALOR_GRAFICOS (como sanitizar_datos_para_json()). Las series enteras
+    se mantienen enteras; las decimales se redondean a `precision` decimales.
+    """
+    serie = pd.to_numeric(pd.Series(valores), errors='coerce')
+    if pd.api.types.is_integer_dtype(serie.dtype) or pd.api.types.is_bool_dtype(serie.dtype):
+        numeros = serie.to_numpy(dtype='int64')
+    else:
+        numeros = np.nan_to_num(serie.to_numpy(dtype=float, na_value=np.nan), nan=0.0, posinf=LIMITE_VALOR_GRAFICOS, neginf=-LIMITE_VALOR_GRAFICOS)
+        numeros = np.round(numeros, precision)
+    
+    extremos = np.abs(numeros) > LIMITE_VALOR_GRAFICOS
+    if extremos.any():
+        logger.warning(f"Valores numéricos extremos detectados y limitados: {int(extremos.sum())}")
+        numeros = np.clip(numeros, -LIMITE_VALOR_GRAFICOS, LIMITE_VALOR_GRAFICOS)
+    return numeros
+
+def construir_datos_graficos(metricas, precision: int = PRECISION_GRAFICOS_DEFECTO) -> Dict[str, Dict[str, Any]]:
+    """
+    Reúne todas las series de los gráficos a partir de las columnas de `evolucion` y de los modelos.
+    
+    Returns:
+        Dict {'evolucion': {...}, 'modelos': {...}} (y 'tendencia' en el modo tendencia)
+        con etiquetas ya sanitizadas (listas) y series numéricas como arrays de NumPy
+    """
+    # Gráfico de donut de modelos (porcentaje de uso)
+    modelos_uso = metricas['rankings']['modelos_uso']
+    porcentajes_modelos = modelos_uso.to_numpy(dtype=float) / modelos_uso.sum() * 100 if len(modelos_uso) else []
+    
+    # Gráficos de evolución temporal
+    evolucion_df = metricas['evolucion']
+    datos_graficos = {
+        'evolucion': {
+            'labels': sanitizar_html_lista(formatear_fechas_espanol(evolucion_df['Date'], formato_corto=True)),
+            'aceptadas': serie_numerica_grafico(evolucion_df['Chat Accepted Lines Total'], precision),
+            'sugeridas': serie_numerica_grafico(evolucion_df['Chat Suggested Lines Total'], precision),
+            'usuarios': serie_numerica_grafico(evolucion_df['Email'], precision),
+            'tabs_aceptados': serie_numerica_grafico(evolucion_df['Tabs Accepted'], precision),
+            'tabs_mostrados': serie_numerica_grafico(evolucion_df['Chat Tabs Shown'], precision)
+        },
+        'modelos': {
+            'labels': sanitizar_html_lista(modelos_uso.index),
+            'porcentajes': serie_numerica_grafico(porcentajes_modelos, precision)
+        }
+    }
+    
+    # Gráfico de tendencia por períodos
+    tendencia = metricas.get('tendencia')
+    if tendencia is not None:
+        datos_graficos['tendencia'] = {
+            'labels': sanitizar_html_lista(etiquetas_periodos_tendencia(tendencia, metricas['info_division']['tendencia']['tipo'])),
+            'aceptadas': serie_numerica_grafico(tendencia['lineas_aceptadas'], precision),
+            'sugeridas': serie_numerica_grafico(tendencia['lineas_sugeridas'], precision),
+            'usuarios': serie_numerica_grafico(tendencia['usuarios_activos'], precision),
+            'tasa_aceptacion': serie_numerica_grafico(tendencia['tasa_aceptacion'], precision)
+        }
+    return datos_graficos
+
+def convertir_numpy_json(valor):
+    """Conversión de arrays y escalares de NumPy para json.dumps()."""
+    if isinstance(valor, (np.ndarray, np.generic)):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable en JSON: {type(valor).__name__}")
+
+def serializar_json(datos, compacto: bool = True) -> str:
+    """Serializa a JSON con orjson si está instalado (con arrays de NumPy directamente) o con json."""
+    if orjson is not None and compacto:
+        return orjson.dumps(datos, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    separadores = (',', ':') if compacto else None
+    return json.dumps(datos, ensure_ascii=False, separators=separadores, default=convertir_numpy_json)
+
+def serializar_datos_graficos(datos_graficos) -> str:
+    """JSON de todos los gráficos en una sola serialización, seguro dentro de un bloque <script>."""
+    return serializar_json(datos_graficos).replace('</', '<\\/')
+
+# Plantillas compiladas en este proceso: ruta absoluta -> (mtime_ns, tamaño, plantilla)
+PLANTILLAS_COMPILADAS: Dict[str, Any] = {}
+
+def compilar_plantilla(texto: str) -> Dict[str, Any]:
+    """
+    Divide la plantilla en segmentos literales y huecos {{NOMBRE}} una sola vez.
     
+    Returns:
+        Dict con 'segmentos' (literales en posiciones pares, nombres de placeholder
+        en las impares) y 'placeholders' (nombres distintos en orden de aparición)
+    """
+    segmentos = PATRON_PLACEHOLDER.split(texto)
+    return {
+        'segmentos': segmentos,
+        'placeholders': list(dict.fromkeys(segmentos[1::2]))
+    }
+
+def ruta_plantilla_precompilada(archivo_plantilla) -> str:
+    """Ruta del archivo de plantilla precompilada, junto a la propia plantilla."""
+    return f"{archivo_plantilla}{SUFIJO_PLANTILLA_COMPILADA}"
+
+def leer_plantilla_precompilada(ruta) -> Optional[Dict[str, Any]]:
+    """Lee el archivo precompilado de la plantilla si existe y es de la versión actual."""
     try:
-        with open(archivo_plantilla, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        logger.debug(f"Plantilla cargada exitosamente: {len(html_content)} caracteres")
-    except FileNotFoundError:
-        logger.error(f"❌ Archivo de plantilla no encontrado: {archivo_plantilla}")
-        return None
-    except Exception as e:
-        logger.error(f"❌ Error al leer plantilla: {e}")
+        with open(ruta_plantilla_precompilada(ruta), 'r', encoding='utf-8') as f:
+            precompilada = json.load(f)
+    except (OSError, ValueError):
         return None
+    return precompilada if precompilada.get('version') == VERSION_PLANTILLA_COMPILADA else None
+
+def guardar_plantilla_precompilada(ruta, estado, plantilla, resumen: str):
+    """Guarda la plantilla compilada junto a la plantilla (escritura atómica)."""
+    precompilada = {
+        'version': VERSION_PLANTILLA_COMPILADA,
+        'mtime_ns': estado.st_mtime_ns,
+        'tamano': estado.st_size,
+        'sha256': resumen,
+        **plantilla
+    }
+    
+    def escribir(temporal):
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(precompilada, f, ensure_ascii=False)
+    escribir_atomico(ruta_plantilla_precompilada(ruta), escribir)
+
+def cargar_plantilla_compilada(archivo_plantilla, guardar_precompilada: bool = True) -> Dict[str, Any]:
+    """
+    Devuelve la plantilla compilada, reutilizándola mientras no cambien su mtime ni su tamaño.
+    
+    Busca primero en memoria, después en el archivo precompilado junto a la plantilla
+    (válido entre ejecuciones) y, si no, la lee y compila. Si solo cambió la fecha de
+    modificación pero no el contenido (mismo SHA-256) se reaprovecha la precompilada.
+    """
+    ruta = os.path.abspath(archivo_plantilla)
+    estado = os.stat(ruta)
+    en_cache = PLANTILLAS_COMPILADAS.get(ruta)
+    if en_cache and en_cache[0] == estado.st_mtime_ns and en_cache[1] == estado.st_size:
+        return en_cache[2]
+    
+    precompilada = leer_plantilla_precompilada(ruta)
+    if precompilada and precompilada['mtime_ns'] == estado.st_mtime_ns and precompilada['tamano'] == estado.st_size:
+        logger.debug(f"Plantilla precompilada reutilizada: {ruta_plantilla_precompilada(ruta)}")
+        plantilla = {'segmentos': precompilada['segmentos'], 'placeholders': precompilada['placeholders']}
+    else:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        resumen = hashlib.sha256(contenido).hexdigest()
+        if precompilada and precompilada['sha256'] == resumen:
+            # Solo cambió la fecha de modificación: mismos segmentos
+            plantilla = {'segmentos': precompilada['segmentos'], 'placeholders': precompilada['placeholders']}
+        else:
+            plantilla = compilar_plantilla(contenido.decode('utf-8'))
+            logger.debug(f"Plantilla compilada: {len(plantilla['segmentos']) // 2} huecos, {len(plantilla['placeholders'])} placeholders distintos")
+        
+        if guardar_precompilada:
+            try:
+                guardar_plantilla_precompilada(ruta, estado, plantilla, resumen)
+            except OSError as e:
+                logger.debug(f"No se pudo guardar la plantilla precompilada: {e}")
+    
+    PLANTILLAS_COMPILADAS[ruta] = (estado.st_mtime_ns, estado.st_size, plantilla)
+    return plantilla
+
+def precompilar_plantilla(archivo_plantilla) -> Dict[str, Any]:
+    """Compila la plantilla y escribe siempre su archivo precompilado (--precompile-template)."""
+    ruta = os.path.abspath(archivo_plantilla)
+    estado = os.stat(ruta)
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    plantilla = compilar_plantilla(contenido.decode('utf-8'))
+    guardar_plantilla_precompilada(ruta, estado, plantilla, hashlib.sha256(contenido).hexdigest())
+    PLANTILLAS_COMPILADAS[ruta] = (estado.st_mtime_ns, estado.st_size, plantilla)
+    return plantilla
+
+def analizar_placeholders(plantilla, valores) -> Dict[str, List[str]]:
+    """Compara los placeholders de la plantilla con los valores disponibles antes de renderizar."""
+    return {
+        'sin_valor': [nombre for nombre in plantilla['placeholders'] if nombre not in valores],
+        'sin_usar': [nombre for nombre in valores if nombre not in set(plantilla['placeholders'])]
+    }
+
+def fragmentos_valor(valor):
+    """
+    Fragmentos de texto de un valor de placeholder.
+    
+    Un valor puede ser un texto, un número o una lista/generador de fragmentos
+    (p. ej. las filas de una tabla), que se escriben uno a uno sin concatenarlos.
+    """
+    if isinstance(valor, str):
+        return (valor,)
+    if isinstance(valor, (list, tuple)) or hasattr(valor, '__next__'):
+        return valor
+    return (str(valor),)
+
+def escribir_plantilla(plantilla, valores, destino) -> int:
+    """
+    Escribe la plantilla rellena directamente en un flujo de texto (archivo, stdout...).
+    
+    Los segmentos literales y los fragmentos de cada valor se escriben según se
+    recorren, sin construir el HTML completo en memoria.
     
+    Returns:
+        Número de caracteres escritos
+    """
+    escribir = destino.write
+    caracteres = 0
+    for posicion, segmento in enumerate(plantilla['segmentos']):
+        if posicion % 2 == 0:
+            fragmentos = (segmento,)
+        elif segmento in valores:
+            fragmentos = fragmentos_valor(valores[segmento])
+        else:
+            fragmentos = (f"{{{{{segmento}}}}}",)
+        for fragmento in fragmentos:
+            escribir(fragmento)
+            caracteres += len(fragmento)
+    return caracteres
+
+def generar_valores_placeholders(metricas, placeholders_plantilla=None, precision_graficos: int = PRECISION_GRAFICOS_DEFECTO) -> Dict[str, Any]:
+    """
+    Calcula el valor (ya sanitizado) de cada placeholder de la plantilla a partir de las métricas.
+    
+    Los datos de los gráficos van en un único bloque JSON ({{CHART_DATA}}). Los
+    placeholders de gráficos antiguos (PLACEHOLDERS_GRAFICOS_LEGADO) solo se generan
+    si la plantilla los usa, o siempre si no se indican sus placeholders.
+    """
     # Generar tablas HTML
-    tablas = generar_tablas_html(metricas)
+    with medir_etapa('Tablas HTML'):
+        tablas = generar_tablas_html(metricas)
+    
+    # Datos de los gráficos: un único bloque JSON y, si la plantilla los usa, los placeholders antiguos
+    with medir_etapa('Datos de gráficos', len(metricas['evolucion'])):
+        datos_graficos = construir_datos_graficos(metricas, precision_graficos)
+        graficos = {'CHART_DATA': serializar_datos_graficos(datos_graficos)}
+        for placeholder, (grafico, serie) in PLACEHOLDERS_GRAFICOS_LEGADO.items():
+            if placeholders_plantilla is None or placeholder in placeholders_plantilla:
+                graficos[placeholder] = serializar_json(datos_graficos[grafico][serie], compacto=False)
     
     # Generar textos alternativos dinámicos
     textos_alternativos = generar_textos_alternativos_kpis(metricas)
     
+    # Sección de tendencia: oculta salvo con --periodos
+    tendencia = metricas.get('tendencia')
+    if tendencia is not None:
+        info_tendencia = metricas['info_division']['tendencia']
+        agrupacion = {'semana': 'semanas naturales', 'mes': 'meses naturales'}.get(
+            info_tendencia['tipo'], f"bloques de {info_tendencia['texto'].split('-')[0]} días"
+        )
+        seccion_tendencia = {
+            'TENDENCIA_OCULTA': '',
+            'TENDENCIA_DESCRIPCION': sanitizar_html(f"{len(tendencia)} períodos ({agrupacion}) con la variación de cada uno respecto al anterior.")
+        }
+    else:
+        seccion_tendencia = {'TENDENCIA_OCULTA': ' hidden', 'TENDENCIA_DESCRIPCION': ''}
+    
+    # KPIs numéricos formateados en formato español de una sola vez
+    kpis = dict(zip(
+        ['TASA_ADOPCION', 'LINEAS_ACEPTADAS', 'TASA_ACEPTACION', 'TABS_ACEPTADOS',
+         'TASA_ACEPTACION_TABS', 'PROMEDIO_LINEAS', 'PETICIONES_TOTALES', 'TASA_RETENCION'],
+        formato_numero_espanol_lista([
+            metricas['usuarios']['tasa_adopcion'], metricas['codigo']['lineas_aceptadas'],
+            metricas['codigo']['tasa_aceptacion'], metricas['tabs']['tabs_aceptados'],
+            metricas['tabs']['tasa_aceptacion_tabs'], metricas['codigo']['promedio_por_usuario'],
+            metricas['peticiones']['total'], metricas['cohortes']['tasa_retencion']
+        ])
+    ))
+    
     # Crear diccionario de reemplazos (sanitizados)
-    placeholders = {
+    return {
         'PERIODO_INICIO': sanitizar_html(metricas['periodo']['inicio']),
         'PERIODO_FIN': sanitizar_html(metricas['periodo']['fin']),
         'PERIODO_ANTERIOR_INICIO': sanitizar_html(metricas['periodo']['anterior_inicio']),
         'PERIODO_ANTERIOR_FIN': sanitizar_html(metricas['periodo']['anterior_fin']),
         'COMPARATIVA_VALIDA': 'true' if metricas['periodo']['comparativa_valida'] else 'false',
-        'TASA_ADOPCION': formato_numero_espanol(metricas['usuarios']['tasa_adopcion']),
+        'TASA_ADOPCION': kpis['TASA_ADOPCION'],
         'USUARIOS_ACTIVOS': metricas['usuarios']['activos'],
         'TOTAL_USUARIOS': metricas['usuarios']['total'],
-        'LINEAS_ACEPTADAS': formato_numero_espanol(metricas['codigo']['lineas_aceptadas']),
-        'TASA_ACEPTACION': formato_numero_espanol(metricas['codigo']['tasa_aceptacion']),
-        'TABS_ACEPTADOS': formato_numero_espanol(metricas['tabs']['tabs_aceptados']),
-        'TASA_ACEPTACION_TABS': formato_numero_espanol(metricas['tabs']['tasa_aceptacion_tabs']),
-        'PROMEDIO_LINEAS': formato_numero_espanol(metricas['codigo']['promedio_por_usuario']),
-        'PETICIONES_TOTALES': formato_numero_espanol(metricas['peticiones']['total']),
+        'LINEAS_ACEPTADAS': kpis['LINEAS_ACEPTADAS'],
+        'TASA_ACEPTACION': kpis['TASA_ACEPTACION'],
+        'TABS_ACEPTADOS': kpis['TABS_ACEPTADOS'],
+        'TASA_ACEPTACION_TABS': kpis['TASA_ACEPTACION_TABS'],
+        'PROMEDIO_LINEAS': kpis['PROMEDIO_LINEAS'],
+        'PETICIONES_TOTALES': kpis['PETICIONES_TOTALES'],
         'USUARIOS_INACTIVOS': len(metricas['usuarios']['lista_inactivos']),
         'FECHA_GENERACION': sanitizar_html(f"{datetime.now().day} de {formatear_fecha_espanol(datetime.now()).split()[1]} de {datetime.now().year}"),
         # Métricas comparativas
@@ -972,45 +2717,1103 @@ def generar_informe_desde_plantilla(metricas, archivo_plantilla="cursor_stats_re
         'USUARIOS_NUEVOS': len(metricas['cohortes']['nuevos']),
         'USUARIOS_PERDIDOS': len(metricas['cohortes']['perdidos']),
         'USUARIOS_REACTIVADOS': len(metricas['cohortes']['reactivados']),
-        'TASA_RETENCION': formato_numero_espanol(metricas['cohortes']['tasa_retencion']),
+        'TASA_RETENCION': kpis['TASA_RETENCION'],
         **tablas,
-        **textos_alternativos
+        **graficos,
+        **textos_alternativos,
+        **seccion_tendencia
     }
+
+def generar_informe_desde_plantilla(metricas, archivo_plantilla="cursor_stats_report_ux.html", archivo_salida="informe_cursor_analytics.html",
+                                    precision_graficos: int = PRECISION_GRAFICOS_DEFECTO):
+    """
+    Genera el informe usando la plantilla HTML con placeholders.
     
-    # Reemplazar placeholders
-    placeholders_reemplazados = 0
-    for placeholder, valor in placeholders.items():
-        patron = f"{{{{{placeholder}}}}}"
-        if patron in html_content:
-            html_content = html_content.replace(patron, str(valor))
-            placeholders_reemplazados += 1
-        else:
-            logger.warning(f"⚠️ Placeholder no encontrado en plantilla: {placeholder}")
+    archivo_salida es la ruta del HTML, '-' para stdout o un flujo de texto abierto
+    (p. ej. io.StringIO en el modo serve), que se devuelve tal cual.
+    """
+    logger.info(f"📝 Generando informe desde plantilla...")
+    
+    try:
+        with medir_etapa('Carga de plantilla'):
+            plantilla = cargar_plantilla_compilada(archivo_plantilla)
+    except FileNotFoundError:
+        logger.error(f"❌ Archivo de plantilla no encontrado: {archivo_plantilla}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ Error al leer plantilla: {e}")
+        return None
+    
+    with medir_etapa('Valores de placeholders'):
+        placeholders = generar_valores_placeholders(metricas, plantilla['placeholders'], precision_graficos)
+    
+    analisis = analizar_placeholders(plantilla, placeholders)
+    for placeholder in analisis['sin_usar']:
+        logger.warning(f"⚠️ Placeholder no encontrado en plantilla: {placeholder}")
+    for placeholder in analisis['sin_valor']:
+        logger.warning(f"⚠️ Placeholder de la plantilla sin valor: {placeholder}")
     
-    logger.debug(f"Placeholders reemplazados: {placeholders_reemplazados}/{len(placeholders)}")
+    logger.debug(f"Placeholders reemplazados: {len(placeholders) - len(analisis['sin_usar'])}/{len(placeholders)}")
     
-    # Guardar archivo
+    # Escribir el informe por fragmentos: en stdout con '-' o en un temporal que se renombra al terminar
     try:
-        with open(archivo_salida, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        logger.debug(f"Archivo guardado exitosamente: {len(html_content)} caracteres")
+        with medir_etapa('Escritura del HTML'):
+            if archivo_salida == '-':
+                caracteres = escribir_plantilla(plantilla, placeholders, sys.stdout)
+                sys.stdout.flush()
+            elif not isinstance(archivo_salida, str):
+                caracteres = escribir_plantilla(plantilla, placeholders, archivo_salida)
+            else:
+                escritos = []
+                def escribir(temporal):
+                    with open(temporal, 'w', encoding='utf-8') as f:
+                        escritos.append(escribir_plantilla(plantilla, placeholders, f))
+                escribir_atomico(archivo_salida, escribir)
+                caracteres = escritos[0]
+        logger.debug(f"Archivo guardado exitosamente: {caracteres} caracteres")
     except Exception as e:
         logger.error(f"❌ Error al guardar archivo: {e}")
         return None
     
-    logger.info(f"✅ Informe generado: {archivo_salida}")
+    if isinstance(archivo_salida, str):
+        logger.info(f"✅ Informe generado: {archivo_salida}")
     return archivo_salida
 
-def main():
-    """Función principal del script."""
-    parser = argparse.ArgumentParser(description='Generador de Informes de Cursor AI Analytics usando Plantilla')
-    parser.add_argument('archivo_csv', help='Archivo CSV con datos de Cursor')
-    parser.add_argument('--salida', '-o', default='informe_cursor_analytics.html', 
-                       help='Archivo HTML de salida (default: informe_cursor_analytics.html)')
+def fecha_iso(fecha) -> Optional[str]:
+    """Fecha en formato YYYY-MM-DD (None si no hay fecha)."""
+    return None if fecha is None or pd.isna(fecha) else pd.Timestamp(fecha).strftime('%Y-%m-%d')
+
+def ranking_exportable(serie, clave: str, valor: str) -> List[Dict[str, Any]]:
+    """Convierte una Series de ranking (índice -> valor) en una lista de registros."""
+    return [{clave: str(indice), valor: int(cantidad)} for indice, cantidad in zip(serie.index.tolist(), serie.tolist())]
+
+def convertir_metricas_exportables(metricas) -> Dict[str, Any]:
+    """
+    Convierte el diccionario de métricas en una estructura estable y serializable.
+    
+    Solo contiene tipos nativos (números, textos, listas y dicts), fechas en ISO
+    y las listas de usuarios ordenadas, bajo la versión VERSION_ESQUEMA_EXPORTACION.
+    'tendencia' y 'retencion' son None salvo en el modo tendencia (--periodos).
+    """
+    info_division = metricas['info_division']
+    rankings = metricas['rankings']
+    evolucion = metricas['evolucion']
+    tendencia = metricas.get('tendencia')
+    retencion = metricas.get('retencion')
+    
+    return {
+        'version_esquema': VERSION_ESQUEMA_EXPORTACION,
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'periodo': {
+            'actual': {
+                'inicio': fecha_iso(info_division.get('periodo_actual_inicio')),
+                'fin': fecha_iso(info_division.get('periodo_actual_fin')),
+                'dias': info_division['dias_actual']
+            },
+            'anterior': {
+                'inicio': fecha_iso(info_division.get('periodo_anterior_inicio')),
+                'fin': fecha_iso(info_division.get('periodo_anterior_fin')),
+                'dias': info_division['dias_anterior']
+            },
+            'comparativa_valida': bool(info_division['comparativa_valida']),
+            'modo_personalizado': bool(info_division.get('modo_personalizado', False))
+        },
+        'usuarios': {
+            'total': metricas['usuarios']['total'],
+            'activos': metricas['usuarios']['activos'],
+            'inactivos': metricas['usuarios']['inactivos'],
+            'tasa_adopcion': metricas['usuarios']['tasa_adopcion'],
+            'lista_inactivos': list(metricas['usuarios']['lista_inactivos'])
+        },
+        'metricas': {
+            periodo: {clave: float(valor) if isinstance(valor, float) else int(valor) for clave, valor in metricas[f'metricas_{periodo}'].items()}
+            for periodo in ('actual', 'anterior')
+        },
+        'cohortes': {
+            **{cohorte: sorted(str(email) for email in metricas['cohortes'][cohorte]) for cohorte in COHORTES_EXPORTACION},
+            'total_actual': metricas['cohortes']['total_actual'],
+            'total_anterior': metricas['cohortes']['total_anterior'],
+            'tasa_retencion': round(float(metricas['cohortes']['tasa_retencion']), 1)
+        },
+        'rankings': {
+            'top_productividad': ranking_exportable(rankings['top_productividad'], 'email', 'lineas_aceptadas'),
+            'top_peticiones': ranking_exportable(rankings['top_peticiones'], 'email', 'peticiones'),
+            'top_extensiones': [
+                {'extension': str(extension), 'lineas_aceptadas': int(lineas), 'usuarios': int(usuarios)}
+                for extension, lineas, usuarios in zip(
+                    rankings['top_extensiones'].index.tolist(),
+                    rankings['top_extensiones']['Chat Accepted Lines Total'].tolist(),
+                    rankings['top_extensiones']['Email'].tolist()
+                )
+            ],
+            'modelos': ranking_exportable(rankings['modelos_uso'], 'modelo', 'usos'),
+            'versiones': ranking_exportable(rankings['versiones_uso'], 'version', 'usos')
+        },
+        'evolucion': [
+            {
+                'fecha': fecha_iso(fecha),
+                'lineas_aceptadas': int(aceptadas),
+                'lineas_sugeridas': int(sugeridas),
+                'usuarios_activos': int(usuarios),
+                'tabs_aceptados': int(tabs_aceptados),
+                'tabs_mostrados': int(tabs_mostrados)
+            }
+            for fecha, aceptadas, sugeridas, usuarios, tabs_aceptados, tabs_mostrados in zip(
+                evolucion['Date'].tolist(),
+                evolucion['Chat Accepted Lines Total'].fillna(0).tolist(),
+                evolucion['Chat Suggested Lines Total'].fillna(0).tolist(),
+                evolucion['Email'].fillna(0).tolist(),
+                evolucion['Tabs Accepted'].fillna(0).tolist(),
+                evolucion['Chat Tabs Shown'].fillna(0).tolist()
+            )
+        ],
+        'tendencia': {
+            'agrupacion': info_division['tendencia']['texto'],
+            'periodos': [
+                {clave: fecha_iso(valor) if clave in ('inicio', 'fin') else (None if pd.isna(valor) else valor)
+                 for clave, valor in periodo.items()}
+                for periodo in tendencia.round({f'variacion_{metrica}': 1 for metrica in METRICAS_VARIACION_TENDENCIA}).to_dict('records')
+            ]
+        } if tendencia is not None else None,
+        'retencion': [
+            {'inicio': fecha_iso(inicio), 'usuarios_activos': fila[:len(retencion) - cohorte]}
+            for cohorte, (inicio, fila) in enumerate(zip(tendencia['inicio'].tolist(), retencion.to_numpy().tolist()))
+        ] if retencion is not None else None
+    }
+
+def exportar_metricas_json(metricas, archivo_salida) -> Optional[str]:
+    """Escribe las métricas exportables en JSON (escritura atómica)."""
+    try:
+        with medir_etapa('Exportación JSON'):
+            exportables = convertir_metricas_exportables(metricas)
+            
+            def escribir(temporal):
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(exportables, f, ensure_ascii=False, indent=2)
+            escribir_atomico(archivo_salida, escribir)
+    except Exception as e:
+        logger.error(f"❌ Error al exportar métricas a JSON: {e}")
+        return None
+    
+    logger.info(f"✅ Métricas exportadas: {archivo_salida}")
+    return archivo_salida
+
+def metricas_en_formato_largo(exportables) -> pd.DataFrame:
+    """
+    Aplana las métricas exportables en una tabla larga (una fila por valor).
+    
+    Columnas: seccion, periodo, fecha, clave, metrica, valor. Por ejemplo
+    ('kpi', 'actual', None, None, 'lineas_aceptadas', 1234) o
+    ('evolucion', None, '2025-06-01', None, 'usuarios_activos', 42). Los períodos del
+    modo tendencia van en la sección 'tendencia' con la fecha de inicio de cada uno, y
+    la matriz de retención en 'retencion' (fecha de la cohorte, desfase como clave).
+    """
+    filas = []
+    
+    def agregar(seccion, metrica, valor, periodo=None, fecha=None, clave=None):
+        filas.append((seccion, periodo, fecha, clave, metrica, float(valor)))
+    
+    for periodo, datos in exportables['periodo'].items():
+        if isinstance(datos, dict):
+            agregar('periodo', 'dias', datos['dias'], periodo=periodo)
+    for clave in ('total', 'activos', 'inactivos', 'tasa_adopcion'):
+        agregar('usuarios', clave, exportables['usuarios'][clave], periodo='actual')
+    for email in exportables['usuarios']['lista_inactivos']:
+        agregar('usuarios_inactivos', 'inactivo', 1, periodo='actual', clave=email)
+    for periodo, valores in exportables['metricas'].items():
+        for metrica, valor in valores.items():
+            agregar('kpi', metrica, valor, periodo=periodo)
+    for cohorte in COHORTES_EXPORTACION:
+        agregar('cohortes', cohorte, len(exportables['cohortes'][cohorte]))
+        for email in exportables['cohortes'][cohorte]:
+            agregar('cohorte_usuarios', cohorte, 1, clave=email)
+    agregar('cohortes', 'tasa_retencion', exportables['cohortes']['tasa_retencion'])
+    for ranking, registros in exportables['rankings'].items():
+        for registro in registros:
+            clave, *metricas = registro.items()
+            for metrica, valor in metricas:
+                agregar(ranking, metrica, valor, periodo='actual', clave=clave[1])
+    for dia in exportables['evolucion']:
+        for metrica, valor in dia.items():
+            if metrica != 'fecha':
+                agregar('evolucion', metrica, valor, fecha=dia['fecha'])
+    for periodo in (exportables['tendencia'] or {}).get('periodos', []):
+        for metrica, valor in periodo.items():
+            if metrica not in ('inicio', 'fin') and valor is not None:
+                agregar('tendencia', metrica, valor, fecha=periodo['inicio'])
+    for cohorte in exportables['retencion'] or []:
+        for desfase, usuarios in enumerate(cohorte['usuarios_activos']):
+            agregar('retencion', 'usuarios_activos', usuarios, fecha=cohorte['inicio'], clave=str(desfase))
+    
+    return pd.DataFrame(filas, columns=['seccion', 'periodo', 'fecha', 'clave', 'metrica', 'valor']).astype({
+        'seccion': 'string', 'periodo': 'string', 'fecha': 'string', 'clave': 'string', 'metrica': 'string', 'valor': 'float64'
+    })
+
+def exportar_metricas_parquet(metricas, archivo_salida) -> Optional[str]:
+    """
+    Escribe las métricas en Parquet como tabla larga (metricas_en_formato_largo()).
+    
+    La versión del esquema y las fechas de los períodos se guardan como metadatos
+    del archivo ('version_esquema', 'periodo').
+    """
+    try:
+        verificar_pyarrow_disponible()
+        import pyarrow
+        import pyarrow.parquet
+        
+        with medir_etapa('Exportación Parquet') as medida:
+            exportables = convertir_metricas_exportables(metricas)
+            tabla = pyarrow.Table.from_pandas(metricas_en_formato_largo(exportables), preserve_index=False)
+            tabla = tabla.replace_schema_metadata({
+                **(tabla.schema.metadata or {}),
+                b'version_esquema': str(VERSION_ESQUEMA_EXPORTACION).encode(),
+                b'periodo': json.dumps(exportables['periodo']).encode(),
+                b'generado': exportables['generado'].encode()
+            })
+            medida['filas'] = tabla.num_rows
+            escribir_atomico(archivo_salida, lambda temporal: pyarrow.parquet.write_table(tabla, temporal))
+    except Exception as e:
+        logger.error(f"❌ Error al exportar métricas a Parquet: {e}")
+        return None
+    
+    logger.info(f"✅ Métricas exportadas: {archivo_salida}")
+    return archivo_salida
+
+def cargar_equipos(equipos) -> Dict[str, set]:
+    """Mapa equipo -> conjunto de emails, a partir del mapa o de la ruta a un JSON con él."""
+    equipos = equipos or {}
+    if isinstance(equipos, str):
+        with open(equipos, 'r', encoding='utf-8') as f:
+            equipos = json.load(f)
+    return {equipo: set(emails) for equipo, emails in equipos.items()}
+
+def cargar_manifiesto_lote(ruta_manifiesto) -> Dict[str, Any]:
+    """
+    Lee el manifiesto del modo lote (JSON, o YAML si la extensión es .yaml/.yml).
+    
+    El manifiesto puede ser directamente la lista de informes o un objeto con
+    'informes' y, opcionalmente, 'equipos' (mapa equipo -> lista de emails, o ruta
+    a un JSON con ese mapa).
+    """
+    with open(ruta_manifiesto, 'r', encoding='utf-8') as f:
+        if ruta_manifiesto.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Se requiere PyYAML para manifiestos YAML: pip install pyyaml")
+            manifiesto = yaml.safe_load(f)
+        else:
+            manifiesto = json.load(f)
+    
+    if isinstance(manifiesto, list):
+        manifiesto = {'informes': manifiesto}
+    if not isinstance(manifiesto, dict) or not isinstance(manifiesto.get('informes'), list):
+        raise ValueError("El manifiesto debe ser una lista de informes o un objeto con la clave 'informes'")
+    
+    manifiesto['equipos'] = cargar_equipos(manifiesto.get('equipos'))
+    
+    for posicion, informe in enumerate(manifiesto['informes'], 1):
+        if not isinstance(informe, dict) or not informe.get('salida'):
+            raise ValueError(f"Informe #{posicion} del manifiesto sin 'salida'")
+        if informe.get('equipo') and informe['equipo'] not in manifiesto['equipos']:
+            raise ValueError(f"Informe #{posicion}: equipo '{informe['equipo']}' no definido en 'equipos'")
+        ultimos_dias = informe.get('ultimos_dias')
+        if ultimos_dias is not None and (type(ultimos_dias) is not int or ultimos_dias < DIAS_MINIMOS_COMPARATIVA):
+            raise ValueError(
+                f"Informe #{posicion}: 'ultimos_dias' debe ser un entero de al menos {DIAS_MINIMOS_COMPARATIVA} "
+                f"(días necesarios para comparar dos períodos), no {ultimos_dias!r}"
+            )
+    
+    return manifiesto
+
+class SinRegistrosError(Exception):
+    """Ningún registro cumple los filtros de un informe (filtrar_registros())."""
+
+def filtrar_registros(df, dominio=None, emails=None, ultimos_dias=None):
+    """
+    Filtra los registros por dominio de email, lista de emails y/o últimos N días.
+    
+    Los filtros de email se evalúan una vez por email distinto (categorías) y se
+    trasladan a las filas con los códigos de la columna categórica.
+    
+    Raises:
+        SinRegistrosError: si ningún registro cumple los filtros
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    
+    if dominio or emails is not None:
+        columna = df['Email'] if isinstance(df['Email'].dtype, pd.CategoricalDtype) else df['Email'].astype('category')
+        categorias = pd.Series(columna.cat.categories.astype(str))
+        seleccion = np.ones(len(categorias), dtype=bool)
+        if dominio:
+            seleccion &= categorias.str.lower().str.endswith('@' + dominio.lower().lstrip('@')).to_numpy()
+        if emails is not None:
+            seleccion &= categorias.isin(emails).to_numpy()
+        codigos = columna.cat.codes.to_numpy()
+        mascara &= (codigos >= 0) & seleccion[np.maximum(codigos, 0)]
+    
+    if ultimos_dias:
+        fechas_unicas = np.sort(df['Date'].unique())
+        if len(fechas_unicas) > ultimos_dias:
+            mascara &= (df['Date'] >= fechas_unicas[-ultimos_dias]).to_numpy()
+    
+    if not mascara.any():
+        raise SinRegistrosError("ningún registro cumple los filtros del informe")
+    return df if mascara.all() else df[mascara]
+
+def renderizar_informe_lote(metricas, archivo_plantilla, archivo_salida, precision_graficos=PRECISION_GRAFICOS_DEFECTO):
+    """
+    Genera el HTML de un informe del lote (se ejecuta en los procesos de --workers).
+    
+    Recibe solo el diccionario de métricas ya agregadas, que se serializa barato
+    entre procesos, nunca el DataFrame de registros.
+    
+    Returns:
+        Dict con 'archivo' generado (o None), 'error' y 'segundos_render'
+    """
+    inicio = time.perf_counter()
+    try:
+        archivo_generado = generar_informe_desde_plantilla(metricas, archivo_plantilla, archivo_salida, precision_graficos)
+        error = None if archivo_generado else "no se pudo generar el HTML"
+    except Exception as e:
+        archivo_generado, error = None, str(e)
+    return {'archivo': archivo_generado, 'error': error, 'segundos_render': time.perf_counter() - inicio}
+
+def generar_informes_lote(df, manifiesto, plantilla_defecto, workers: int = 1, precision_graficos: int = PRECISION_GRAFICOS_DEFECTO,
+                          periodos: Optional[str] = None):
+    """
+    Genera todos los informes del manifiesto a partir de un único DataFrame cargado.
+    
+    Las métricas se calculan en el proceso principal; los informes que solo difieren
+    en plantilla o salida reutilizan las mismas. El renderizado HTML se reparte entre
+    `workers` procesos cuando hay más de uno. Un informe con errores no detiene el
+    resto del lote.
+    
+    Returns:
+        Lista de resultados en el orden del manifiesto, cada uno con 'nombre',
+        'archivo', 'error', 'segundos_metricas' y 'segundos_render'
+    """
+    metricas_calculadas = {}
+    resultados = []
+    campos_fecha = ['fecha_inicio_actual', 'fecha_fin_actual', 'fecha_inicio_anterior', 'fecha_fin_anterior']
+    
+    # Fase 1: métricas de cada combinación distinta de filtros y fechas
+    for posicion, informe in enumerate(manifiesto['informes'], 1):
+        nombre = informe.get('nombre') or informe['salida']
+        logger.info(f"📦 [{posicion}/{len(manifiesto['informes'])}] {nombre}")
+        resultado = {'nombre': nombre, 'archivo': None, 'error': None, 'segundos_metricas': 0.0, 'segundos_render': 0.0}
+        resultados.append(resultado)
+        
+        filtro = (informe.get('dominio'), informe.get('equipo'), informe.get('ultimos_dias'))
+        periodos_informe = informe.get('periodos', periodos)
+        clave = filtro + tuple(informe.get(campo) for campo in campos_fecha) + (periodos_informe,)
+        
+        try:
+            if clave not in metricas_calculadas:
+                inicio = time.perf_counter()
+                emails = manifiesto['equipos'][informe['equipo']] if informe.get('equipo') else None
+                df_informe = filtrar_registros(df, informe.get('dominio'), emails, informe.get('ultimos_dias'))
+                
+                fechas_personalizadas = None
+                if any(informe.get(campo) for campo in campos_fecha):
+                    fechas_personalizadas, errores = validar_y_parsear_fechas(
+                        *[informe.get(campo) for campo in campos_fecha], df_informe
+                    )
+                    if errores:
+                        raise ValueError('; '.join(errores))
+                
+                metricas_calculadas[clave] = procesar_datos_cursor(
+                    df_informe, fechas_personalizadas,
+                    periodos=parsear_periodos(periodos_informe) if periodos_informe else None
+                )
+                resultado['segundos_metricas'] = time.perf_counter() - inicio
+            
+            resultado['metricas'] = metricas_calculadas[clave]
+            if resultado['metricas'] is None:
+                raise ValueError("no se pudieron calcular las métricas")
+            if informe.get('export_json') and not exportar_metricas_json(resultado['metricas'], informe['export_json']):
+                raise ValueError("no se pudo exportar a JSON")
+            if informe.get('export_parquet') and not exportar_metricas_parquet(resultado['metricas'], informe['export_parquet']):
+                raise ValueError("no se pudo exportar a Parquet")
+            resultado['plantilla'] = informe.get('plantilla', plantilla_defecto)
+            resultado['salida'] = informe['salida']
+            resultado['precision_graficos'] = informe.get('precision_graficos', precision_graficos)
+        except Exception as e:
+            resultado['error'] = str(e)
+    
+    # Fase 2: renderizado, secuencial o repartido entre procesos
+    pendientes = [resultado for resultado in resultados if resultado['error'] is None]
+    argumentos = [(r.pop('metricas'), r.pop('plantilla'), r.pop('salida'), r.pop('precision_graficos')) for r in pendientes]
+    if workers > 1 and len(pendientes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as ejecutor:
+            futuros = [ejecutor.submit(renderizar_informe_lote, *trabajo) for trabajo in argumentos]
+            renderizados = [futuro.result() for futuro in futuros]
+    else:
+        renderizados = [renderizar_informe_lote(*trabajo) for trabajo in argumentos]
+    
+    for resultado, renderizado in zip(pendientes, renderizados):
+        resultado.update(renderizado)
+    
+    for resultado in resultados:
+        if resultado['error']:
+            logger.error(f"❌ Informe '{resultado['nombre']}': {resultado['error']}")
+    
+    return resultados
+
+def ejecutar_lote(args, df, manifiesto):
+    """Modo --lote: genera todos los informes del manifiesto ya leído y termina con error si alguno falla."""
+    if args.historial:
+        # En modo lote se necesitan los registros completos del almacén
+        try:
+            df = leer_historial(args.historial, list(df['Date']))
+        except Exception as e:
+            logger.error(f"❌ Error al leer el almacén histórico: {e}")
+            sys.exit(1)
+    
+    inicio = time.perf_counter()
+    resultados = generar_informes_lote(df, manifiesto, args.plantilla, args.workers, args.precision_graficos, args.periodos)
+    generados = [resultado for resultado in resultados if resultado['archivo']]
+    fallidos = [resultado['nombre'] for resultado in resultados if resultado['error']]
+    
+    logger.info("=" * 60)
+    logger.info("⏱️ Tiempos por informe (métricas | render):")
+    for resultado in resultados:
+        estado = "❌" if resultado['error'] else "✅"
+        logger.info(f"   {estado} {resultado['nombre']}: {resultado['segundos_metricas']:.2f}s | {resultado['segundos_render']:.2f}s")
+    logger.info(f"📦 Lote completado en {time.perf_counter() - inicio:.1f}s con {args.workers} proceso(s): {len(generados)} informes generados")
+    if fallidos:
+        logger.error(f"❌ {len(fallidos)} informes con errores: {', '.join(fallidos)}")
+        sys.exit(1)
+
+def main_ingesta(argumentos):
+    """Subcomando ingest: añade los días nuevos de un export al almacén histórico."""
+    parser = argparse.ArgumentParser(
+        prog='generador_informe_template.py ingest',
+        description='Añade al almacén histórico los días de un export de Cursor que aún no contiene'
+    )
+    parser.add_argument('archivo_csv', help='Archivo con datos de Cursor (.csv, .parquet o .feather)')
+    parser.add_argument('--historial', required=True, metavar='DIR',
+                       help='Directorio del almacén histórico (particionado por día, requiere pyarrow)')
+    parser.add_argument('--engine', dest='motor', choices=['c', 'pyarrow'], default='c',
+                       help='Parser CSV: c (default) o pyarrow (multihilo, requiere pyarrow)')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Activar logging detallado')
+    args = parser.parse_args(argumentos)
+    
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    resumen = ingerir_en_historial(args.archivo_csv, args.historial, args.motor)
+    if resumen is None:
+        logger.error("❌ Error al ingerir el export. Abortando.")
+        sys.exit(1)
+    
+    logger.info("=" * 60)
+    logger.info(f"🗄️ Almacén histórico: {args.historial}")
+    logger.info(f"   • Días nuevos: {len(resumen['dias_nuevos'])} ({resumen['registros']:,} registros)")
+    if resumen['dias_nuevos']:
+        logger.info(f"   • Rango añadido: {resumen['dias_nuevos'][0]} - {resumen['dias_nuevos'][-1]}")
+    if resumen['dias_actualizados']:
+        logger.info(f"   • Días completados: {', '.join(resumen['dias_actualizados'])} "
+                    f"(+{resumen['registros_actualizados']:,} registros)")
+    logger.info(f"   • Días ya presentes (omitidos): {resumen['dias_existentes']}")
+
+def guardar_en_lru(cache, clave, valor, maximo: int):
+    """Guarda `valor` en un OrderedDict usado como caché LRU, descartando los menos usados por encima de `maximo`."""
+    cache[clave] = valor
+    cache.move_to_end(clave)
+    while len(cache) > maximo:
+        cache.popitem(last=False)
+
+def consultar_lru(cache, clave):
+    """Valor de la caché LRU para `clave` (None si no está), marcándolo como el más reciente."""
+    valor = cache.get(clave)
+    if valor is not None:
+        cache.move_to_end(clave)
+    return valor
+
+def parsear_consulta_informe(consulta: str, equipos) -> Dict[str, Any]:
+    """
+    Convierte la query string de una petición del modo serve en los parámetros del informe.
+    
+    Admite los mismos filtros que un informe del manifiesto de --lote
+    (PARAMETROS_CONSULTA_INFORME); los valores vacíos cuentan como ausentes. Las
+    fechas solo se validan aquí en formato y orden: su rango se comprueba contra los
+    registros filtrados al calcular las métricas.
+    
+    Raises:
+        ValueError: si hay parámetros desconocidos o con valores no válidos
+    """
+    from urllib.parse import parse_qs
+    valores = parse_qs(consulta)
+    desconocidos = sorted(set(valores) - set(PARAMETROS_CONSULTA_INFORME))
+    if desconocidos:
+        raise ValueError(f"parámetros desconocidos: {', '.join(desconocidos)}")
+    
+    parametros = {clave: (valores[clave][-1].strip() or None) if clave in valores else None for clave in PARAMETROS_CONSULTA_INFORME}
+    if parametros['equipo'] and parametros['equipo'] not in equipos:
+        raise ValueError(f"equipo '{parametros['equipo']}' no definido (use --equipos)")
+    if parametros['dominio']:
+        parametros['dominio'] = parametros['dominio'].lower().lstrip('@')
+    if parametros['ultimos_dias']:
+        if not parametros['ultimos_dias'].isdigit() or int(parametros['ultimos_dias']) < DIAS_MINIMOS_COMPARATIVA:
+            raise ValueError(f"ultimos_dias debe ser un entero de al menos {DIAS_MINIMOS_COMPARATIVA} (días necesarios para comparar dos períodos)")
+        parametros['ultimos_dias'] = int(parametros['ultimos_dias'])
+    if parametros['periodos']:
+        parsear_periodos(parametros['periodos'])
+    
+    fechas = [parametros[campo] for campo in CAMPOS_FECHA_INFORME]
+    if any(fechas):
+        _, errores = validar_y_parsear_fechas(*fechas)
+        if errores:
+            raise ValueError('; '.join(errores))
+    
+    return parametros
+
+def calcular_metricas_servidor(estado, parametros):
+    """
+    Métricas de una combinación de filtros y fechas del modo serve, memorizadas en estado['metricas'].
+    
+    Se calculan sobre los registros cargados una sola vez al arrancar el servidor.
+    
+    Raises:
+        ValueError: si las fechas no están en los registros filtrados
+        SinRegistrosError: si ningún registro cumple los filtros
+    """
+    clave = tuple(parametros[campo] for campo in PARAMETROS_CONSULTA_INFORME)
+    with estado['bloqueo']:
+        metricas = consultar_lru(estado['metricas'], clave)
+    if metricas is not None:
+        return metricas
+    
+    emails = estado['equipos'][parametros['equipo']] if parametros['equipo'] else None
+    df = filtrar_registros(estado['df'], parametros['dominio'], emails, parametros['ultimos_dias'])
+    
+    fechas_personalizadas = None
+    fechas = [parametros[campo] for campo in CAMPOS_FECHA_INFORME]
+    if any(fechas):
+        fechas_personalizadas, errores = validar_y_parsear_fechas(*fechas, df)
+        if errores:
+            raise ValueError('; '.join(errores))
+    
+    periodos = parsear_periodos(parametros['periodos']) if parametros['periodos'] else None
+    metricas = procesar_datos_cursor(df, fechas_personalizadas, periodos=periodos)
+    if metricas is None:
+        raise RuntimeError("no se pudieron calcular las métricas")
+    
+    with estado['bloqueo']:
+        guardar_en_lru(estado['metricas'], clave, metricas, estado['max_paginas'])
+    return metricas
+
+def renderizar_pagina_servidor(estado, parametros) -> Tuple[Dict[str, Any], bool]:
+    """
+    HTML del informe para unos parámetros del modo serve, con caché LRU de páginas.
+    
+    La clave de la página incluye el tamaño y la fecha de modificación de la
+    plantilla, de modo que editarla invalida las páginas sin recalcular métricas.
+    El ETag es un resumen del propio HTML.
+    
+    Las cachés solo se consultan y actualizan bajo estado['bloqueo'], que se
+    suelta enseguida: una página ya generada se sirve aunque otra petición esté
+    renderizando. Los renderizados se hacen de uno en uno bajo
+    estado['bloqueo_render'] (comparten la plantilla compilada y el perfil por
+    etapas) y, al conseguirlo, se vuelve a consultar la caché por si otra petición
+    acaba de generar la misma página.
+    
+    Returns:
+        Tupla (página con 'cuerpo' en bytes y 'etag', True si venía de la caché)
+    """
+    clave = tuple(parametros[campo] for campo in PARAMETROS_CONSULTA_INFORME) + tuple(estado_archivo(estado['plantilla']))
+    with estado['bloqueo']:
+        pagina = consultar_lru(estado['paginas'], clave)
+    if pagina is not None:
+        return pagina, True
+    
+    with estado['bloqueo_render']:
+        with estado['bloqueo']:
+            pagina = consultar_lru(estado['paginas'], clave)
+        if pagina is not None:
+            return pagina, True
+        
+        metricas = calcular_metricas_servidor(estado, parametros)
+        flujo = io.StringIO()
+        if not generar_informe_desde_plantilla(metricas, estado['plantilla'], flujo, estado['precision_graficos']):
+            raise RuntimeError("no se pudo generar el HTML")
+    
+    cuerpo = flujo.getvalue().encode('utf-8')
+    pagina = {'cuerpo': cuerpo, 'etag': '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'}
+    with estado['bloqueo']:
+        guardar_en_lru(estado['paginas'], clave, pagina, estado['max_paginas'])
+    return pagina, False
+
+def etag_coincide(cabecera: Optional[str], etag: str) -> bool:
+    """Comprueba si la cabecera If-None-Match incluye el ETag (o '*'), aceptando también su forma débil W/."""
+    if not cabecera:
+        return False
+    etiquetas = [etiqueta.strip() for etiqueta in cabecera.split(',')]
+    return '*' in etiquetas or etag in etiquetas or f'W/{etag}' in etiquetas
+
+def crear_manejador_informes(estado):
+    """Clase de manejador HTTP del modo serve ligada al estado del servidor (datos, equipos y cachés)."""
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlsplit
+    
+    class ManejadorInformes(BaseHTTPRequestHandler):
+        server_version = 'CursorStatsReport'
+        # Cabeceras y cuerpo van en escrituras separadas: sin TCP_NODELAY cada respuesta espera el ACK retardado (~40 ms)
+        disable_nagle_algorithm = True
+        
+        def do_GET(self):
+            self.responder(con_cuerpo=True)
+        
+        def do_HEAD(self):
+            self.responder(con_cuerpo=False)
+        
+        def responder(self, con_cuerpo: bool):
+            inicio = time.perf_counter()
+            url = urlsplit(self.path)
+            cabeceras = {'Content-Type': 'text/plain; charset=utf-8'}
+            reutilizada = False
+            
+            if url.path != '/':
+                codigo, cuerpo = 404, f"Ruta no encontrada: {url.path} (el informe se sirve en /)"
+            else:
+                try:
+                    parametros = parsear_consulta_informe(url.query, estado['equipos'])
+                    pagina, reutilizada = renderizar_pagina_servidor(estado, parametros)
+                except ValueError as e:
+                    codigo, cuerpo = 400, f"Parámetros no válidos: {e}"
+                except SinRegistrosError as e:
+                    codigo, cuerpo = 404, f"Sin datos: {e}"
+                except Exception as e:
+                    logger.error(f"❌ Error al generar el informe para {self.path}: {e}")
+                    codigo, cuerpo = 500, f"Error al generar el informe: {e}"
+                else:
+                    cabeceras = {'ETag': pagina['etag'], 'Cache-Control': 'no-cache', 'X-Cache': 'HIT' if reutilizada else 'MISS'}
+                    if etag_coincide(self.headers.get('If-None-Match'), pagina['etag']):
+                        codigo, cuerpo = 304, b''
+                    else:
+                        codigo, cuerpo = 200, pagina['cuerpo']
+                        cabeceras['Content-Type'] = 'text/html; charset=utf-8'
+            
+            if isinstance(cuerpo, str):
+                cuerpo = (cuerpo + '\n').encode('utf-8')
+            if codigo != 304:
+                cabeceras['Content-Length'] = str(len(cuerpo))
+            try:
+                self.send_response(codigo)
+                for nombre, valor in cabeceras.items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                if con_cuerpo and cuerpo:
+                    self.wfile.write(cuerpo)
+            except (BrokenPipeError, ConnectionResetError):
+                logger.debug(f"Conexión cerrada por el cliente: {self.path}")
+            
+            origen = "caché" if reutilizada else "renderizado" if codigo in (200, 304) else "error"
+            logger.info(f"🌐 {self.command} {self.path} → {codigo} en {(time.perf_counter() - inicio) * 1000:.1f} ms ({origen})")
+        
+        def log_message(self, formato, *argumentos):
+            logger.debug(f"{self.address_string()} - {formato % argumentos}")
+    
+    return ManejadorInformes
+
+def main_servidor(argumentos):
+    """Subcomando serve: carga los datos una vez y sirve los informes por HTTP bajo demanda."""
+    parser = argparse.ArgumentParser(
+        prog='generador_informe_template.py serve',
+        description='Servidor HTTP local que carga los datos una sola vez y genera los informes bajo demanda '
+                    f"según la query string ({', '.join(PARAMETROS_CONSULTA_INFORME)})"
+    )
+    parser.add_argument('archivo_csv', nargs='?', help='Archivo con datos de Cursor (.csv, .parquet o .feather)')
+    parser.add_argument('--historial', metavar='DIR',
+                       help='Servir los informes desde el almacén histórico creado con el subcomando ingest')
+    parser.add_argument('--plantilla', '-t', default='cursor_stats_report_ux.html',
+                       help='Archivo de plantilla HTML (default: cursor_stats_report_ux.html)')
+    parser.add_argument('--equipos', metavar='ARCHIVO',
+                       help='JSON con el mapa equipo -> lista de emails, para el parámetro equipo')
+    parser.add_argument('--host', default=HOST_SERVIDOR_DEFECTO,
+                       help=f'Dirección en la que escuchar (default: {HOST_SERVIDOR_DEFECTO})')
+    parser.add_argument('--port', dest='puerto', type=int, default=PUERTO_SERVIDOR_DEFECTO,
+                       help=f'Puerto en el que escuchar (default: {PUERTO_SERVIDOR_DEFECTO})')
+    parser.add_argument('--cache-paginas', type=int, default=CACHE_PAGINAS_DEFECTO, metavar='N',
+                       help=f'Páginas renderizadas (y métricas) que se conservan en memoria (default: {CACHE_PAGINAS_DEFECTO})')
+    parser.add_argument('--precision-graficos', type=int, default=PRECISION_GRAFICOS_DEFECTO, metavar='N',
+                       help=f'Decimales de los valores no enteros de los gráficos (default: {PRECISION_GRAFICOS_DEFECTO})')
+    parser.add_argument('--engine', dest='motor', choices=['c', 'pyarrow'], default='c',
+                       help='Parser CSV: c (default) o pyarrow (multihilo, requiere pyarrow)')
+    parser.add_argument('--cache-dir', dest='directorio_cache', default=DIRECTORIO_CACHE_DEFECTO,
+                       help=f'Directorio de la caché de datos validados (default: {DIRECTORIO_CACHE_DEFECTO})')
+    parser.add_argument('--no-cache', dest='usar_cache', action='store_false',
+                       help='No leer ni escribir la caché de datos validados')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Activar logging detallado')
+    args = parser.parse_args(argumentos)
+    
+    if bool(args.archivo_csv) == bool(args.historial):
+        parser.error('indique un archivo de datos o --historial DIR (pero no ambos)')
+    if args.cache_paginas < 1:
+        parser.error('--cache-paginas requiere un valor positivo')
+    
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    if args.archivo_csv and not os.path.isfile(args.archivo_csv):
+        logger.error(f"❌ Archivo de datos no encontrado: {args.archivo_csv}")
+        sys.exit(1)
+    if not os.path.isfile(args.plantilla):
+        logger.error(f"❌ Archivo de plantilla no encontrado: {args.plantilla}")
+        sys.exit(1)
+    try:
+        equipos = cargar_equipos(args.equipos)
+    except Exception as e:
+        logger.error(f"❌ Error al leer los equipos {args.equipos}: {e}")
+        sys.exit(1)
+    
+    # Cargar y validar los registros una única vez para todo el servidor
+    if args.historial:
+        try:
+            fechas_unicas = listar_fechas_historial(args.historial)
+            df = leer_historial(args.historial, fechas_unicas) if fechas_unicas else None
+        except Exception as e:
+            logger.error(f"❌ Error al leer el almacén histórico: {e}")
+            sys.exit(1)
+        if df is None:
+            logger.error(f"❌ El almacén histórico {args.historial} está vacío. Use el subcomando ingest.")
+            sys.exit(1)
+    elif args.usar_cache:
+        df = cargar_datos_con_cache(args.archivo_csv, args.motor, args.directorio_cache)
+    else:
+        df = cargar_datos_cursor(args.archivo_csv, args.motor)
+    if df is None:
+        logger.error("❌ Error al procesar los datos. Abortando.")
+        sys.exit(1)
+    
+    estado = {
+        'df': df,
+        'equipos': equipos,
+        'plantilla': args.plantilla,
+        'precision_graficos': args.precision_graficos,
+        'max_paginas': args.cache_paginas,
+        'metricas': OrderedDict(),
+        'paginas': OrderedDict(),
+        'bloqueo': threading.Lock(),
+        'bloqueo_render': threading.Lock()
+    }
+    
+    # El informe sin parámetros se genera al arrancar: la primera visita ya sale de la caché
+    try:
+        renderizar_pagina_servidor(estado, parsear_consulta_informe('', equipos))
+    except Exception as e:
+        logger.error(f"❌ Error al generar el informe por defecto: {e}")
+        sys.exit(1)
+    
+    from http.server import ThreadingHTTPServer
+    try:
+        servidor = ThreadingHTTPServer((args.host, args.puerto), crear_manejador_informes(estado))
+    except OSError as e:
+        logger.error(f"❌ No se pudo escuchar en {args.host}:{args.puerto}: {e}")
+        sys.exit(1)
+    
+    logger.info("=" * 60)
+    logger.info(f"🌐 Servidor de informes en http://{args.host}:{servidor.server_address[1]}/ (Ctrl+C para detener)")
+    logger.info(f"   • Registros en memoria: {len(df):,}")
+    logger.info(f"   • Equipos: {', '.join(equipos) if equipos else 'ninguno'}")
+    logger.info(f"   • Parámetros: {', '.join(PARAMETROS_CONSULTA_INFORME)}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Servidor detenido")
+    finally:
+        servidor.server_close()
+
+def estado_vigilado(ruta) -> Optional[List[int]]:
+    """estado_archivo() de un archivo vigilado, o None si no existe (p. ej. mientras se reemplaza)."""
+    try:
+        return estado_archivo(ruta)
+    except OSError:
+        return None
+
+def esperar_cambios(estados, espera: float, intervalo: float = INTERVALO_VIGILANCIA) -> List[str]:
+    """
+    Espera a que cambie alguno de los archivos vigilados y devuelve las rutas que han cambiado.
+    
+    Sondea cada `intervalo` segundos su tamaño y fecha de modificación (`estados`,
+    ruta -> estado_vigilado(), que se actualiza). Tras un cambio espera a que los
+    archivos existan y pasen `espera` segundos sin modificarse, para no procesar un
+    export que todavía se está copiando.
+    """
+    while True:
+        time.sleep(intervalo)
+        actuales = {ruta: estado_vigilado(ruta) for ruta in estados}
+        if actuales == estados:
+            continue
+        
+        while True:
+            time.sleep(max(espera, intervalo))
+            siguientes = {ruta: estado_vigilado(ruta) for ruta in estados}
+            if siguientes == actuales and all(estado is not None for estado in siguientes.values()):
+                break
+            actuales = siguientes
+        
+        cambiados = [ruta for ruta in estados if actuales[ruta] != estados[ruta]]
+        estados.update(actuales)
+        if cambiados:
+            return cambiados
+
+def resumir_export(archivo, corte: Optional[int] = None) -> Dict[str, Any]:
+    """
+    SHA-256, tamaño y último byte del export, leído por bloques.
+    
+    Con `corte` se guarda también en 'sha256_corte' el SHA-256 de sus primeros `corte`
+    bytes, para saber si el archivo solo ha crecido sin leerlo dos veces.
+    """
+    resumen = hashlib.sha256()
+    resultado = {'sha256_corte': None, 'tamano': 0, 'ultimo_byte': b''}
+    with open(archivo, 'rb') as f:
+        while True:
+            tam_bloque = 1024 * 1024
+            if corte is not None and resultado['tamano'] < corte:
+                tam_bloque = min(tam_bloque, corte - resultado['tamano'])
+            bloque = f.read(tam_bloque)
+            if not bloque:
+                break
+            resumen.update(bloque)
+            resultado['tamano'] += len(bloque)
+            resultado['ultimo_byte'] = bloque[-1:]
+            if resultado['tamano'] == corte:
+                resultado['sha256_corte'] = resumen.hexdigest()
+    resultado['sha256'] = resumen.hexdigest()
+    return resultado
+
+def huellas_por_dia(df) -> Dict[pd.Timestamp, int]:
+    """
+    Huella de los registros de cada día: suma de un hash por fila, independiente de su orden.
+    
+    El hash de cada fila combina los de sus columnas, calculados columna a columna
+    (mucho más rápido que hash_pandas_object() sobre el DataFrame completo); las
+    columnas category se resumen por su texto, no por sus códigos.
+    """
+    hash_filas = np.zeros(len(df), dtype='uint64')
+    for columna in df.columns:
+        hash_filas = hash_filas * np.uint64(MULTIPLICADOR_HUELLA) + pd.util.hash_pandas_object(df[columna], index=False).to_numpy()
+    huellas = pd.Series(hash_filas, index=df.index).groupby(df['Date']).sum()
+    return dict(zip(huellas.index, huellas.tolist()))
+
+def dias_cambiados(anteriores, nuevas) -> List[Any]:
+    """Días nuevos, eliminados o con registros distintos entre dos huellas_por_dia()."""
+    return sorted(dia for dia in set(anteriores) | set(nuevas) if anteriores.get(dia) != nuevas.get(dia))
+
+def concatenar_registros(*partes) -> pd.DataFrame:
+    """Concatena registros ya tipados conservando las columnas category (unión de sus categorías)."""
+    from pandas.api.types import union_categoricals
+    df = pd.concat(partes, ignore_index=True)
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns and all(isinstance(parte[columna].dtype, pd.CategoricalDtype) for parte in partes):
+            df[columna] = union_categoricals([parte[columna] for parte in partes])
+    return df
+
+def cargar_export_vigilado(args):
+    """Carga completa del export para --watch (con la caché de datos si está activa)."""
+    if args.usar_cache:
+        return cargar_datos_con_cache(args.archivo_csv, args.motor, args.directorio_cache)
+    return cargar_datos_cursor(args.archivo_csv, args.motor)
+
+def actualizar_export_vigilado(args, datos) -> Optional[List[Any]]:
+    """
+    Actualiza los registros en memoria de --watch ('df', 'huellas', 'resumen') tras un cambio del export.
+    
+    Si el CSV solo ha crecido (mismos primeros bytes, terminados en fin de línea) se
+    leen y validan solo las filas añadidas; si se ha reescrito, se vuelve a cargar
+    entero. En ambos casos las huellas por día indican qué días han cambiado.
+    
+    Returns:
+        Días nuevos, eliminados o con registros distintos ([] si ninguno), o None si hay errores
+    """
+    anterior = datos['resumen']
+    try:
+        resumen = resumir_export(args.archivo_csv, anterior['tamano'])
+    except OSError as e:
+        logger.error(f"❌ Error al leer el export {args.archivo_csv}: {e}")
+        return None
+    
+    if resumen['sha256'] == anterior['sha256']:
+        logger.info("♻️ El contenido del export no ha cambiado")
+        return []
+    
+    solo_crecio = (
+        not args.archivo_csv.lower().endswith(EXTENSIONES_COLUMNARES)
+        and resumen['tamano'] > anterior['tamano']
+        and anterior['ultimo_byte'] == b'\n'
+        and resumen['sha256_corte'] == anterior['sha256']
+    )
+    if solo_crecio:
+        logger.info(f"➕ El export solo ha crecido: se leen los {resumen['tamano'] - anterior['tamano']:,} bytes añadidos")
+        anexo = cargar_datos_cursor(args.archivo_csv, args.motor, desde_byte=anterior['tamano'])
+        if anexo is None:
+            return None
+        df = concatenar_registros(datos['df'], anexo)
+        dias_anexo = anexo['Date'].unique()
+        huellas = dict(datos['huellas'])
+        huellas.update(huellas_por_dia(df[df['Date'].isin(dias_anexo)]))
+    else:
+        logger.info("🔄 El export se ha reescrito: se vuelve a cargar completo")
+        df = cargar_export_vigilado(args)
+        if df is None:
+            return None
+        huellas = huellas_por_dia(df)
+    
+    cambiados = dias_cambiados(datos['huellas'], huellas)
+    datos.update({'df': df, 'huellas': huellas, 'resumen': resumen})
+    if cambiados:
+        logger.info(f"📅 Días nuevos o cambiados: {len(cambiados)} ({fecha_iso(cambiados[0])} - {fecha_iso(cambiados[-1])})")
+    else:
+        logger.info("♻️ Ningún día tiene registros nuevos o distintos")
+    return cambiados
+
+def calcular_metricas_vigiladas(args, df, periodos):
+    """Valida las fechas personalizadas contra los registros y calcula las métricas (None si hay errores)."""
+    fechas_argumentos = [args.fecha_inicio_actual, args.fecha_fin_actual, args.fecha_inicio_anterior, args.fecha_fin_anterior]
+    fechas_personalizadas = None
+    if any(fechas_argumentos):
+        fechas_personalizadas, errores = validar_y_parsear_fechas(*fechas_argumentos, df)
+        if errores:
+            logger.error("❌ Errores en fechas personalizadas:")
+            for error in errores:
+                logger.error(f"  • {error}")
+            return None
+    return procesar_datos_cursor(df, fechas_personalizadas, periodos=periodos)
+
+def publicar_informe_vigilado(args, metricas, exportar: bool = True) -> bool:
+    """Escribe el HTML (y, con `exportar`, las exportaciones JSON/Parquet) a partir de las métricas en memoria."""
+    if exportar:
+        if args.export_json and not exportar_metricas_json(metricas, args.export_json):
+            return False
+        if args.export_parquet and not exportar_metricas_parquet(metricas, args.export_parquet):
+            return False
+    return bool(generar_informe_desde_plantilla(metricas, args.plantilla, args.salida, args.precision_graficos))
+
+def vigilar_informe(args, periodos):
+    """
+    Modo --watch: genera el informe y lo regenera cuando cambian el export o la plantilla.
+    
+    Los registros y las métricas se conservan en memoria entre cambios. Si solo
+    cambia la plantilla, el informe se vuelve a renderizar con las métricas ya
+    calculadas, sin tocar el export. Si cambia el export, se leen solo las filas
+    añadidas cuando el archivo únicamente ha crecido, y las métricas se recalculan
+    solo si algún día tiene registros nuevos o distintos. Un export o una plantilla
+    con errores no detiene la vigilancia: se conserva el último informe correcto.
+    """
+    logger.info("🚀 Iniciando generación de informe de Cursor AI Analytics (modo vigilancia)")
+    logger.info("=" * 60)
+    
+    if not os.path.isfile(args.archivo_csv):
+        logger.error(f"❌ Archivo de datos no encontrado: {args.archivo_csv}")
+        sys.exit(1)
+    if not os.path.isfile(args.plantilla):
+        logger.error(f"❌ Archivo de plantilla no encontrado: {args.plantilla}")
+        sys.exit(1)
+    
+    try:
+        resumen = resumir_export(args.archivo_csv)
+    except OSError as e:
+        logger.error(f"❌ Error al leer el export {args.archivo_csv}: {e}")
+        sys.exit(1)
+    df = cargar_export_vigilado(args)
+    if df is None:
+        logger.error("❌ Error al procesar los datos. Abortando.")
+        sys.exit(1)
+    datos = {'df': df, 'huellas': huellas_por_dia(df), 'resumen': resumen}
+    
+    metricas = calcular_metricas_vigiladas(args, df, periodos)
+    if metricas is None or not publicar_informe_vigilado(args, metricas):
+        logger.error("❌ Error al generar el informe.")
+        sys.exit(1)
+    
+    estados = {ruta: estado_vigilado(ruta) for ruta in (args.archivo_csv, args.plantilla)}
+    logger.info("=" * 60)
+    logger.info(f"👀 Vigilando {args.archivo_csv} y {args.plantilla} (Ctrl+C para detener)")
+    try:
+        while True:
+            cambiados = esperar_cambios(estados, args.debounce)
+            inicio = time.perf_counter()
+            logger.info(f"🔔 Cambios detectados en: {', '.join(cambiados)}")
+            
+            recalculadas = False
+            if args.archivo_csv in cambiados:
+                dias = actualizar_export_vigilado(args, datos)
+                if dias is None:
+                    logger.error("❌ Error al procesar el export: se conserva el informe anterior")
+                    continue
+                if dias:
+                    nuevas = calcular_metricas_vigiladas(args, datos['df'], periodos)
+                    if nuevas is None:
+                        logger.error("❌ Error al calcular las métricas: se conserva el informe anterior")
+                        continue
+                    metricas, recalculadas = nuevas, True
+            
+            if not recalculadas and args.plantilla not in cambiados:
+                continue
+            if publicar_informe_vigilado(args, metricas, exportar=recalculadas):
+                origen = "métricas recalculadas" if recalculadas else "métricas en memoria"
+                logger.info(f"🔁 Informe actualizado en {time.perf_counter() - inicio:.2f}s ({origen}): {args.salida}")
+            else:
+                logger.error("❌ Error al actualizar el informe: se conserva el anterior")
+    except KeyboardInterrupt:
+        logger.info("👋 Vigilancia detenida")
+
+def main():
+    """Función principal del script."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'ingest':
+        return main_ingesta(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        return main_servidor(sys.argv[2:])
+    
+    parser = argparse.ArgumentParser(description='Generador de Informes de Cursor AI Analytics usando Plantilla')
+    parser.add_argument('archivo_csv', nargs='?', help='Archivo con datos de Cursor (.csv, .parquet o .feather)')
+    parser.add_argument('--salida', '-o', default='informe_cursor_analytics.html', 
+                       help="Archivo HTML de salida, o '-' para stdout (default: informe_cursor_analytics.html)")
     parser.add_argument('--plantilla', '-t', default='cursor_stats_report_ux.html',
                        help='Archivo de plantilla HTML (default: cursor_stats_report_ux.html)')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Activar logging detallado')
+    parser.add_argument('--engine', dest='motor', choices=['c', 'pyarrow'], default='c',
+                       help='Parser CSV: c (default) o pyarrow (multihilo, requiere pyarrow)')
+    parser.add_argument('--bloques', type=int, nargs='?', const=FILAS_BLOQUE_DEFECTO, metavar='FILAS',
+                       help=f'Procesar el archivo por bloques de FILAS filas con memoria acotada (default: {FILAS_BLOQUE_DEFECTO})')
+    parser.add_argument('--cache-dir', dest='directorio_cache', default=DIRECTORIO_CACHE_DEFECTO,
+                       help=f'Directorio de la caché de datos validados e informes generados (default: {DIRECTORIO_CACHE_DEFECTO})')
+    parser.add_argument('--no-cache', dest='usar_cache', action='store_false',
+                       help='No leer ni escribir la caché (siempre reprocesar el export y regenerar el informe)')
+    parser.add_argument('--historial', metavar='DIR',
+                       help='Generar el informe desde el almacén histórico creado con el subcomando ingest')
+    parser.add_argument('--ultimos-dias', type=int, metavar='N',
+                       help=f'Con --historial, usar solo los últimos N días del almacén (mínimo {DIAS_MINIMOS_COMPARATIVA}, default: todos)')
+    parser.add_argument('--lote', metavar='MANIFIESTO',
+                       help='Generar todos los informes de un manifiesto JSON/YAML cargando los datos una sola vez')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                       help='Con --lote, repartir el renderizado de los informes entre N procesos (default: 1)')
+    parser.add_argument('--export-json', metavar='ARCHIVO',
+                       help='Exportar también las métricas en JSON (esquema versionado)')
+    parser.add_argument('--export-parquet', metavar='ARCHIVO',
+                       help='Exportar también las métricas en Parquet, tabla larga (requiere pyarrow)')
+    parser.add_argument('--precision-graficos', type=int, default=PRECISION_GRAFICOS_DEFECTO, metavar='N',
+                       help=f'Decimales de los valores no enteros de los gráficos (default: {PRECISION_GRAFICOS_DEFECTO})')
+    parser.add_argument('--periodos', metavar='semana|mes|N-dias',
+                       help='Modo tendencia: KPIs de todos los períodos (semanas, meses o bloques de N días) y comparativa de los dos últimos')
+    parser.add_argument('--precompile-template', dest='precompilar', action='store_true',
+                       help='Solo precompilar la plantilla (--plantilla) junto a ella y terminar')
+    parser.add_argument('--watch', dest='vigilar', action='store_true',
+                       help='Vigilar el archivo de datos y la plantilla y regenerar el informe cuando cambien')
+    parser.add_argument('--debounce', type=float, default=ESPERA_VIGILANCIA_DEFECTO, metavar='SEGUNDOS',
+                       help=f'Con --watch, segundos sin cambios antes de procesar un cambio (default: {ESPERA_VIGILANCIA_DEFECTO:g})')
+    parser.add_argument('--profile', dest='perfil', action='store_true',
+                       help='Mostrar al terminar el tiempo real y de CPU, las filas y la memoria de cada etapa')
+    parser.add_argument('--profile-json', dest='perfil_json', metavar='ARCHIVO',
+                       help='Guardar también el perfil por etapas en JSON (implica --profile)')
+    parser.add_argument('--profile-pstats', dest='perfil_pstats', metavar='ARCHIVO',
+                       help='Ejecutar con cProfile y guardar las estadísticas para pstats/snakeviz (implica --profile)')
     
     # Parámetros para fechas personalizadas
     parser.add_argument('--fecha-inicio-actual', type=str,
@@ -1024,26 +3827,175 @@ def main():
     
     args = parser.parse_args()
     
+    if args.precompilar:
+        try:
+            plantilla = precompilar_plantilla(args.plantilla)
+        except Exception as e:
+            logger.error(f"❌ Error al precompilar la plantilla {args.plantilla}: {e}")
+            sys.exit(1)
+        logger.info(f"✅ Plantilla precompilada: {ruta_plantilla_precompilada(os.path.abspath(args.plantilla))}")
+        logger.info(f"   • Placeholders: {', '.join(plantilla['placeholders'])}")
+        return
+    
+    if bool(args.archivo_csv) == bool(args.historial):
+        parser.error('indique un archivo de datos o --historial DIR (pero no ambos)')
+    if args.ultimos_dias is not None and (not args.historial or args.ultimos_dias < DIAS_MINIMOS_COMPARATIVA):
+        parser.error(f'--ultimos-dias requiere --historial y al menos {DIAS_MINIMOS_COMPARATIVA} días para comparar dos períodos')
+    if args.lote and args.bloques:
+        parser.error('--lote no es compatible con --bloques')
+    if args.lote:
+        # Salida, exportaciones y fechas son de cada informe del manifiesto: no se ignoran en silencio
+        opciones_informe = {
+            '--salida': args.salida != parser.get_default('salida'),
+            '--export-json': args.export_json,
+            '--export-parquet': args.export_parquet,
+            '--fecha-inicio-actual': args.fecha_inicio_actual,
+            '--fecha-fin-actual': args.fecha_fin_actual,
+            '--fecha-inicio-anterior': args.fecha_inicio_anterior,
+            '--fecha-fin-anterior': args.fecha_fin_anterior
+        }
+        incompatibles = [opcion for opcion, indicada in opciones_informe.items() if indicada]
+        if incompatibles:
+            parser.error(f"--lote no es compatible con {', '.join(incompatibles)}: indíquelas en cada informe del manifiesto")
+    if args.workers < 1 or (args.workers > 1 and not args.lote):
+        parser.error('--workers requiere --lote y un valor positivo')
+    periodos = None
+    if args.periodos:
+        try:
+            periodos = parsear_periodos(args.periodos)
+        except ValueError as e:
+            parser.error(str(e))
+    args.perfil = args.perfil or bool(args.perfil_json) or bool(args.perfil_pstats)
+    if args.vigilar and (not args.archivo_csv or args.lote or args.bloques or args.perfil or args.salida == '-'):
+        parser.error('--watch requiere un archivo de datos y no es compatible con --historial, --lote, --bloques, --profile ni --salida -')
+    if args.debounce < 0:
+        parser.error('--debounce no puede ser negativo')
+    
     # Configurar nivel de logging
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    if args.vigilar:
+        vigilar_informe(args, periodos)
+        return
+    if not args.perfil:
+        generar_informe_cli(args, periodos)
+        return
+    
+    # --profile: medir las etapas y, con --profile-pstats, todas las funciones con cProfile
+    activar_perfil()
+    perfilador = None
+    if args.perfil_pstats:
+        import cProfile
+        perfilador = cProfile.Profile()
+        perfilador.enable()
+    try:
+        # La importación diferida de pandas y numpy se mide aparte, no dentro de la primera etapa que los usa
+        with medir_etapa('Importación de pandas y numpy'):
+            pd.__version__, np.__version__
+        generar_informe_cli(args, periodos)
+    finally:
+        if perfilador:
+            perfilador.disable()
+        resumen = resumen_perfil()
+        imprimir_perfil(resumen)
+        if args.perfil_json:
+            exportar_perfil_json(resumen, args.perfil_json)
+        if perfilador:
+            try:
+                perfilador.dump_stats(args.perfil_pstats)
+                logger.info(f"🔬 Estadísticas de cProfile guardadas: {args.perfil_pstats} (python -m pstats {args.perfil_pstats})")
+            except OSError as e:
+                logger.error(f"❌ No se pudieron guardar las estadísticas de cProfile: {e}")
+
+def generar_informe_cli(args, periodos):
+    """Genera el informe (o el lote) con los argumentos ya validados por main()."""
     logger.info("🚀 Iniciando generación de informe de Cursor AI Analytics")
     logger.info("=" * 60)
     
-    # Validar fechas personalizadas si se proporcionan
+    # Comprobaciones que no necesitan los datos: fallan antes de cargar pandas
+    if args.archivo_csv and not os.path.isfile(args.archivo_csv):
+        logger.error(f"❌ Archivo de datos no encontrado: {args.archivo_csv}")
+        sys.exit(1)
+    if not args.lote and not os.path.isfile(args.plantilla):
+        logger.error(f"❌ Archivo de plantilla no encontrado: {args.plantilla}")
+        sys.exit(1)
+    
+    # El manifiesto se lee antes que los datos: un manifiesto con errores falla sin cargar el export
+    manifiesto = None
+    if args.lote:
+        try:
+            manifiesto = cargar_manifiesto_lote(args.lote)
+        except Exception as e:
+            logger.error(f"❌ Error al leer el manifiesto {args.lote}: {e}")
+            sys.exit(1)
+    
+    fechas_argumentos = [args.fecha_inicio_actual, args.fecha_fin_actual, args.fecha_inicio_anterior, args.fecha_fin_anterior]
+    if any(fechas_argumentos):
+        _, errores = validar_y_parsear_fechas(*fechas_argumentos)
+        if errores:
+            logger.error("❌ Errores en fechas personalizadas:")
+            for error in errores:
+                logger.error(f"  • {error}")
+            sys.exit(1)
+    
+    # Informe ya generado con los mismos datos, plantilla y opciones: se reutiliza sin cargar nada
+    # (salvo con --profile, que debe recorrer todas las etapas)
+    consulta_informe = None
+    if args.usar_cache and args.archivo_csv and not args.lote and args.salida != '-' and not args.perfil:
+        consulta_informe = consultar_cache_informes(args)
+        if consulta_informe and consulta_informe['vigente']:
+            logger.info(f"♻️ Informe sin cambios desde la última ejecución (mismos datos, plantilla y opciones): {args.salida}")
+            return
+    
+    if args.historial:
+        # Almacén histórico: las fechas salen de las particiones, sin leer los datos
+        try:
+            with medir_etapa('Lectura de fechas') as medida:
+                fechas_unicas = listar_fechas_historial(args.historial)
+                medida['filas'] = len(fechas_unicas)
+        except Exception as e:
+            logger.error(f"❌ Error al leer el almacén histórico: {e}")
+            sys.exit(1)
+        if args.ultimos_dias:
+            fechas_unicas = fechas_unicas[-args.ultimos_dias:]
+        if not fechas_unicas:
+            logger.error(f"❌ El almacén histórico {args.historial} está vacío. Use el subcomando ingest.")
+            sys.exit(1)
+        df = pd.DataFrame({'Date': fechas_unicas})
+    elif args.bloques:
+        # Modo por bloques: solo se cargan las fechas para validar y dividir períodos
+        try:
+            with medir_etapa('Lectura de fechas') as medida:
+                fechas_unicas = leer_fechas_cursor(args.archivo_csv, args.bloques)
+                medida['filas'] = len(fechas_unicas)
+        except Exception as e:
+            logger.error(f"❌ Error al leer las fechas del archivo: {e}")
+            sys.exit(1)
+        if not fechas_unicas:
+            logger.error("❌ El archivo no contiene fechas válidas. Abortando.")
+            sys.exit(1)
+        df = pd.DataFrame({'Date': fechas_unicas})
+    else:
+        # Cargar y validar el CSV una única vez (o reutilizar la caché)
+        if args.usar_cache:
+            df = cargar_datos_con_cache(args.archivo_csv, args.motor, args.directorio_cache)
+        else:
+            df = cargar_datos_cursor(args.archivo_csv, args.motor)
+        
+        if df is None:
+            logger.error("❌ Error al procesar los datos. Abortando.")
+            sys.exit(1)
+    
+    if args.lote:
+        ejecutar_lote(args, df, manifiesto)
+        return
+    
+    # Validar fechas personalizadas contra las fechas del dataset
     fechas_personalizadas = None
-    if any([args.fecha_inicio_actual, args.fecha_fin_actual, args.fecha_inicio_anterior, args.fecha_fin_anterior]):
-        # Cargar CSV temporalmente para validar fechas
+    if any(fechas_argumentos):
         try:
-            df_temp = pd.read_csv(args.archivo_csv)
-            df_temp['Date'] = pd.to_datetime(df_temp['Date'], errors='coerce')
-            df_temp = df_temp.dropna(subset=['Date'])
-            
-            fechas_personalizadas, errores = validar_y_parsear_fechas(
-                args.fecha_inicio_actual, args.fecha_fin_actual,
-                args.fecha_inicio_anterior, args.fecha_fin_anterior, df_temp
-            )
+            fechas_personalizadas, errores = validar_y_parsear_fechas(*fechas_argumentos, df)
             
             if errores:
                 logger.error("❌ Errores en fechas personalizadas:")
@@ -1058,16 +4010,30 @@ def main():
             sys.exit(1)
     
     # Procesar datos
-    metricas = procesar_datos_cursor(args.archivo_csv, fechas_personalizadas)
+    if args.historial:
+        metricas = procesar_datos_historial(args.historial, fechas_unicas, fechas_personalizadas, periodos)
+    elif args.bloques:
+        metricas = procesar_datos_cursor_por_bloques(args.archivo_csv, fechas_unicas, fechas_personalizadas, args.bloques, periodos)
+    else:
+        metricas = procesar_datos_cursor(df, fechas_personalizadas, periodos=periodos)
     
     if metricas is None:
         logger.error("❌ Error al procesar los datos. Abortando.")
         sys.exit(1)
     
+    # Exportaciones para consumo externo
+    if args.export_json and not exportar_metricas_json(metricas, args.export_json):
+        sys.exit(1)
+    if args.export_parquet and not exportar_metricas_parquet(metricas, args.export_parquet):
+        sys.exit(1)
+    
     # Generar informe desde plantilla
-    archivo_generado = generar_informe_desde_plantilla(metricas, args.plantilla, args.salida)
+    archivo_generado = generar_informe_desde_plantilla(metricas, args.plantilla, args.salida, args.precision_graficos)
     
     if archivo_generado:
+        if consulta_informe:
+            registrar_cache_informes(args, consulta_informe)
+        
         logger.info("=" * 60)
         logger.info(f"🎉 ¡Informe completado exitosamente!")
         logger.info(f"📄 Archivo generado: {archivo_generado}")